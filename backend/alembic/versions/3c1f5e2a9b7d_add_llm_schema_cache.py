@@ -0,0 +1,38 @@
+"""add llm schema cache
+
+Revision ID: 3c1f5e2a9b7d
+Revises: f8ca6f4bf570
+Create Date: 2024-02-05 10:12:31.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3c1f5e2a9b7d"
+down_revision = "f8ca6f4bf570"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "llm_schema_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("create_statement", sa.String()),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("hit_count", sa.Integer(), default=0),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("last_accessed_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index(
+        "ix_llm_schema_cache_last_accessed_at",
+        "llm_schema_cache",
+        ["last_accessed_at"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_llm_schema_cache_last_accessed_at", "llm_schema_cache")
+    op.drop_table("llm_schema_cache")
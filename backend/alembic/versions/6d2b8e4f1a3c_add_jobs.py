@@ -0,0 +1,45 @@
+"""add jobs
+
+Revision ID: 6d2b8e4f1a3c
+Revises: 3c1f5e2a9b7d
+Create Date: 2024-02-12 14:03:52.907114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "6d2b8e4f1a3c"
+down_revision = "3c1f5e2a9b7d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("payload", postgresql.JSONB()),
+        sa.Column("result", postgresql.JSONB(), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("stage", sa.String(), nullable=True),
+        sa.Column("pages_done", sa.Integer(), default=0),
+        sa.Column("pages_total", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), default=0),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_jobs_status_created_at", "jobs", ["status", "created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_jobs_status_created_at", "jobs")
+    op.drop_table("jobs")
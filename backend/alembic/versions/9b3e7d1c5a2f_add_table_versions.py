@@ -0,0 +1,29 @@
+"""add table versions
+
+Revision ID: 9b3e7d1c5a2f
+Revises: 6d2b8e4f1a3c
+Create Date: 2024-02-19 10:41:27.318452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9b3e7d1c5a2f"
+down_revision = "6d2b8e4f1a3c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "table_versions",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, default=0),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("table_versions")
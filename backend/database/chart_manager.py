@@ -28,6 +28,9 @@ class ChartManager:
         else:
             return -1
 
+    def get_chart(self, chart_id: int):
+        return self.db_session.query(Chart).filter(Chart.id == chart_id).first()
+
     def save_chart(self, chart: Chart):
         self.db_session.add(chart)
         self.db_session.commit()
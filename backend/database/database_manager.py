@@ -1,3 +1,20 @@
+"""
+This module provides the DatabaseManager classes and a process-wide engine registry.
+
+Engines are expensive to create because each one owns its own connection pool.
+The registry makes sure that every engine is created once per process (keyed by
+URL and pool settings) and reused by all DatabaseManager instances, so a request
+only checks a connection out of an existing pool instead of opening a new one.
+
+Besides the synchronous engine, an asyncio engine (asyncpg) is registered for the
+same database. Routes can depend on `get_async_session` to get an AsyncSession and
+run the existing synchronous managers on it through `AsyncSession.run_sync`, which
+keeps the event loop free while queries are waiting on the database.
+"""
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
 from settings import (
     APP_ENV,
     DATABASE_POOL_MAX_OVERFLOW,
@@ -6,25 +23,158 @@ from settings import (
     DATABASE_URL,
 )
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
 
+EngineKey = Tuple[str, Optional[int], Optional[int]]
+
+_engines: Dict[EngineKey, Engine] = {}
+_session_factories: Dict[EngineKey, sessionmaker] = {}
+_pool_wait_stats: Dict[EngineKey, Dict[str, float]] = {}
+_async_engines: Dict[EngineKey, AsyncEngine] = {}
+_async_session_factories: Dict[EngineKey, sessionmaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_engine(
+    url: str, pool_size: Optional[int] = None, max_overflow: Optional[int] = None
+) -> Engine:
+    """
+    Get the shared engine for the given URL and pool settings, creating it on first use.
+
+    Args:
+        url (str): The database URL.
+        pool_size (int, optional): Size of the QueuePool. Defaults to SQLAlchemy's default.
+        max_overflow (int, optional): Connections allowed above pool_size. Defaults to SQLAlchemy's default.
+
+    Returns:
+        Engine: The engine registered for these settings.
+    """
+    key: EngineKey = (url, pool_size, max_overflow)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            pool_kwargs: dict = {}
+            if pool_size is not None:
+                pool_kwargs["poolclass"] = QueuePool
+                pool_kwargs["pool_size"] = pool_size
+            if max_overflow is not None:
+                pool_kwargs["max_overflow"] = max_overflow
+            engine = create_engine(url, **pool_kwargs)
+            _engines[key] = engine
+            _session_factories[key] = sessionmaker(bind=engine)
+            _pool_wait_stats[key] = {
+                "checkouts": 0,
+                "total_wait": 0.0,
+                "max_wait": 0.0,
+                "last_wait": 0.0,
+            }
+    return engine
+
+
+def to_async_url(url: str) -> str:
+    """Convert a PostgreSQL URL to one that uses the asyncpg driver."""
+    return str(make_url(url).set(drivername="postgresql+asyncpg"))
+
+
+def get_async_engine(
+    url: str, pool_size: Optional[int] = None, max_overflow: Optional[int] = None
+) -> AsyncEngine:
+    """
+    Get the shared asyncio engine for the given URL and pool settings, creating it on first use.
+
+    Args:
+        url (str): The database URL. The driver is switched to asyncpg.
+        pool_size (int, optional): Size of the connection pool. Defaults to SQLAlchemy's default.
+        max_overflow (int, optional): Connections allowed above pool_size. Defaults to SQLAlchemy's default.
+
+    Returns:
+        AsyncEngine: The asyncio engine registered for these settings.
+    """
+    key: EngineKey = (url, pool_size, max_overflow)
+    engine = _async_engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _registry_lock:
+        engine = _async_engines.get(key)
+        if engine is None:
+            engine_kwargs: dict = {}
+            if pool_size is not None:
+                engine_kwargs["pool_size"] = pool_size
+            if max_overflow is not None:
+                engine_kwargs["max_overflow"] = max_overflow
+            if APP_ENV == "prod":
+                # The pooled URL goes through PgBouncer, which does not support prepared statement caching
+                engine_kwargs["connect_args"] = {"statement_cache_size": 0}
+            engine = create_async_engine(to_async_url(url), **engine_kwargs)
+            _async_engines[key] = engine
+            _async_session_factories[key] = sessionmaker(
+                bind=engine, class_=AsyncSession, expire_on_commit=False
+            )
+    return engine
+
+
+def get_app_engine_key() -> EngineKey:
+    """Get the registry key of the main application engine for the current environment."""
+    if APP_ENV == "prod":
+        return (DATABASE_POOL_URL, DATABASE_POOL_SIZE, DATABASE_POOL_MAX_OVERFLOW)
+    return (DATABASE_URL, None, None)
+
+
+def init_engines():
+    """Create the application engine. Called once on application startup."""
+    get_engine(*get_app_engine_key())
+    get_async_engine(*get_app_engine_key())
+
+
+async def dispose_engines():
+    """Dispose every registered engine and close their pooled connections. Called on shutdown."""
+    with _registry_lock:
+        engines = list(_engines.values())
+        async_engines = list(_async_engines.values())
+        _engines.clear()
+        _session_factories.clear()
+        _pool_wait_stats.clear()
+        _async_engines.clear()
+        _async_session_factories.clear()
+
+    for engine in engines:
+        engine.dispose()
+    for async_engine in async_engines:
+        await async_engine.dispose()
+
+
+def _record_pool_wait(key: EngineKey, wait: float):
+    stats = _pool_wait_stats.get(key)
+    if stats is None:
+        return
+    stats["checkouts"] += 1
+    stats["total_wait"] += wait
+    stats["last_wait"] = wait
+    stats["max_wait"] = max(stats["max_wait"], wait)
+
 
 class DatabaseManager:
     def __init__(self):
-        if APP_ENV == "prod":
-            self.engine = create_engine(
-                DATABASE_POOL_URL,
-                poolclass=QueuePool,
-                pool_size=DATABASE_POOL_SIZE,
-                max_overflow=DATABASE_POOL_MAX_OVERFLOW,
-            )
-        else:
-            self.engine = create_engine(DATABASE_URL)
+        self.engine_key = get_app_engine_key()
+        self.engine = get_engine(*self.engine_key)
 
     def __enter__(self):
-        Session = sessionmaker(bind=self.engine)
+        Session = _session_factories[self.engine_key]
         self.session = Session()
+
+        # Check out the connection up front so the pool wait time can be measured
+        start = time.perf_counter()
+        self.session.connection()
+        _record_pool_wait(self.engine_key, time.perf_counter() - start)
+
         return self.session
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -32,3 +182,66 @@ class DatabaseManager:
 
     def get_uri_str(self):
         return str(self.engine.url)
+
+    def get_pool_status(self) -> dict:
+        """
+        Get statistics about the connection pool of the application engine.
+
+        Returns:
+            dict: Pool size, checked in/out connections, overflow and connection wait times in seconds.
+        """
+        pool = self.engine.pool
+        wait_stats = dict(_pool_wait_stats.get(self.engine_key, {}))
+        checkouts = wait_stats.get("checkouts", 0)
+        status = {
+            "pool_class": type(pool).__name__,
+            "status": pool.status(),
+            "wait_checkouts": checkouts,
+            "wait_time_total": wait_stats.get("total_wait", 0.0),
+            "wait_time_avg": (
+                wait_stats.get("total_wait", 0.0) / checkouts if checkouts else 0.0
+            ),
+            "wait_time_max": wait_stats.get("max_wait", 0.0),
+            "wait_time_last": wait_stats.get("last_wait", 0.0),
+        }
+        if isinstance(pool, QueuePool):
+            status.update(
+                {
+                    "size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": pool.overflow(),
+                }
+            )
+        return status
+
+
+class AsyncDatabaseManager:
+    """
+    Async counterpart of DatabaseManager that hands out AsyncSession objects.
+
+    Synchronous managers can be used with the session through `run_sync`:
+
+        >>> async with AsyncDatabaseManager() as session:
+        ...     users = await session.run_sync(
+        ...         lambda sync_session: UserManager(sync_session).get_users()
+        ...     )
+    """
+
+    def __init__(self):
+        self.engine_key = get_app_engine_key()
+        self.engine = get_async_engine(*self.engine_key)
+
+    async def __aenter__(self) -> AsyncSession:
+        Session = _async_session_factories[self.engine_key]
+        self.session: AsyncSession = Session()
+        return self.session
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.session.close()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that yields an AsyncSession from the shared asyncio engine."""
+    async with AsyncDatabaseManager() as session:
+        yield session
@@ -0,0 +1,172 @@
+"""
+This module provides a JobManager class to manage the background jobs queue.
+
+Jobs are stored in the jobs table and claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of worker processes can consume the queue without handing out a job twice.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from models.job import Job
+from settings import JOB_MAX_ATTEMPTS, JOB_STALE_AFTER_SECONDS
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+
+class JobManager:
+    """
+    A class to manage operations related to the Job model.
+
+    Attributes:
+        db_session (Session): An active database session for performing operations.
+    """
+
+    def __init__(self, db_session: Session):
+        """
+        Initializes the JobManager with the given database session.
+
+        Args:
+            db_session (Session): The database session to be used for operations.
+        """
+        self.db_session = db_session
+
+    def create_job(
+        self, job_type: str, organization_id: int, user_id: int, payload: dict
+    ) -> Job:
+        """Queue a new job."""
+        now = datetime.now(timezone.utc)
+        job = Job(
+            job_type=job_type,
+            status="queued",
+            organization_id=organization_id,
+            user_id=user_id,
+            payload=payload,
+            pages_done=0,
+            attempts=0,
+            created_at=now,
+            updated_at=now,
+        )
+        self.db_session.add(job)
+        self.db_session.commit()
+        self.db_session.refresh(job)
+        return job
+
+    def get_job(self, job_id: int, organization_id: int) -> Optional[Job]:
+        """Get a job of the given organization."""
+        job: Optional[Job] = (
+            self.db_session.query(Job)
+            .filter(Job.id == job_id, Job.organization_id == organization_id)
+            .first()
+        )
+        return job
+
+    def claim_next_job(self) -> Optional[Job]:
+        """
+        Claim the oldest queued job and mark it as running.
+
+        Running jobs that have not reported for JOB_STALE_AFTER_SECONDS belonged to a worker that
+        died, so they are claimed again until they reach JOB_MAX_ATTEMPTS. Stale jobs that already
+        reached JOB_MAX_ATTEMPTS are marked as failed instead.
+
+        Returns:
+            Job: The claimed job, or None if the queue is empty.
+        """
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=JOB_STALE_AFTER_SECONDS)
+        try:
+            self.db_session.query(Job).filter(
+                Job.status == "running",
+                Job.updated_at < stale_before,
+                Job.attempts >= JOB_MAX_ATTEMPTS,
+            ).update(
+                {
+                    "status": "failed",
+                    "error": f"The job stopped reporting progress after {JOB_MAX_ATTEMPTS} attempts",
+                    "updated_at": now,
+                    "finished_at": now,
+                },
+                synchronize_session=False,
+            )
+
+            job: Optional[Job] = (
+                self.db_session.query(Job)
+                .filter(
+                    or_(
+                        Job.status == "queued",
+                        and_(
+                            Job.status == "running",
+                            Job.updated_at < stale_before,
+                            Job.attempts < JOB_MAX_ATTEMPTS,
+                        ),
+                    )
+                )
+                .order_by(Job.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                self.db_session.commit()
+                return None
+
+            job.status = "running"
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = now
+            job.updated_at = now
+            self.db_session.commit()
+            return job
+        except Exception as e:
+            self.db_session.rollback()
+            print(f"Database error: {str(e)}")
+            return None
+
+    def update_progress(
+        self,
+        job_id: int,
+        stage: str,
+        pages_done: int,
+        pages_total: Optional[int] = None,
+    ):
+        """Record the progress of a running job. Also serves as the worker's heartbeat."""
+        values = {
+            "stage": stage,
+            "pages_done": pages_done,
+            "updated_at": datetime.now(timezone.utc),
+        }
+        if pages_total is not None:
+            values["pages_total"] = pages_total
+        self.db_session.query(Job).filter(Job.id == job_id).update(values)
+        self.db_session.commit()
+
+    def heartbeat(self, job_id: int):
+        """Report that the worker of a running job is alive, so the job is not reclaimed."""
+        self.db_session.query(Job).filter(
+            Job.id == job_id, Job.status == "running"
+        ).update({"updated_at": datetime.now(timezone.utc)})
+        self.db_session.commit()
+
+    def complete_job(self, job_id: int, result):
+        """Mark a job as succeeded and store its result."""
+        now = datetime.now(timezone.utc)
+        self.db_session.query(Job).filter(Job.id == job_id).update(
+            {
+                "status": "succeeded",
+                "result": result,
+                "stage": None,
+                "updated_at": now,
+                "finished_at": now,
+            }
+        )
+        self.db_session.commit()
+
+    def fail_job(self, job_id: int, error: str):
+        """Mark a job as failed and store the error."""
+        now = datetime.now(timezone.utc)
+        self.db_session.query(Job).filter(Job.id == job_id).update(
+            {
+                "status": "failed",
+                "error": error,
+                "updated_at": now,
+                "finished_at": now,
+            }
+        )
+        self.db_session.commit()
@@ -0,0 +1,176 @@
+"""
+This module provides a LLMSchemaCacheManager class to manage the cache of LLM generated table schemas.
+
+Uploading the same file shape twice would otherwise cost two model round-trips (CREATE statement and
+description) every time. Entries are keyed by a hash of the normalized upload, expire after a TTL and
+the least recently used entries are evicted once the cache grows past its maximum size.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from models.llm_schema_cache import LLMSchemaCache
+from settings import LLM_SCHEMA_CACHE_MAX_ENTRIES, LLM_SCHEMA_CACHE_TTL_HOURS
+from sqlalchemy.orm import Session
+
+# Process-wide hit/miss counters
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+class LLMSchemaCacheManager:
+    """
+    A class to manage operations related to the LLMSchemaCache model.
+
+    Attributes:
+        db_session (Session): An active database session for performing operations.
+    """
+
+    def __init__(self, db_session: Session):
+        """
+        Initializes the LLMSchemaCacheManager with the given database session.
+
+        Args:
+            db_session (Session): The database session to be used for operations.
+        """
+        self.db_session = db_session
+
+    @staticmethod
+    def build_cache_key(
+        header: Optional[str],
+        sample_content: str,
+        extra_desc: str,
+    ) -> str:
+        """
+        Build a content-addressed key for an upload.
+
+        The inputs are normalized first so that differences in case or whitespace do not produce
+        different keys. The key only depends on the upload, so re-uploading an identical file
+        hits the cache; callers give the cached schema a table name that is not taken yet.
+
+        Returns:
+            str: The SHA-256 hex digest of the normalized inputs.
+        """
+        normalized = {
+            "header": ",".join(
+                column.strip().lower() for column in (header or "").split(",")
+            ),
+            "sample": [
+                line.strip() for line in sample_content.splitlines() if line.strip()
+            ],
+            "extra_desc": " ".join(extra_desc.split()),
+        }
+        payload = json.dumps(normalized, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_entry(self, cache_key: str) -> Optional[LLMSchemaCache]:
+        """
+        Get a cache entry without counting the lookup.
+
+        Callers report the outcome with record_hit or record_miss once they know whether the
+        cached statement was actually used.
+
+        Args:
+            cache_key (str): The key built by build_cache_key.
+
+        Returns:
+            LLMSchemaCache: The entry if it exists and has not expired, else None.
+        """
+        try:
+            # Expired entries are left to evict
+            expired_before = datetime.now(timezone.utc) - timedelta(
+                hours=LLM_SCHEMA_CACHE_TTL_HOURS
+            )
+            entry: Optional[LLMSchemaCache] = (
+                self.db_session.query(LLMSchemaCache)
+                .filter(
+                    LLMSchemaCache.cache_key == cache_key,
+                    LLMSchemaCache.created_at >= expired_before,
+                )
+                .first()
+            )
+            return entry
+        except Exception as e:
+            self.db_session.rollback()
+            print(f"Database error: {str(e)}")
+            return None
+
+    def record_hit(self, entry: LLMSchemaCache):
+        """Count a used cache entry in the hit metrics and mark it as recently used."""
+        try:
+            entry.last_accessed_at = datetime.now(timezone.utc)
+            entry.hit_count = (entry.hit_count or 0) + 1
+            self.db_session.commit()
+        except Exception as e:
+            self.db_session.rollback()
+            print(f"Database error: {str(e)}")
+        _cache_stats["hits"] += 1
+
+    def record_miss(self):
+        """Count an upload whose schema had to be generated by the LLM."""
+        _cache_stats["misses"] += 1
+
+    def save_create_statement(self, cache_key: str, create_statement: str):
+        """Store the CREATE statement generated for an upload and evict old entries."""
+        try:
+            now = datetime.now(timezone.utc)
+            entry = LLMSchemaCache(
+                cache_key=cache_key,
+                create_statement=create_statement,
+                description=None,
+                hit_count=0,
+                created_at=now,
+                last_accessed_at=now,
+            )
+            self.db_session.merge(entry)
+            self.db_session.commit()
+            self.evict()
+        except Exception as e:
+            self.db_session.rollback()
+            print(f"Database error: {str(e)}")
+
+    def save_description(self, cache_key: str, description: str):
+        """Store the table description generated for an upload."""
+        try:
+            entry = self.db_session.get(LLMSchemaCache, cache_key)
+            if entry:
+                entry.description = description
+                self.db_session.commit()
+        except Exception as e:
+            self.db_session.rollback()
+            print(f"Database error: {str(e)}")
+
+    def evict(self):
+        """Delete expired entries and the least recently used entries above the maximum size."""
+        expired_before = datetime.now(timezone.utc) - timedelta(
+            hours=LLM_SCHEMA_CACHE_TTL_HOURS
+        )
+        self.db_session.query(LLMSchemaCache).filter(
+            LLMSchemaCache.created_at < expired_before
+        ).delete(synchronize_session=False)
+
+        excess = self.db_session.query(LLMSchemaCache).count() - (
+            LLM_SCHEMA_CACHE_MAX_ENTRIES
+        )
+        if excess > 0:
+            lru_keys = [
+                cache_key
+                for (cache_key,) in self.db_session.query(LLMSchemaCache.cache_key)
+                .order_by(LLMSchemaCache.last_accessed_at.asc())
+                .limit(excess)
+                .all()
+            ]
+            self.db_session.query(LLMSchemaCache).filter(
+                LLMSchemaCache.cache_key.in_(lru_keys)
+            ).delete(synchronize_session=False)
+        self.db_session.commit()
+
+    def get_stats(self) -> dict:
+        """Return the hit/miss counters of this process and the number of stored entries."""
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "hit_rate": _cache_stats["hits"] / lookups if lookups else 0.0,
+            "entries": self.db_session.query(LLMSchemaCache).count(),
+        }
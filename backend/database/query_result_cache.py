@@ -0,0 +1,88 @@
+"""
+This module provides a QueryResultCache class that caches the results of SELECT queries.
+
+Results are keyed by the normalized query and the versions of the tables it reads from. Writing
+to a table increments its version, so every cached result of a query on that table stops
+matching at once, in every process, without having to track which results to delete. Dashboards
+can therefore render their charts from live queries on every read without running every query
+every time.
+"""
+from typing import Optional
+
+from database.sql_executor import GuardedRows, SQLExecutor
+from database.table_version_manager import TableVersionManager
+from settings import QUERY_RESULT_CACHE_MAX_ENTRIES, QUERY_RESULT_CACHE_TTL_SECONDS
+from sqlalchemy.orm import Session
+from utils.cache import TTLCache
+from utils.sql_string_manager import SQLStringManager
+
+# Query results keyed by (normalized query, ((table name, version), ...))
+query_result_cache = TTLCache(
+    max_size=QUERY_RESULT_CACHE_MAX_ENTRIES, ttl=QUERY_RESULT_CACHE_TTL_SECONDS
+)
+
+
+class QueryResultCache:
+    """
+    Executes SELECT queries through the process-wide query result cache.
+
+    Attributes:
+        session (Session): An active database session used to run queries and read table versions.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def execute_select_query(
+        self, query: str, statement_timeout_ms: Optional[int] = None
+    ) -> GuardedRows:
+        """
+        Get the rows of a query, running it only if its tables changed since it was cached.
+        Queries run through the execution guard of SQLExecutor, so results are bounded in size.
+        Queries whose tables cannot all be determined are run without the cache.
+
+        Returns:
+            GuardedRows: A copy of the rows, flagged as truncated if they were cut off at the row cap.
+
+        Args:
+            query (str): The SELECT query.
+            statement_timeout_ms (int, optional): Cancel the query if it runs longer than this.
+        """
+        sql_string_manager = SQLStringManager(query)
+        table_names = sql_string_manager.get_tables_from_select_query()
+        if table_names is None:
+            # A result that no table version tracks could never be invalidated
+            return SQLExecutor(self.session).execute_guarded_select_query(
+                query, statement_timeout_ms=statement_timeout_ms
+            )
+
+        versions = TableVersionManager(self.session).get_versions(table_names)
+        key = (sql_string_manager.normalize_query(), tuple(sorted(versions.items())))
+
+        result = query_result_cache.get(key)
+        if result is None:
+            result = SQLExecutor(self.session).execute_guarded_select_query(
+                query, statement_timeout_ms=statement_timeout_ms
+            )
+            query_result_cache.set(key, result)
+        return GuardedRows(result, result.truncated)
+
+    def invalidate_table(self, table_name: str):
+        """
+        Invalidate the cached results of all queries on a table after its data has changed.
+
+        The new version invalidates the results in all processes, the results cached by this
+        process are also removed right away to free their memory.
+        """
+        # Queries are keyed by lowercase table names, as PostgreSQL folds unquoted names
+        table_name = table_name.lower()
+        TableVersionManager(self.session).increment_version(table_name)
+        query_result_cache.invalidate_where(
+            lambda key: any(name == table_name for name, _ in key[1])
+        )
+
+    @staticmethod
+    def get_stats() -> dict:
+        """Return the size of the cache along with hit and miss counts of this process."""
+        stats: dict = query_result_cache.get_stats()
+        return stats
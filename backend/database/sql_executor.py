@@ -1,10 +1,98 @@
-from typing import List
+import json
+import time
+from io import StringIO
+from typing import Iterable, Iterator, List, Optional
 
 import pandas as pd
-from sqlalchemy import inspect, text
+import pyarrow as pa
+from settings import (
+    BULK_INSERT_CHUNK_SIZE,
+    QUERY_MAX_COST,
+    QUERY_MAX_ROWS,
+    QUERY_STATEMENT_TIMEOUT_SECONDS,
+    QUERY_STREAM_BATCH_SIZE,
+)
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, inspect, text
 from sqlalchemy.orm import Session
+from utils.app_logger import get_app_logger
+from utils.columnar import rows_to_record_batch
 from utils.sql_string_manager import SQLStringManager
 
+logger = get_app_logger(__name__)
+
+
+# Written unquoted for missing values, so they are loaded as NULL while empty strings stay empty
+COPY_NULL = "\\N"
+
+
+def _format_copy_value(value) -> str:
+    """Format a value of a DataFrame as a field of a COPY ... WITH (FORMAT CSV, NULL '\\N')."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return COPY_NULL
+    if isinstance(value, str):
+        # Quoted, so empty strings and literal \N are not read as NULL
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, float) and value.is_integer():
+        # Integer columns with missing values are float64, INTEGER columns reject "1.0"
+        return str(int(value))
+    return str(value)
+
+
+def _copy_insert(pd_table, conn, keys: List[str], data_iter: Iterable):
+    """
+    Insert method for DataFrame.to_sql that streams rows into PostgreSQL with COPY FROM STDIN.
+
+    The rows of each chunk are written to an in-memory CSV buffer and sent in a single COPY,
+    which is much faster than issuing one INSERT per row.
+    """
+    buffer = StringIO()
+    for row in data_iter:
+        buffer.write(",".join(_format_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    columns = ", ".join(f'"{key}"' for key in keys)
+    table_name = (
+        f'"{pd_table.schema}"."{pd_table.name}"'
+        if pd_table.schema
+        else f'"{pd_table.name}"'
+    )
+    copy_query = (
+        f"COPY {table_name} ({columns}) FROM STDIN "
+        f"WITH (FORMAT CSV, NULL '{COPY_NULL}')"
+    )
+
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cursor:
+        cursor.copy_expert(copy_query, buffer)
+
+
+# SQLAlchemy column types and the PostgreSQL types of SQLStringManager.map_to_postgres_type
+COLUMN_TYPE_MAPPING = [
+    (Boolean, "BOOLEAN"),
+    (Integer, "INTEGER"),
+    (Numeric, "DECIMAL"),
+    (DateTime, "DATE"),
+    (Date, "DATE"),
+]
+
+
+class QueryGuardError(ValueError):
+    """Raised when a query is rejected by the execution guard of SQLExecutor."""
+
+
+class GuardedRows(list):
+    """
+    The rows of a query run through the execution guard.
+
+    Attributes:
+        truncated (bool): Whether rows beyond the row cap were cut off.
+    """
+
+    def __init__(self, rows: Iterable[dict] = (), truncated: bool = False):
+        super().__init__(rows)
+        self.truncated = truncated
+
 
 class SQLExecutor:
     def __init__(self, session: Session):
@@ -12,9 +100,50 @@ class SQLExecutor:
         self.database_type = "postgres"
         self.sql_string_manager = SQLStringManager()
 
-    def append_df_to_table(self, df: pd.DataFrame, table_name: str):
+    def append_df_to_table(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        chunk_size: Optional[int] = None,
+        commit: bool = True,
+    ) -> dict:
+        """
+        Appends a DataFrame to a table, creating the table if it does not exist.
+
+        On PostgreSQL the rows are bulk loaded with COPY FROM STDIN, other backends fall back to
+        multi-row INSERT statements. Rows are sent in chunks of `chunk_size` on the connection of
+        the session, so several DataFrames can be loaded in one transaction by committing only
+        the last one. On failure the whole transaction is rolled back.
+
+        Returns:
+            dict: The number of rows loaded, the elapsed seconds and the rows per second.
+        """
+        chunk_size = chunk_size or BULK_INSERT_CHUNK_SIZE
+        is_postgres = self.session.bind.dialect.name == "postgresql"
         try:
-            df.to_sql(table_name, self.session.bind, if_exists="append", index=False)
+            start = time.perf_counter()
+            df.to_sql(
+                table_name,
+                self.session.connection(),
+                if_exists="append",
+                index=False,
+                chunksize=chunk_size,
+                method=_copy_insert if is_postgres else "multi",
+            )
+            if commit:
+                self.session.commit()
+            elapsed = time.perf_counter() - start
+
+            stats = {
+                "rows": len(df),
+                "seconds": elapsed,
+                "rows_per_second": len(df) / elapsed if elapsed else 0.0,
+            }
+            logger.info(
+                f"Loaded {stats['rows']} rows into {table_name} in {elapsed:.2f}s "
+                f"({stats['rows_per_second']:.0f} rows/s, {'COPY' if is_postgres else 'INSERT'})"
+            )
+            return stats
         except Exception as e:
             self.session.rollback()
             print(
@@ -48,6 +177,16 @@ class SQLExecutor:
             self.session.rollback()
             raise
 
+    def set_statement_timeout(self, timeout_ms: int):
+        """
+        Limits the run time of the following statements of the current transaction. PostgreSQL
+        cancels a statement that runs longer. Other backends are left unchanged.
+        """
+        if self.session.bind.dialect.name == "postgresql":
+            self.session.execute(
+                text(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            )
+
     def execute_select_query(self, query: str, format_as_dict: bool = True):
         try:
             result_proxy = self.session.execute(text(query))
@@ -64,6 +203,157 @@ class SQLExecutor:
             print(f"An error occurred: {e}")
             raise
 
+    def stream_select_query(
+        self, query: str, batch_size: Optional[int] = None
+    ) -> Iterator[List[dict]]:
+        """
+        Executes a SELECT query and yields its rows in batches of dictionaries.
+
+        Unlike execute_select_query, the rows are read through a server-side cursor, so only
+        one batch is held in memory at a time however large the result is.
+
+        Parameters:
+            query (str): The SELECT query.
+            batch_size (int, optional): The number of rows per batch. Defaults to QUERY_STREAM_BATCH_SIZE.
+
+        Yields:
+            List[dict]: The next batch of rows.
+        """
+        batch_size = batch_size or QUERY_STREAM_BATCH_SIZE
+        try:
+            result = self.session.execute(
+                text(query),
+                execution_options={"stream_results": True, "yield_per": batch_size},
+            )
+            try:
+                for partition in result.partitions(batch_size):
+                    yield [dict(row) for row in partition]
+            finally:
+                result.close()
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
+
+    def stream_select_query_as_arrow(
+        self, query: str, batch_size: Optional[int] = None
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Executes a SELECT query and yields its rows as Apache Arrow record batches.
+
+        Like stream_select_query the rows are read through a server-side cursor, but they are
+        converted column by column without building a dictionary per row. All batches share
+        the schema inferred from the first one, and an empty result yields one empty batch so
+        the schema is always known.
+
+        Parameters:
+            query (str): The SELECT query.
+            batch_size (int, optional): The number of rows per batch. Defaults to QUERY_STREAM_BATCH_SIZE.
+
+        Yields:
+            pa.RecordBatch: The next batch of rows.
+        """
+        batch_size = batch_size or QUERY_STREAM_BATCH_SIZE
+        try:
+            result = self.session.execute(
+                text(query),
+                execution_options={"stream_results": True, "yield_per": batch_size},
+            )
+            try:
+                column_names = list(result.keys())
+                schema = None
+                for partition in result.partitions(batch_size):
+                    batch = rows_to_record_batch(column_names, partition, schema)
+                    schema = batch.schema
+                    yield batch
+                if schema is None:
+                    yield rows_to_record_batch(column_names, [])
+            finally:
+                result.close()
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
+
+    def execute_guarded_select_query(
+        self,
+        query: str,
+        max_rows: int = QUERY_MAX_ROWS,
+        max_cost: float = QUERY_MAX_COST,
+        statement_timeout_ms: Optional[int] = None,
+    ) -> GuardedRows:
+        """
+        Executes a SELECT query that is not trusted, e.g. one written by an LLM, with bounded
+        memory and run time.
+
+        - Only a single SELECT statement is accepted.
+        - The query is wrapped in a LIMIT, so at most max_rows rows are ever fetched.
+        - On PostgreSQL, the query runs in a read-only savepoint with a statement timeout, and
+          its plan is checked with EXPLAIN first. Queries whose estimated cost is over max_cost
+          are rejected before they run.
+
+        Parameters:
+            query (str): The SELECT query.
+            max_rows (int): The maximum number of rows to return. Further rows are cut off.
+            max_cost (float): The maximum estimated cost of the plan, in PostgreSQL cost units.
+            statement_timeout_ms (int, optional): The maximum run time of the query.
+                Defaults to QUERY_STATEMENT_TIMEOUT_SECONDS.
+
+        Returns:
+            GuardedRows: The rows of the query, flagged as truncated if rows were cut off.
+
+        Raises:
+            QueryGuardError: If the query is not a single SELECT or its plan is too expensive.
+        """
+        sql_string_manager = SQLStringManager(query)
+        if not sql_string_manager.is_single_select_query():
+            raise QueryGuardError("Only a single SELECT query can be executed")
+
+        # Fetch one row more than allowed to detect truncated results. The query is run as
+        # written, on lines of its own so a trailing line comment cannot swallow the wrapper.
+        guarded_query = (
+            f"SELECT * FROM (\n{sql_string_manager.strip_query()}\n) AS guarded_query "
+            f"LIMIT {int(max_rows) + 1}"
+        )
+        if self.session.bind.dialect.name != "postgresql":
+            rows = self.session.execute(text(guarded_query)).fetchmany(max_rows + 1)
+            return self._format_guarded_rows(rows, max_rows)
+
+        if statement_timeout_ms is None:
+            statement_timeout_ms = int(QUERY_STATEMENT_TIMEOUT_SECONDS * 1000)
+
+        # The savepoint reverts the read-only mode and timeout afterwards, leaving the
+        # transaction of the session as it was
+        savepoint = self.session.begin_nested()
+        try:
+            self.session.execute(text("SET LOCAL transaction_read_only = on"))
+            self.set_statement_timeout(statement_timeout_ms)
+
+            plan = self.session.execute(
+                text(f"EXPLAIN (FORMAT JSON) {guarded_query}")
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            cost = plan[0]["Plan"]["Total Cost"]
+            if cost > max_cost:
+                raise QueryGuardError(
+                    f"The query is too expensive to run (estimated cost {cost:.0f}, "
+                    f"maximum {max_cost:.0f})"
+                )
+
+            rows = self.session.execute(text(guarded_query)).fetchmany(max_rows + 1)
+            return self._format_guarded_rows(rows, max_rows)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
+        finally:
+            savepoint.rollback()
+
+    @staticmethod
+    def _format_guarded_rows(rows: list, max_rows: int) -> GuardedRows:
+        truncated = len(rows) > max_rows
+        if truncated:
+            logger.warning(f"Query result truncated to {max_rows} rows")
+        return GuardedRows([dict(row) for row in rows[:max_rows]], truncated)
+
     def drop_table(self, table_name: str):
         try:
             drop_query = text(f"DROP TABLE {table_name};")
@@ -111,3 +401,25 @@ class SQLExecutor:
         except Exception as e:
             print(f"An error occurred: {e}")
             raise
+
+    def get_table_column_types(self, table_name: str) -> dict:
+        """
+        Returns the columns of a table with their types as produced by
+        SQLStringManager.map_to_postgres_type, in column order. Other types are reported as TEXT.
+        """
+        try:
+            inspector = inspect(self.session.bind)
+            column_types = {}
+            for column in inspector.get_columns(table_name):
+                column_types[column["name"]] = next(
+                    (
+                        postgres_type
+                        for sqlalchemy_type, postgres_type in COLUMN_TYPE_MAPPING
+                        if isinstance(column["type"], sqlalchemy_type)
+                    ),
+                    "TEXT",
+                )
+            return column_types
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
@@ -1,14 +1,37 @@
-from typing import Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 
 import pandas as pd
+import pyarrow as pa
+from database.llm_schema_cache_manager import LLMSchemaCacheManager
+from database.query_result_cache import QueryResultCache
 from database.sql_executor import SQLExecutor
 from database.table_map_manager import TableMapManager
 from database.table_metadata_manager import TableMetadataManager
+from database.table_routing_index import TableRoutingIndex
 from fastapi import HTTPException
 from llms.base import BaseLLM
 from models.table_map import TableMap
+from settings import (
+    TABLE_ROUTING_MIN_CONFIDENCE,
+    TABLE_ROUTING_MIN_MARGIN,
+    TABLE_ROUTING_TOP_K,
+)
 from sqlalchemy.orm import Session
 from utils.sql_string_manager import SQLStringManager
+from utils.type_coercion import coerce_records
+
+# Nullable pandas dtypes of the column types of SQLExecutor.get_table_column_types
+CHUNK_DTYPES = {"INTEGER": "Int64", "DECIMAL": "float64", "BOOLEAN": "boolean"}
+
+
+def _align_chunk_dtypes(chunk: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """Cast the columns of a chunk to the dtypes of the matching columns of its table."""
+    dtypes = {
+        column: CHUNK_DTYPES[column_types[column]]
+        for column in chunk.columns
+        if column_types.get(column) in CHUNK_DTYPES
+    }
+    return chunk.astype(dtypes) if dtypes else chunk
 
 
 class TableManager:
@@ -24,6 +47,7 @@ class TableManager:
     def __init__(self, session: Optional[Session] = None, llm: BaseLLM = None):
         self.session = session
         self.llm = llm
+        self.schema_cache_key: Optional[str] = None
 
     def _map_table_to_org(
         self, org_id: int, table_name: str, alias: Optional[str] = None
@@ -56,9 +80,13 @@ class TableManager:
             print(f"An error occurred: {e}")
             raise HTTPException(status_code=400, detail=str(e))
 
-    def create_table_with_llm(self, sample_content: str, header: str, extra_desc: str):
+    async def create_table_with_llm(
+        self, sample_content: str, header: str, extra_desc: str
+    ):
         """
         Creates a table using an LLM based on sample file content and a message.
+        The generated CREATE statement is cached by the content of the upload, so an
+        identical upload reuses it instead of calling the LLM again.
 
         Parameters:
         - sample_file_content (str): The sample file content used to create the table.
@@ -71,70 +99,182 @@ class TableManager:
             sql_executor = SQLExecutor(self.session)
             table_names = sql_executor.get_all_table_names_as_str()
 
-            raw_create_query = self.llm.generate_create_statement(
-                sample_content, header, table_names, extra_desc
+            cache_manager = LLMSchemaCacheManager(self.session)
+            self.schema_cache_key = cache_manager.build_cache_key(
+                header, sample_content, extra_desc
             )
+            cached_entry = cache_manager.get_entry(self.schema_cache_key)
+
+            if cached_entry:
+                # Only the columns are reused, the table itself gets a name that is not taken yet,
+                # e.g. when the same file is uploaded again as a new table
+                cached_manager = SQLStringManager(cached_entry.create_statement)
+                table_name = self._get_unused_table_name(
+                    cached_manager.get_table_from_create_query(),
+                    sql_executor.get_all_table_names_as_list(),
+                )
+                create_query = cached_manager.replace_table_in_create_query(table_name)
+            else:
+                raw_create_query = await self.llm.generate_create_statement(
+                    sample_content, header, table_names, extra_desc
+                )
 
-            create_query = SQLStringManager(
-                raw_create_query
-            ).extract_sql_query_from_text()  # Just in case
+                create_query = SQLStringManager(
+                    raw_create_query
+                ).extract_sql_query_from_text()  # Just in case
 
             if SQLStringManager(
                 create_query
             ).is_valid_create_table_query():  # Checks if the query is valid
                 sql_executor = SQLExecutor(self.session)
                 sql_executor.execute_create_query(create_query)
+                table_name = SQLStringManager(
+                    create_query
+                ).get_table_from_create_query()
+                TableRoutingIndex.invalidate(table_name)
+                # Results cached for an earlier table of the same name must not be served
+                QueryResultCache(self.session).invalidate_table(table_name)
+                if cached_entry:
+                    cache_manager.record_hit(cached_entry)
+                else:
+                    cache_manager.record_miss()
+                    cache_manager.save_create_statement(
+                        self.schema_cache_key, create_query
+                    )
                 return create_query
         except Exception as e:
             # Log the error message here
             print(f"An error occurred while creating the table: {str(e)}")
             return None
 
-    def create_table_desc_with_llm(
-        self, create_query: str, sample_content: str, extra_desc: str
+    @staticmethod
+    def _get_unused_table_name(table_name: str, existing_tables: List[str]) -> str:
+        """Return table_name, or table_name with the lowest numeric suffix that is not taken."""
+        taken = {name.lower() for name in existing_tables}
+        candidate = table_name
+        suffix = 2
+        while candidate.lower() in taken:
+            candidate = f"{table_name}_{suffix}"
+            suffix += 1
+        return candidate
+
+    async def create_table_desc_with_llm(
+        self, create_query: str, sample_content: str, extra_desc: str, org_id: int
     ):
         """
         Fetches and stores the description of a table created in LLM based on the CREATE TABLE query,
-        sample file content, and a message.
+        sample file content, and a message. Reuses the cached description of an identical upload
+        made by create_table_with_llm when there is one.
+
+        The metadata is stored together with the mapping of the table to the organization, so
+        determine_table finds the new table for later uploads of the same shape. When the
+        description cannot be generated, the metadata is stored without one.
 
         Parameters:
         - create_query (str): The CREATE TABLE query used to create the table.
         - sample_content (str): Sample file content used in table creation.
         - extra_desc (str): Additional message to give context to LLM for generating the table description.
+        - org_id (int): The organization the table belongs to.
         """
+        description = ""
         try:
-            # API call to generate and fetch table description
-            description = self.llm.generate_table_desc(
-                create_query, sample_content, extra_desc
+            cache_manager = LLMSchemaCacheManager(self.session)
+            cached_entry = (
+                cache_manager.get_entry(self.schema_cache_key)
+                if self.schema_cache_key
+                else None
             )
 
-            table_name = SQLStringManager(create_query).get_table_from_create_query()
-
-            # Store description in separate table
-            manager = TableMetadataManager(self.session)
-            manager.add_table_metadata(table_name, create_query, description)
-
+            if cached_entry and cached_entry.description:
+                description = cached_entry.description
+            else:
+                # API call to generate and fetch table description
+                description = await self.llm.generate_table_desc(
+                    create_query, sample_content, extra_desc
+                )
+                if self.schema_cache_key:
+                    cache_manager.save_description(self.schema_cache_key, description)
         except Exception as e:
             # Log the error message here
             print(f"An error occurred while fetching table description: {str(e)}")
-            return None
 
-    def determine_table(self, sample_content: str, extra_desc: str) -> str:
+        table_name = SQLStringManager(create_query).get_table_from_create_query()
+
+        # Store description in separate table and map the table to the organization
+        manager = TableMetadataManager(self.session)
+        manager.add_table_metadata(table_name, create_query, description, org_id)
+
+    def get_schema_cache_stats(self) -> dict:
+        """Returns hit-rate metrics of the LLM schema cache."""
+        cache_manager = LLMSchemaCacheManager(self.session)
+        stats: dict = cache_manager.get_stats()
+        return stats
+
+    async def determine_table(
+        self,
+        sample_content: str,
+        extra_desc: str,
+        header: Optional[str] = None,
+        org_id: Optional[int] = None,
+    ) -> str:
         """
         Determines the appropriate table based on sample data and a message, returns that table's name.
 
+        The sample is first matched against the column signatures of the existing tables. If the best
+        match is confident enough it is returned directly, otherwise only the top-k candidates are sent
+        to the LLM to decide. Candidates with equal signature scores are ordered by the BM25
+        relevance of their metadata to the sample. Only the tables of the organization are
+        considered.
+
         Parameters:
         - sample_content (str): The sample content for table determination.
         - extra_desc (str): Additional metadata or instructions.
+        - header (str, optional): The header of the uploaded file, if it has one.
+        - org_id (int): The organization whose tables are candidates.
 
         Returns:
         - table_name: str containing the table's name.
+
+        Side-effects:
+        - Raises an HTTPException if no organization is given.
         """
+        if org_id is None:
+            # Never fall back to the tables of every organization
+            raise HTTPException(
+                status_code=400, detail="The user does not belong to an organization"
+            )
+
         manager = TableMetadataManager(self.session)
-        table_metadata = manager.get_metadata()
-        formatted_table_metadata = manager.format_table_metadata_for_llm(table_metadata)
+        table_metadata = manager.get_org_metadata(org_id)
+        if not table_metadata:
+            return ""
 
-        table_name: str = self.llm.fetch_table_name_from_sample(
+        routing_index = TableRoutingIndex(self.session)
+        ranked_tables = routing_index.rank_tables(
+            [row.table_name for row in table_metadata], sample_content, header
+        )
+        relevance = manager.rank_metadata_by_relevance(
+            table_metadata, f"{header or ''} {sample_content} {extra_desc}"
+        )
+        ranked_tables.sort(key=lambda item: (item[1], relevance[item[0]]), reverse=True)
+
+        best_table: str = ranked_tables[0][0]
+        best_score = ranked_tables[0][1]
+        runner_up_score = ranked_tables[1][1] if len(ranked_tables) > 1 else 0.0
+        if (
+            best_score >= TABLE_ROUTING_MIN_CONFIDENCE
+            and best_score - runner_up_score >= TABLE_ROUTING_MIN_MARGIN
+        ):
+            return best_table
+
+        # Only send the most likely candidates to the LLM
+        candidate_names = {name for name, _ in ranked_tables[:TABLE_ROUTING_TOP_K]}
+        candidates = [
+            row for row in table_metadata if row.table_name in candidate_names
+        ]
+        formatted_table_metadata = manager.format_table_metadata_for_llm(candidates)
+
+        table_name: str = await self.llm.fetch_table_name_from_sample(
             sample_content, extra_desc, formatted_table_metadata
         )
         return table_name
@@ -143,6 +283,8 @@ class TableManager:
         try:
             executor = SQLExecutor(self.session)
             executor.append_df_to_table(df, table_name)
+            TableRoutingIndex.invalidate(table_name)
+            QueryResultCache(self.session).invalidate_table(table_name)
             self._map_table_to_org(org_id, table_name)
         except Exception as e:
             print(f"An error occurred: {e}")
@@ -164,22 +306,114 @@ class TableManager:
 
         Side-effects:
         - Appends data to the table determined by the LLM.
+        - Invalidates the cached query results of the table.
         - Raises an HTTPException if the table name cannot be determined.
         """
 
         if table_name:
             sql_executor = SQLExecutor(self.session)
             sql_executor.append_df_to_table(processed_df, table_name)
+            QueryResultCache(self.session).invalidate_table(table_name)
         else:
             raise HTTPException(
                 status_code=400, detail="Could not determine table name"
             )
 
+    def append_chunks_to_table(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        table_name: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """
+        Appends a stream of DataFrame chunks to the given table in a single transaction.
+
+        The dtypes of every chunk are set from the column types of the table, so a column is
+        loaded the same way whether or not a chunk happens to contain missing or fractional
+        values. Either all chunks are appended or, if any chunk fails, none of them.
+
+        Parameters:
+        - chunks (Iterable[pd.DataFrame]): The chunks to append, e.g. from process_file.
+        - table_name (str): The name of the table to append to.
+        - on_progress (Callable, optional): Called after each chunk with the number of chunks and rows loaded so far.
+
+        Returns:
+        - int: The total number of rows appended.
+
+        Side-effects:
+        - Invalidates the cached query results of the table once all chunks are appended.
+        - Raises an HTTPException if the table name cannot be determined or a chunk does not
+          match the column types of the table.
+        """
+        if not table_name:
+            raise HTTPException(
+                status_code=400, detail="Could not determine table name"
+            )
+
+        sql_executor = SQLExecutor(self.session)
+        column_types = sql_executor.get_table_column_types(table_name)
+        total_rows = 0
+        try:
+            for chunk_count, chunk in enumerate(chunks, start=1):
+                chunk = _align_chunk_dtypes(chunk, column_types)
+                sql_executor.append_df_to_table(chunk, table_name, commit=False)
+                total_rows += len(chunk)
+                if on_progress:
+                    on_progress(chunk_count, total_rows)
+            sql_executor.session.commit()
+        except (TypeError, ValueError) as e:
+            sql_executor.session.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if total_rows:
+            QueryResultCache(self.session).invalidate_table(table_name)
+        return total_rows
+
+    def insert_extracted_records(self, records: List[dict], table_name: str) -> dict:
+        """
+        Validates extracted records against the column types of a data profile table and
+        inserts the valid ones.
+
+        Values are coerced column by column to the types of the table. All valid rows are
+        loaded in a single transaction with a single COPY, rows with invalid values are
+        skipped and reported.
+
+        Parameters:
+        - records (List[dict]): The extracted records, e.g. from a data profile preview.
+        - table_name (str): The table of the data profile.
+
+        Returns:
+        - dict: The number of rows inserted and the errors of the skipped rows.
+        """
+        sql_executor = SQLExecutor(self.session)
+        try:
+            column_types = sql_executor.get_table_column_types(table_name)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not column_types:
+            raise HTTPException(status_code=404, detail="Table not found")
+
+        df, errors = coerce_records(records, column_types)
+        if not df.empty:
+            try:
+                sql_executor.append_df_to_table(df, table_name, chunk_size=len(df))
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            QueryResultCache(self.session).invalidate_table(table_name)
+
+        return {
+            "rows_inserted": len(df),
+            "rows_skipped": len({error["row"] for error in errors}),
+            "errors": errors,
+        }
+
     def drop_table(self, table_name: str):
         # Logic to drop a table
         try:
             executor = SQLExecutor(self.session)
             executor.drop_table(table_name)
+            TableRoutingIndex.invalidate(table_name)
+            QueryResultCache(self.session).invalidate_table(table_name)
         except Exception as e:
             print(f"An error occurred: {e}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -193,6 +427,61 @@ class TableManager:
             print(f"An error occurred: {e}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    def execute_guarded_select_query(self, query: str) -> List[dict]:
+        """Executes an untrusted SELECT query with row caps, a timeout and a cost check."""
+        try:
+            executor = SQLExecutor(self.session)
+            result: List[dict] = executor.execute_guarded_select_query(query)
+            return result
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def stream_table_rows(
+        self, table_name: str, limit: Optional[int] = None
+    ) -> Iterator[List[dict]]:
+        """
+        Streams the rows of a table in batches through a server-side cursor.
+
+        Parameters:
+        - table_name (str): The name of an existing table.
+        - limit (int, optional): The maximum number of rows, e.g. for a preview.
+
+        Yields:
+        - List[dict]: The next batch of rows.
+        """
+        executor = SQLExecutor(self.session)
+        yield from executor.stream_select_query(
+            self._get_table_rows_query(table_name, limit)
+        )
+
+    def stream_table_record_batches(
+        self, table_name: str, limit: Optional[int] = None
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Streams the rows of a table as Apache Arrow record batches through a server-side cursor.
+
+        Parameters:
+        - table_name (str): The name of an existing table.
+        - limit (int, optional): The maximum number of rows, e.g. for a preview.
+
+        Yields:
+        - pa.RecordBatch: The next batch of rows.
+        """
+        executor = SQLExecutor(self.session)
+        yield from executor.stream_select_query_as_arrow(
+            self._get_table_rows_query(table_name, limit)
+        )
+
+    def _get_table_rows_query(self, table_name: str, limit: Optional[int]) -> str:
+        if table_name not in self.list_all_tables():
+            raise HTTPException(status_code=404, detail="Table not found")
+
+        query = f'SELECT * FROM "{table_name}"'
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return query
+
     def get_table_columns(self, table_name: str):
         """Returns a list of all of the columns present within the table."""
         try:
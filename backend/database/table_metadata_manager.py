@@ -2,10 +2,12 @@
 This module provides a TableMetadataManager class to manage operations related to the TableMetadata model.
 It facilitates CRUD operations and formatting of table metadata information.
 """
-from typing import List
+from typing import Dict, List, Optional
 
+from models.table_map import TableMap
 from models.table_metadata import TableMetadata
 from sqlalchemy.orm import Session
+from utils.bm25 import BM25Index
 
 
 class TableMetadataManager:
@@ -42,6 +44,69 @@ class TableMetadataManager:
             print(f"Database error: {str(e)}")
             return []
 
+    def get_org_metadata(self, org_id: int) -> List[TableMetadata]:
+        """
+        Retrieve the metadata of the tables mapped to an organization.
+
+        Args:
+            org_id (int): The ID of the organization.
+
+        Returns:
+            List[TableMetadata]: List of TableMetadata objects of the organization's tables.
+        """
+        try:
+            table_metadatas: List[TableMetadata] = (
+                self.db_session.query(TableMetadata)
+                .join(TableMap, TableMap.table_name == TableMetadata.table_name)
+                .filter(TableMap.organization_id == org_id)
+                .all()
+            )
+            return table_metadatas
+        except Exception as e:
+            print(f"Database error: {str(e)}")
+            return []
+
+    def rank_metadata_by_relevance(
+        self, rows: List[TableMetadata], query: str
+    ) -> Dict[str, float]:
+        """
+        Score table metadata against a request with a local BM25 index.
+
+        Args:
+            rows (List[TableMetadata]): The metadata to rank.
+            query (str): The request, e.g. a sample of uploaded data or a user message.
+
+        Returns:
+            Dict[str, float]: The BM25 score of each table, keyed by table name.
+        """
+        documents = [
+            f"{row.table_name} {row.create_statement} {row.description}" for row in rows
+        ]
+        scores = BM25Index(documents).get_scores(query)
+        return {row.table_name: score for row, score in zip(rows, scores)}
+
+    def get_relevant_metadata(
+        self, org_id: int, query: str, k: int
+    ) -> List[TableMetadata]:
+        """
+        Retrieve the k tables of an organization that are most relevant to a request.
+
+        Keeps prompts built from table metadata at a constant size no matter how many
+        tables exist, since only the organization's tables are searched and only k are returned.
+
+        Args:
+            org_id (int): The ID of the organization.
+            query (str): The request to match the tables against.
+            k (int): The maximum number of tables to return.
+
+        Returns:
+            List[TableMetadata]: The k most relevant TableMetadata objects, best match first.
+        """
+        rows = self.get_org_metadata(org_id)
+        scores = self.rank_metadata_by_relevance(rows, query)
+        rows.sort(key=lambda row: scores[row.table_name], reverse=True)
+        return rows[:k]
+
     def get_metadata(self, table_name: str) -> TableMetadata:
         """Retrieve metadata for a single table"""
         try:
@@ -69,7 +134,13 @@ class TableMetadataManager:
         )
         return formatted_metadata
 
-    def add_table_metadata(self, table_name: str, create_query: str, description: str):
+    def add_table_metadata(
+        self,
+        table_name: str,
+        create_query: str,
+        description: str,
+        org_id: Optional[int] = None,
+    ):
         """
         Store table metadata in the database.
 
@@ -77,6 +148,8 @@ class TableMetadataManager:
             table_name (str): Name of the table.
             create_query (str): SQL create statement of the table.
             description (str): Description of the table.
+            org_id (int, optional): The organization to map the table to, in the same transaction,
+                so the table is found by the organization's later uploads.
         """
         try:
             table_metadata = TableMetadata(
@@ -85,7 +158,22 @@ class TableMetadataManager:
                 description=description,
             )
             self.db_session.merge(table_metadata)
+            if org_id is not None:
+                is_mapped = (
+                    self.db_session.query(TableMap)
+                    .filter(TableMap.table_name == table_name)
+                    .first()
+                )
+                if not is_mapped:
+                    self.db_session.add(
+                        TableMap(
+                            organization_id=org_id,
+                            table_name=table_name,
+                            table_alias=table_name,
+                        )
+                    )
             self.db_session.commit()
         except Exception as e:
             # Handle exception
+            self.db_session.rollback()
             print(f"Database error: {str(e)}")
@@ -0,0 +1,174 @@
+"""
+This module provides a TableRoutingIndex class that matches uploaded samples to existing tables.
+
+Table signatures (column names, coarse column types and a fingerprint of both) are read from the
+database once and kept in a process-wide cache. Incoming samples are scored against them locally,
+so a known file shape can be routed without asking the LLM.
+"""
+import hashlib
+import warnings
+from dataclasses import dataclass
+from io import StringIO
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from settings import TABLE_ROUTING_SIGNATURE_TTL_SECONDS
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, inspect
+from sqlalchemy.orm import Session
+from utils.cache import TTLCache
+
+# Cache of TableSignature objects keyed by table name
+table_signature_cache = TTLCache(max_size=4096, ttl=TABLE_ROUTING_SIGNATURE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class TableSignature:
+    """
+    Describes the shape of a table or of an uploaded sample.
+
+    Attributes:
+        columns (Tuple[str, ...]): The lowercase column names in order.
+        kinds (Tuple[str, ...]): The coarse type of each column: "boolean", "numeric", "date" or "text".
+        fingerprint (str): A hash of the column names and kinds, independent of column order.
+    """
+
+    columns: Tuple[str, ...]
+    kinds: Tuple[str, ...]
+    fingerprint: str
+
+    @classmethod
+    def from_columns(cls, columns: List[str], kinds: List[str]) -> "TableSignature":
+        pairs = sorted(zip(columns, kinds))
+        fingerprint = hashlib.sha256(repr(pairs).encode("utf-8")).hexdigest()
+        return cls(tuple(columns), tuple(kinds), fingerprint)
+
+
+def _kind_from_sql_type(sql_type) -> str:
+    if isinstance(sql_type, Boolean):
+        return "boolean"
+    if isinstance(sql_type, (Integer, Numeric, Float)):
+        return "numeric"
+    if isinstance(sql_type, (Date, DateTime)):
+        return "date"
+    return "text"
+
+
+def _kind_from_series(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    values = series.dropna()
+    if not values.empty:
+        with warnings.catch_warnings():
+            # Mixed samples make pandas warn about falling back to dateutil
+            warnings.simplefilter("ignore", UserWarning)
+            parsed = pd.to_datetime(values, errors="coerce")
+        if parsed.notna().all():
+            return "date"
+    return "text"
+
+
+class TableRoutingIndex:
+    """
+    Scores existing tables against an uploaded sample using their column signatures.
+
+    Attributes:
+        session (Session): An active database session used to read table schemas.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    @staticmethod
+    def invalidate(table_name: str):
+        """Remove a table from the signature cache, e.g. after it was created or dropped."""
+        table_signature_cache.invalidate(table_name)
+
+    def get_table_signature(self, table_name: str) -> Optional[TableSignature]:
+        """Get the signature of an existing table, reading its schema on a cache miss."""
+        signature: Optional[TableSignature] = table_signature_cache.get(table_name)
+        if signature is not None:
+            return signature
+
+        try:
+            columns = inspect(self.session.bind).get_columns(table_name)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+        signature = TableSignature.from_columns(
+            [column["name"].lower() for column in columns],
+            [_kind_from_sql_type(column["type"]) for column in columns],
+        )
+        table_signature_cache.set(table_name, signature)
+        return signature
+
+    @staticmethod
+    def get_sample_signature(sample_content: str) -> Optional[TableSignature]:
+        """Get the signature of an uploaded sample as produced by process_file."""
+        try:
+            df = pd.read_csv(StringIO(sample_content))
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+
+        columns = [str(column).lower() for column in df.columns]
+        kinds = [_kind_from_series(df[column]) for column in df.columns]
+        return TableSignature.from_columns(columns, kinds)
+
+    @staticmethod
+    def score(sample: TableSignature, table: TableSignature, has_header: bool) -> float:
+        """
+        Score how well a sample matches a table, from 0 to 1.
+
+        With a header, the score combines the overlap of column names with the share of shared
+        columns whose types are compatible. Without a header only the column count and the
+        positional types can be compared, so the score never reaches full confidence.
+        """
+        if has_header and sample.fingerprint == table.fingerprint:
+            return 1.0
+
+        if not has_header:
+            if len(sample.kinds) != len(table.kinds) or not sample.kinds:
+                return 0.0
+            matches = sum(
+                table_kind in (sample_kind, "text")
+                for sample_kind, table_kind in zip(sample.kinds, table.kinds)
+            )
+            return 0.8 * matches / len(sample.kinds)
+
+        sample_kinds = dict(zip(sample.columns, sample.kinds))
+        table_kinds = dict(zip(table.columns, table.kinds))
+        common = set(sample_kinds) & set(table_kinds)
+        union = set(sample_kinds) | set(table_kinds)
+        if not common:
+            return 0.0
+
+        name_score = len(common) / len(union)
+        type_score = sum(
+            table_kinds[column] in (sample_kinds[column], "text") for column in common
+        ) / len(common)
+        return 0.7 * name_score + 0.3 * type_score
+
+    def rank_tables(
+        self, table_names: List[str], sample_content: str, header: Optional[str]
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank the given tables by how well they match the sample.
+
+        Returns:
+            List[Tuple[str, float]]: Table names with their scores, best match first.
+        """
+        sample = self.get_sample_signature(sample_content)
+        if sample is None:
+            return [(table_name, 0.0) for table_name in table_names]
+
+        scores: Dict[str, float] = {}
+        for table_name in table_names:
+            table = self.get_table_signature(table_name)
+            scores[table_name] = (
+                self.score(sample, table, has_header=bool(header)) if table else 0.0
+            )
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,64 @@
+from typing import Dict, Iterable
+
+from models.table_version import TableVersion
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+
+class TableVersionManager:
+    """
+    A class to manage operations related to the TableVersion model.
+
+    Attributes:
+        db_session (Session): An active database session for performing operations.
+    """
+
+    def __init__(self, db_session: Session):
+        """
+        Initializes the TableVersionManager with the given database session.
+
+        Args:
+            db_session (Session): The database session to be used for operations.
+        """
+        self.db_session = db_session
+
+    def get_versions(self, table_names: Iterable[str]) -> Dict[str, int]:
+        """Get the versions of the tables. Tables that were never written to have version 0."""
+        versions = {table_name: 0 for table_name in table_names}
+        if not versions:
+            return versions
+
+        rows = (
+            self.db_session.query(TableVersion.table_name, TableVersion.version)
+            .filter(TableVersion.table_name.in_(list(versions)))
+            .all()
+        )
+        versions.update({table_name: version for table_name, version in rows})
+        return versions
+
+    def increment_version(self, table_name: str):
+        """Increment the version of a table after its data has changed."""
+        try:
+            updated = (
+                self.db_session.query(TableVersion)
+                .filter(TableVersion.table_name == table_name)
+                .update(
+                    {
+                        TableVersion.version: TableVersion.version + 1,
+                        TableVersion.updated_at: func.now(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                self.db_session.add(TableVersion(table_name=table_name, version=1))
+            self.db_session.commit()
+        except IntegrityError:
+            # Another process inserted the first version concurrently
+            self.db_session.rollback()
+            self.increment_version(table_name)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            self.db_session.rollback()
+            raise
@@ -5,7 +5,14 @@ It uses SQLAlchemy for ORM operations and facilitates CRUD operations on user da
 from typing import Optional
 
 from models.user import User, UserRole
+from settings import USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS
 from sqlalchemy.orm import Session
+from utils.cache import TTLCache
+
+# Cache of UserPrincipal snapshots keyed by username (the token subject)
+user_principal_cache = TTLCache(
+    max_size=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS
+)
 
 
 class UserManager:
@@ -25,6 +32,11 @@ class UserManager:
         """
         self.db_session = session
 
+    def _invalidate_cached_user(self, db_user: Optional[User]):
+        """Remove the cached principal of the user so the next request reloads it."""
+        if db_user is not None:
+            user_principal_cache.invalidate(db_user.username)
+
     def get_user_by_email(self, email: str) -> User:
         """
         Get a user based on their email.
@@ -139,6 +151,7 @@ class UserManager:
                 db_user.refresh_token = refresh_token
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def update_refresh_token(self, user_id: int, refresh_token: str):
@@ -147,6 +160,7 @@ class UserManager:
             db_user.refresh_token = refresh_token
         self.db_session.commit()
         self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def update_user_by_username(
@@ -158,6 +172,7 @@ class UserManager:
             db_user.role = role
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def delete_user(self, user_id: int):
@@ -174,6 +189,7 @@ class UserManager:
         if db_user:
             self.db_session.delete(db_user)
             self.db_session.commit()
+            self._invalidate_cached_user(db_user)
             return db_user
 
     def update_user_password(self, username: str, new_hashed_password: str):
@@ -192,6 +208,7 @@ class UserManager:
             db_user.hashed_password = new_hashed_password
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def update_user_verification_token(self, username: str, verification_token: str):
@@ -210,6 +227,7 @@ class UserManager:
             db_user.verification_token = verification_token
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def update_user_email_verified(self, username: str):
@@ -227,6 +245,7 @@ class UserManager:
             db_user.email_verified = True
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def update_user_requires_password_update(
@@ -246,6 +265,7 @@ class UserManager:
             db_user.requires_password_update = requires_password_update
             self.db_session.commit()
             self.db_session.refresh(db_user)
+        self._invalidate_cached_user(db_user)
         return db_user
 
     def delete_user_by_username(self, username: str) -> User:
@@ -262,4 +282,5 @@ class UserManager:
         if db_user:
             self.db_session.delete(db_user)
             self.db_session.commit()
+        self._invalidate_cached_user(db_user)
         return db_user
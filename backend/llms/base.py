@@ -1,3 +1,6 @@
+from typing import AsyncIterator
+
+
 class BaseLLM:
     def __init__(self):
         pass
@@ -5,12 +8,18 @@ class BaseLLM:
     def api_call(self, endpoint: str, payload: dict) -> str:
         raise NotImplementedError
 
-    def generate_text(self, prompt: str) -> str:
+    async def generate_text(self, prompt: str) -> str:
         """
         Generate text based on the given prompt
         """
         raise NotImplementedError("This method should be overridden by subclass")
 
+    def generate_text_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Generate text based on the given prompt, yielding it as it is generated
+        """
+        raise NotImplementedError("This method should be overridden by subclass")
+
     async def generate_create_statement(
         self,
         sample_content: str,
@@ -25,7 +34,7 @@ class BaseLLM:
     ) -> str:
         raise NotImplementedError
 
-    def fetch_table_name_from_sample(
+    async def fetch_table_name_from_sample(
         self, sample_content: str, extra_desc: str, table_metadata: str
     ) -> str:
         raise NotImplementedError
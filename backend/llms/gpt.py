@@ -1,22 +1,39 @@
+import asyncio
 import json
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import openai
 import tiktoken
 from database.chat_history_manager import ChatHistoryManager
 from database.database_manager import DatabaseManager
+from llms.llm_client import llm_client
 from llms.prompt_manager import PromptManager
 from llms.system_message_manager import SystemMessageManager
 from models.data_profile import DataProfile
-from models.user import User
-from openai import ChatCompletion
-from settings import OPENAI_API_KEY
+from models.user import UserPrincipal
+from settings import (
+    EXTRACTION_GROUP_MAX_PAGES,
+    EXTRACTION_MAX_RESPONSE_TOKENS,
+    VISION_TOKEN_BUDGET,
+)
+from utils.extraction_planner import merge_rows, plan_page_groups
 from utils.file_manager import FileManager
+from utils.image_preprocessor import PreparedImage, count_image_tokens
+from utils.incremental_json import IncrementalJSONParser
 from utils.nivo_assistant import NivoAssistant
 
 from .base import BaseLLM
 
 
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the tiktoken encoding for a model. Encodings are loaded once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
 class GPTLLM(BaseLLM):
     """
     A class representing a GPT-based Language Learning Model (LLM) with chat history storage capabilities.
@@ -26,10 +43,12 @@ class GPTLLM(BaseLLM):
     It is designed to be flexible for different users, requests, and chat session management.
     """
 
+    vision_model = "gpt-4-vision-preview"
+
     def __init__(
         self,
         chat_id: Optional[int],
-        user: User = None,
+        user: UserPrincipal = None,
         store_history: bool = False,
         llm_type: str = "generic",
         database_type: str = "postgres",
@@ -48,7 +67,7 @@ class GPTLLM(BaseLLM):
         database_type (str, optional): Specifies the type of database being used, such as "postgres". Defaults to "postgres".
 
         Note:
-        - The OPENAI_API_KEY is required and used to authenticate with the OpenAI API.
+        - Requests go through the shared llm_client, which authenticates with the OPENAI_API_KEY.
         - The model is set to "gpt-4-1106-preview" and the maximum token limit is set to 8192 as of October 2023.
         - If 'chat_id' is provided and 'store_history' is True, the chat history will be fetched from the database.
         - The history of the chat is maintained in a list, which is empty by default unless fetched from the database.
@@ -59,18 +78,23 @@ class GPTLLM(BaseLLM):
         self.user_id = user.id
         self.organization_id = user.organization_id
 
-        openai.api_key = OPENAI_API_KEY
         self.database_type = database_type
         self.llm_type = llm_type
         self.model = "gpt-4-1106-preview"
         self.max_tokens = 8192  # As of Oct 2023
+        self.max_response_tokens = 1000
         self.is_system_added = False  # Flag to check if system message is added
         self.response_format = {"type": ""}
         self.store_history = store_history
         self.history = self._set_init_history()
+        self.history_token_counts: List[int] = [
+            self._count_message_tokens(message) for message in self.history
+        ]
+        self.total_tokens = sum(self.history_token_counts)
 
-        # Vision settings
-        self.image_detail = "high"
+        # Vision settings, prepared images are keyed by their URL
+        self.images: Dict[str, PreparedImage] = {}
+        self.default_image_detail = "high"
 
         # Managers
         self.file_manager = FileManager()
@@ -94,7 +118,7 @@ class GPTLLM(BaseLLM):
 
     def _set_model(self, model_type: str):
         if model_type == "img":
-            self.model = "gpt-4-vision-preview"
+            self.model = self.vision_model
         else:
             self.model = "gpt-4-1106-preview"
 
@@ -103,78 +127,111 @@ class GPTLLM(BaseLLM):
         params = {
             "model": self.model,
             "messages": payload["messages"],
-            "max_tokens": 1000,
+            "max_tokens": self.max_response_tokens,
+        }
+        if self.response_format["type"]:
+            params["response_format"] = self.response_format
+
+        completion = await llm_client.chat_completion(
+            params, organization_id=self.organization_id
+        )
+        content: str = completion["choices"][0]["message"]["content"]
+        return content
+
+    def _api_call_stream(self, payload: dict) -> AsyncIterator[str]:
+        """Make a streaming API call that yields the response as it is generated."""
+        params = {
+            "model": self.model,
+            "messages": payload["messages"],
+            "max_tokens": self.max_response_tokens,
         }
         if self.response_format["type"]:
             params["response_format"] = self.response_format
 
-        completion: ChatCompletion = await openai.ChatCompletion.acreate(**params)
-        return str(
-            completion.choices[0].message.content
-        )  # TODO: Typecasting is not recommended for mypy
+        stream: AsyncIterator[str] = llm_client.stream_chat_completion(
+            params, organization_id=self.organization_id
+        )
+        return stream
 
     def _count_tokens(self, text: str) -> int:
         """Count the number of tokens in the given text."""
-        encoding = tiktoken.encoding_for_model(self.model)
+        encoding = get_encoding(self.model)
         token_count = len(
             encoding.encode(text)
         )  # Use the .encode() method to tokenize and count the tokens
         return token_count
 
-    def _count_image_tokens(self, width: int, height: int) -> int:
-        """Count the number of tokens in the given image."""
-        if max(width, height) > 2048:
-            aspect_ratio = width / height
-            if width > height:
-                width = 2048
-                height = int(width / aspect_ratio)
-            else:
-                height = 2048
-                width = int(height * aspect_ratio)
-
-        # Scale down such that the shortest side is 768px long
-        aspect_ratio = width / height
-        if width < height:
-            width = 768
-            height = int(width / aspect_ratio)
-        else:
-            height = 768
-            width = int(height * aspect_ratio)
-
-        # Count how many 512px squares the image consists of
-        num_squares = (width // 512) * (height // 512)
-
-        # Each square costs 170 tokens, and 85 tokens are always added to the final total
-        token_cost = 170 * num_squares + 85
+    def _count_image_tokens(self, url: str) -> int:
+        """Count the number of tokens of an image, using its real size if it was prepared."""
+        image = self.images.get(url)
+        # Images loaded from stored history have no known size
+        tokens: int = (
+            image.tokens
+            if image
+            else count_image_tokens(1024, 1024, self.default_image_detail)
+        )
+        return tokens
 
-        return token_cost
+    def _count_message_tokens(self, message: dict) -> int:
+        """Count the tokens of a message whose content is either a string or a list of text and image parts."""
+        content = message["content"]
+        if isinstance(content, str):
+            return self._count_tokens(content)
 
-    def _total_tokens(self) -> int:
-        """Calculate total tokens in the given history."""
         total_tokens = 0
-        for message in self.history:
-            content = message["content"]
-            if isinstance(content, str):
-                total_tokens += self._count_tokens(content)
-            elif isinstance(content, list):
-                for item in content:
-                    if isinstance(item, dict) and "image_url" in item:
-                        total_tokens += self._count_image_tokens(
-                            1024, 1024
-                        )  # Adjust these values based on your image's actual dimensions
+        if isinstance(content, list):
+            for item in content:
+                if not isinstance(item, dict):
+                    continue
+                if item.get("type") == "text":
+                    total_tokens += self._count_tokens(item.get("text", ""))
+                elif "image_url" in item:
+                    total_tokens += self._count_image_tokens(item["image_url"]["url"])
         return total_tokens
 
+    def _total_tokens(self) -> int:
+        """Get the total tokens in the history, which is kept up to date incrementally."""
+        return self.total_tokens
+
+    def _append_to_history(self, message: dict):
+        """Append a message to the history and add its tokens to the running total."""
+        token_count = self._count_message_tokens(message)
+        self.history.append(message)
+        self.history_token_counts.append(token_count)
+        self.total_tokens += token_count
+
+    def _insert_into_history(self, index: int, message: dict):
+        """Insert a message into the history and add its tokens to the running total."""
+        token_count = self._count_message_tokens(message)
+        self.history.insert(index, message)
+        self.history_token_counts.insert(index, token_count)
+        self.total_tokens += token_count
+
+    def _replace_in_history(self, index: int, message: dict):
+        """Replace a message in the history and update the running total."""
+        token_count = self._count_message_tokens(message)
+        self.total_tokens += token_count - self.history_token_counts[index]
+        self.history[index] = message
+        self.history_token_counts[index] = token_count
+
+    def _pop_from_history(self, index: int) -> dict:
+        """Remove a message from the history and subtract its tokens from the running total."""
+        self.total_tokens -= self.history_token_counts.pop(index)
+        message: dict = self.history.pop(index)
+        return message
+
     def _truncate_history(self):
         """Truncate history to fit within token limits."""
-        tokens = self._total_tokens()
-
         index_to_start = (
             1 if self.is_system_added else 0
         )  # Skip the system message if it exists
 
-        while tokens > self.max_tokens:
-            removed_message = self.history.pop(index_to_start)
-            tokens -= self._count_tokens(removed_message["content"])
+        # Always keep the latest message
+        while (
+            self.total_tokens > self.max_tokens
+            and len(self.history) > index_to_start + 1
+        ):
+            self._pop_from_history(index_to_start)
 
     def _get_system_message_content(self, assistant_type: str = "generic") -> str:
         """Generate a system message based on the assistant type."""
@@ -192,12 +249,16 @@ class GPTLLM(BaseLLM):
             content.append(
                 {
                     "type": "image_url",
-                    "image_url": {"url": url, "detail": self.image_detail},
+                    "image_url": {"url": url, "detail": self._get_image_detail(url)},
                 }
             )
 
         return {"role": role, "content": content}
 
+    def _get_image_detail(self, url: str) -> str:
+        image = self.images.get(url)
+        return image.detail if image else self.default_image_detail
+
     def _add_system_message(self, assistant_type: str) -> None:
         """
         Adds a system message based on the given assistant type.
@@ -208,14 +269,10 @@ class GPTLLM(BaseLLM):
 
         if self.is_system_added:
             # Replace the existing system message
-            self.history[0] = system_message
+            self._replace_in_history(0, system_message)
         else:
-            if len(self.history) > 0:
-                # Shift existing history to make room for the new system message at the beginning
-                self.history = [system_message] + self.history
-            else:
-                # If history is empty, simply add the system message
-                self.history.append(system_message)
+            # Add the system message at the beginning of the history
+            self._insert_into_history(0, system_message)
 
             self.is_system_added = True
 
@@ -225,23 +282,45 @@ class GPTLLM(BaseLLM):
         self, prompt: str, jpg_presigned_urls: List[str] = []
     ) -> str:
         user_message = self._create_message("user", prompt, jpg_presigned_urls)
-        self.history.append(user_message)
+        self._append_to_history(user_message)
 
         # Check token limit and truncate history if needed
         self._truncate_history()
 
         # Make API call
         assistant_message_content = await self._api_call({"messages": self.history})
-        assistant_message = self._create_message("assistant", assistant_message_content)
+        self._add_assistant_reply(user_message, assistant_message_content)
+
+        return assistant_message_content
 
-        # Append assistant's reply to history
-        self.history.append(assistant_message)
+    async def _send_and_receive_message_stream(
+        self, prompt: str, jpg_presigned_urls: List[str] = []
+    ) -> AsyncIterator[str]:
+        """
+        Like _send_and_receive_message, but yields the reply as it is generated.
+        The reply is added to the history and saved once the stream completes.
+        """
+        user_message = self._create_message("user", prompt, jpg_presigned_urls)
+        self._append_to_history(user_message)
+
+        # Check token limit and truncate history if needed
+        self._truncate_history()
+
+        chunks = []
+        async for chunk in self._api_call_stream({"messages": self.history}):
+            chunks.append(chunk)
+            yield chunk
+
+        self._add_assistant_reply(user_message, "".join(chunks))
+
+    def _add_assistant_reply(self, user_message: dict, assistant_message_content: str):
+        """Append the assistant's reply to the history and save the exchange if history is stored."""
+        assistant_message = self._create_message("assistant", assistant_message_content)
+        self._append_to_history(assistant_message)
 
         if self.store_history:
             self._save_messages(user_message, assistant_message)
 
-        return assistant_message_content
-
     def _save_messages(self, user_message, assistant_message):
         """
         Saves the user's message and the assistant's response to the database.
@@ -340,10 +419,10 @@ class GPTLLM(BaseLLM):
 
         return gpt_response
 
-    async def generate_chart_config(
+    def _create_chart_config_prompt(
         self, msg: str, table_metadata: str, chart_type: str, nivo_config: dict
-    ):
-        """Generate the full chart configuration."""  # TODO: Make chart_type dynamic, LLM should pick
+    ) -> str:
+        """Set up the assistant for chart configs and build the prompt."""  # TODO: Make chart_type dynamic, LLM should pick
         self._add_system_message(assistant_type="nivo_charts")
         self._set_response_format(is_json=True)
 
@@ -353,9 +432,18 @@ class GPTLLM(BaseLLM):
         # TODO: minValue and maxValue should always be set to auto
         # TODO: keys, indexBy is not a valid key for all charts, should be dynamically added.
 
-        prompt = self.prompt_manager.create_chart_config_prompt(
+        prompt: str = self.prompt_manager.create_chart_config_prompt(
             msg, table_metadata, chart_type, nivo_config_preview
         )
+        return prompt
+
+    async def generate_chart_config(
+        self, msg: str, table_metadata: str, chart_type: str, nivo_config: dict
+    ):
+        """Generate the full chart configuration."""
+        prompt = self._create_chart_config_prompt(
+            msg, table_metadata, chart_type, nivo_config
+        )
 
         updated_config = await self._send_and_receive_message(
             prompt
@@ -368,6 +456,27 @@ class GPTLLM(BaseLLM):
 
         return parsed_config
 
+    async def generate_chart_config_stream(
+        self, msg: str, table_metadata: str, chart_type: str, nivo_config: dict
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Generate the full chart configuration, yielding its top-level keys as soon as they are complete.
+
+        Yields:
+            Tuple[str, Any]: A key and its value, e.g. ("title", "Sales per month"). The last item
+            is ("config", parsed_config) with the full configuration.
+        """
+        prompt = self._create_chart_config_prompt(
+            msg, table_metadata, chart_type, nivo_config
+        )
+
+        parser = IncrementalJSONParser()
+        async for chunk in self._send_and_receive_message_stream(prompt):
+            for key, value in parser.feed(chunk):
+                yield key, value
+
+        yield "config", parser.get_result()
+
     async def generate_suggested_column_types(self, column_names: list, data: dict):
         """Generate suggested column types for the given data."""
         self._add_system_message(assistant_type="column_type_suggestion")
@@ -383,7 +492,7 @@ class GPTLLM(BaseLLM):
 
         return suggested_column_types
 
-    def fetch_table_name_from_sample(
+    async def fetch_table_name_from_sample(
         self, sample_content: str, extra_desc: str, table_metadata: str
     ):
         """
@@ -404,38 +513,105 @@ class GPTLLM(BaseLLM):
             sample_content, extra_desc, table_metadata
         )
 
-        gpt_response = self._send_and_receive_message(prompt)
+        gpt_response = await self._send_and_receive_message(prompt)
 
-        return gpt_response
+        return gpt_response.strip()
 
-    def generate_text(self, input_text):
+    async def generate_text(self, input_text):
         self._add_system_message(assistant_type="generic")
 
         prompt = input_text
 
-        assistant_message_content = self._send_and_receive_message(prompt)
+        assistant_message_content = await self._send_and_receive_message(prompt)
 
         return assistant_message_content
 
+    async def generate_text_stream(self, input_text) -> AsyncIterator[str]:
+        """Generate text for the prompt, yielding it as it is generated."""
+        self._add_system_message(assistant_type="generic")
+
+        async for chunk in self._send_and_receive_message_stream(input_text):
+            yield chunk
+
     async def extract_data_from_jpgs(
-        self, data_profile: DataProfile, jpg_presigned_urls: List[str]
+        self,
+        data_profile: DataProfile,
+        jpg_presigned_urls: List[str],
+        prepared_images: Optional[List[PreparedImage]] = None,
     ):
+        """
+        Extract data from images according to the instructions of the data profile.
+
+        The pages are split into groups that fit into a single request (at most
+        EXTRACTION_GROUP_MAX_PAGES pages and VISION_TOKEN_BUDGET image tokens). The groups are
+        extracted concurrently, limited by the shared LLM client, and their rows are merged in
+        page order with duplicates removed.
+
+        Parameters:
+            data_profile (DataProfile): The data profile holding the extraction instructions.
+            jpg_presigned_urls (List[str]): The URLs of the images.
+            prepared_images (List[PreparedImage], optional): The prepared images in the same order as the URLs.
+                Their size and detail level are used for the request and its token count.
+
+        Returns:
+            list: The extracted rows.
+        """
         self._add_system_message(assistant_type="jpg_data_extraction")
         self._set_model(model_type="img")
+        self.max_response_tokens = EXTRACTION_MAX_RESPONSE_TOKENS
+        if prepared_images:
+            self.images.update(zip(jpg_presigned_urls, prepared_images))
 
         instructions = data_profile.extract_instructions
         prompt = self.prompt_manager.jpg_data_extraction_prompt(instructions)
 
-        assistant_message_content = await self._send_and_receive_message(
-            prompt, jpg_presigned_urls
+        groups = plan_page_groups(
+            [self._count_image_tokens(url) for url in jpg_presigned_urls],
+            VISION_TOKEN_BUDGET,
+            EXTRACTION_GROUP_MAX_PAGES,
+        )
+        row_groups = await asyncio.gather(
+            *(
+                self._extract_data_from_page_group(
+                    prompt, [jpg_presigned_urls[index] for index in group]
+                )
+                for group in groups
+            )
         )
+
+        data = merge_rows(list(row_groups))
+        print(data)
+        return data
+
+    async def _extract_data_from_page_group(
+        self, prompt: str, jpg_presigned_urls: List[str]
+    ) -> List[dict]:
+        """
+        Extract the rows of a group of pages in a request of its own, outside of the history.
+        If the response is not valid JSON, e.g. because it was cut off at the output limit,
+        the group is split in half and both halves are extracted again.
+        """
+        messages = [
+            self.history[0],  # The system message
+            self._create_message("user", prompt, jpg_presigned_urls),
+        ]
+        assistant_message_content = await self._api_call({"messages": messages})
         json_string = assistant_message_content.replace("```json\n", "").replace(
             "\n```", ""
         )
-        data = json.loads(json_string)
+        try:
+            data = json.loads(json_string)
+        except json.JSONDecodeError:
+            if len(jpg_presigned_urls) == 1:
+                raise
+            middle = len(jpg_presigned_urls) // 2
+            halves = await asyncio.gather(
+                self._extract_data_from_page_group(prompt, jpg_presigned_urls[:middle]),
+                self._extract_data_from_page_group(prompt, jpg_presigned_urls[middle:]),
+            )
+            return halves[0] + halves[1]
 
         # If data is a dictionary, wrap it in a list
         if isinstance(data, dict):
             data = [data]
-        print(data)
-        return data
+        return [row for row in data if isinstance(row, dict)]
@@ -1,5 +1,6 @@
 from typing import List
 
+from database.database_manager import get_engine
 from langchain.agents import create_sql_agent
 from langchain.agents.agent_toolkits import SQLDatabaseToolkit
 from langchain.agents.agent_types import AgentType
@@ -19,14 +20,14 @@ class GPTLangSQL:
         if not tables:
             raise ValueError("No tables provided")
         if APP_ENV == "prod":
-            self.db = SQLDatabase.from_uri(
+            engine = get_engine(
                 DATABASE_POOL_URL,
-                include_tables=tables,
                 pool_size=DATABASE_LANGCHAIN_POOL_SIZE,
                 max_overflow=DATABASE_LANGCHAIN_POOL_MAX_OVERFLOW,
             )
         else:
-            self.db = SQLDatabase.from_uri(DATABASE_URL, include_tables=tables)
+            engine = get_engine(DATABASE_URL)
+        self.db = SQLDatabase(engine, include_tables=tables)
         self.toolkit = SQLDatabaseToolkit(db=self.db, llm=OpenAI(temperature=0))
         self.agent_executor = create_sql_agent(
             llm=OpenAI(temperature=0),
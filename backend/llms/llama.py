@@ -6,5 +6,5 @@ class LlamaLLM(BaseLLM):
         self.api_key = "LLAMA_API_KEY"
         self.endpoint = "LLAMA_ENDPOINT"
 
-    def generate_text(self, prompt: str) -> str:
+    async def generate_text(self, prompt: str) -> str:
         return f"Llama Generated Text for: {prompt}"
@@ -0,0 +1,308 @@
+"""
+This module provides the process-wide LLMClient used for all chat completion requests.
+
+A single pooled HTTP client is shared by every GPTLLM instance. Requests are limited by a
+global and a per-organization concurrency cap, and failed requests (429, 5xx and transport
+errors) are retried with jittered exponential backoff until a deadline is reached. Waiting for
+a free slot counts against the same deadline.
+"""
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+from settings import (
+    LLM_MAX_CONCURRENT_REQUESTS,
+    LLM_MAX_CONCURRENT_REQUESTS_PER_ORG,
+    LLM_MAX_CONNECTIONS,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    LLM_RETRY_DEADLINE_SECONDS,
+    OPENAI_API_BASE,
+    OPENAI_API_KEY,
+)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMClient:
+    """
+    Shared async client for the OpenAI chat completions API.
+
+    Attributes:
+        base_url (str): The base URL of the API. Can point to a local stub server in tests.
+        max_concurrent_requests (int): The maximum number of requests in flight for the process.
+        max_concurrent_requests_per_org (int): The maximum number of requests in flight per organization.
+        retry_deadline (float): The number of seconds after which a request is no longer retried.
+            Time spent waiting for a concurrency slot counts against it.
+        transport (httpx.AsyncBaseTransport, optional): The transport of the HTTP client, e.g. a stub in tests.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OPENAI_API_BASE,
+        api_key: str = OPENAI_API_KEY,
+        max_concurrent_requests: int = LLM_MAX_CONCURRENT_REQUESTS,
+        max_concurrent_requests_per_org: int = LLM_MAX_CONCURRENT_REQUESTS_PER_ORG,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        request_timeout: float = LLM_REQUEST_TIMEOUT_SECONDS,
+        retry_deadline: float = LLM_RETRY_DEADLINE_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_concurrent_requests_per_org = max_concurrent_requests_per_org
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.retry_deadline = retry_deadline
+        self.transport = transport
+
+        # Created lazily so they are bound to the running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._org_semaphores: Dict[Optional[int], asyncio.Semaphore] = {}
+        # Requests running or waiting per organization, to drop semaphores once idle
+        self._org_users: Dict[Optional[int], int] = {}
+
+        # Metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(self.request_timeout, connect=10.0),
+                transport=self.transport,
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _reserve(
+        self, organization_id: Optional[int], deadline: float
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot of the organization's and the global concurrency cap for a request.
+
+        Waiting for a slot counts against the retry deadline, so a request is rejected with a
+        503 rather than queued indefinitely. The semaphore of an organization is dropped once
+        none of its requests are running or waiting, so idle organizations take no memory.
+        """
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        global_semaphore = self._global_semaphore
+        if organization_id not in self._org_semaphores:
+            self._org_semaphores[organization_id] = asyncio.Semaphore(
+                self.max_concurrent_requests_per_org
+            )
+        org_semaphore = self._org_semaphores[organization_id]
+        self._org_users[organization_id] = self._org_users.get(organization_id, 0) + 1
+
+        acquired = []
+        self.queued += 1
+        try:
+            for semaphore in (org_semaphore, global_semaphore):
+                await asyncio.wait_for(
+                    semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic())
+                )
+                acquired.append(semaphore)
+        except asyncio.TimeoutError:
+            self.failures += 1
+            raise HTTPException(
+                status_code=503,
+                detail="The language model is busy, please try again later",
+            )
+        finally:
+            self.queued -= 1
+            if len(acquired) < 2:
+                self._release(organization_id, acquired)
+
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.latencies.append(time.monotonic() - start)
+            self._release(organization_id, acquired)
+
+    def _release(self, organization_id: Optional[int], semaphores: list):
+        for semaphore in reversed(semaphores):
+            semaphore.release()
+        self._org_users[organization_id] -= 1
+        if not self._org_users[organization_id]:
+            del self._org_users[organization_id]
+            del self._org_semaphores[organization_id]
+
+    @staticmethod
+    def _get_backoff(attempt: int, retry_after: Optional[str]) -> float:
+        """Full-jitter exponential backoff, honoring the Retry-After header when present."""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(30.0, 0.5 * 2**attempt))
+
+    def _raise_if_not_retryable(self, response: httpx.Response):
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            self.failures += 1
+            raise HTTPException(
+                status_code=502,
+                detail=f"Language model request failed: {response.text}",
+            )
+
+    async def _wait_before_retry(
+        self, attempt: int, error: str, retry_after: Optional[str], deadline: float
+    ):
+        """
+        Sleep before the next attempt of a failed request, or raise a 503 if the next attempt
+        would start after the retry deadline.
+        """
+        delay = self._get_backoff(attempt, retry_after)
+        if time.monotonic() + delay > deadline:
+            self.failures += 1
+            print(
+                f"Language model request failed after {attempt + 1} attempts: {error}"
+            )
+            raise HTTPException(
+                status_code=503,
+                detail="The language model is unavailable, please try again later",
+            )
+
+        self.retries += 1
+        await asyncio.sleep(delay)
+
+    async def chat_completion(
+        self, params: dict, organization_id: Optional[int] = None
+    ) -> dict:
+        """
+        Create a chat completion.
+
+        Args:
+            params (dict): The request body, e.g. model, messages and max_tokens.
+            organization_id (int, optional): The organization making the request, used for its concurrency cap.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            HTTPException: 503 if the API kept failing or no slot was free until the retry deadline, 502 for non-retryable errors.
+        """
+        deadline = time.monotonic() + self.retry_deadline
+        async with self._reserve(organization_id, deadline):
+            client = self._get_client()
+            attempt = 0
+            while True:
+                self.requests += 1
+                retry_after = None
+                try:
+                    response = await client.post("/chat/completions", json=params)
+                    if response.status_code < 400:
+                        result: dict = response.json()
+                        return result
+                    self._raise_if_not_retryable(response)
+                    retry_after = response.headers.get("retry-after")
+                    error = f"status {response.status_code}"
+                except httpx.TransportError as e:
+                    error = str(e)
+
+                await self._wait_before_retry(attempt, error, retry_after, deadline)
+                attempt += 1
+
+    async def stream_chat_completion(
+        self, params: dict, organization_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Create a chat completion and yield its content as it is generated.
+
+        Connection errors and retryable statuses are retried like in chat_completion until the
+        first token has been received. After that, a broken stream is raised to the caller.
+
+        Args:
+            params (dict): The request body, e.g. model, messages and max_tokens.
+            organization_id (int, optional): The organization making the request, used for its concurrency cap.
+
+        Yields:
+            str: The content deltas of the completion.
+        """
+        deadline = time.monotonic() + self.retry_deadline
+        params = {**params, "stream": True}
+        async with self._reserve(organization_id, deadline):
+            client = self._get_client()
+            attempt = 0
+            received = False
+            while True:
+                self.requests += 1
+                retry_after = None
+                try:
+                    async with client.stream(
+                        "POST", "/chat/completions", json=params
+                    ) as response:
+                        if response.status_code < 400:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line.split(":", 1)[1].strip()
+                                if data == "[DONE]":
+                                    break
+                                choices = json.loads(data).get("choices") or [{}]
+                                delta = choices[0].get("delta", {}).get("content")
+                                if delta:
+                                    received = True
+                                    yield delta
+                            return
+                        await response.aread()
+                        self._raise_if_not_retryable(response)
+                        retry_after = response.headers.get("retry-after")
+                        error = f"status {response.status_code}"
+                except httpx.TransportError as e:
+                    if received:
+                        raise
+                    error = str(e)
+
+                await self._wait_before_retry(attempt, error, retry_after, deadline)
+                attempt += 1
+
+    def get_stats(self) -> dict:
+        """Return queue depth, in-flight requests, retry counts and latency percentiles in seconds."""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+        }
+
+    async def aclose(self):
+        """Close the pooled HTTP connections. Called on shutdown."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_client = LLMClient()
@@ -1,6 +1,6 @@
 from fastapi import Depends
 from llms.gpt import GPTLLM
-from models.user import User
+from models.user import UserPrincipal
 from pydantic import BaseModel
 from security import get_current_user
 
@@ -13,15 +13,13 @@ class ChatResponse(BaseModel):
     llm_output: str
 
 
-def get_llm_sql_object(current_user: User = Depends(get_current_user)):
+def get_llm_sql_object(current_user: UserPrincipal = Depends(get_current_user)):
     # Initialize LLM object
-    user_id = current_user.id
-    llm = GPTLLM(user_id, store_history=False, llm_type="sql")
+    llm = GPTLLM(None, current_user, store_history=False, llm_type="sql")
     return llm
 
 
-def get_llm_chat_object(current_user: User = Depends(get_current_user)):
+def get_llm_chat_object(current_user: UserPrincipal = Depends(get_current_user)):
     # Initialize LLM object
-    user_id = current_user.id
-    llm = GPTLLM(user_id, store_history=True, llm_type="chat")
+    llm = GPTLLM(None, current_user, store_history=True, llm_type="chat")
     return llm
@@ -1,6 +1,7 @@
-from database.database_manager import DatabaseManager
+from database.database_manager import DatabaseManager, dispose_engines, init_engines
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from llms.llm_client import llm_client
 from models.base import Base
 from routes.auth_routes import auth_router
 from routes.chart_routes import chart_router
@@ -8,12 +9,16 @@ from routes.chat_routes import chat_router
 from routes.dashboard_routes import dashboard_router
 from routes.data_profile_routes import data_profile_router
 from routes.file_routes import file_router
+from routes.job_routes import job_router
 from routes.organization_routes import organization_router
 from routes.powerbi_routes import powerbi_router
 from routes.table_routes import table_router
 from routes.user_routes import user_router
+from security import password_hasher
 from settings import APP_ENV
 from startup import run_startup_routines
+from utils.image_conversion_manager import shutdown_render_executor
+from utils.object_storage.digitalocean_space_manager import shutdown_transfer_executor
 from utils.utils import get_app_logger
 
 logger = get_app_logger(__name__)
@@ -36,11 +41,16 @@ app.add_middleware(
 
 
 async def startup_event():
+    init_engines()
     run_startup_routines()
 
 
 async def shutdown_event():
-    pass
+    await dispose_engines()
+    await llm_client.aclose()
+    password_hasher.shutdown()
+    shutdown_render_executor()
+    shutdown_transfer_executor()
 
 
 # Registering the startup and shutdown events
@@ -54,6 +64,7 @@ app.include_router(chat_router)
 app.include_router(dashboard_router)
 app.include_router(data_profile_router)
 app.include_router(file_router)
+app.include_router(job_router)
 app.include_router(organization_router)
 app.include_router(powerbi_router)
 app.include_router(table_router)
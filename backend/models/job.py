@@ -0,0 +1,74 @@
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from .base import Base
+
+
+class Job(Base):
+    """
+    Represents a background job, e.g. the extraction of data from uploaded documents.
+
+    Attributes:
+    - id (int): Unique identifier for each job.
+    - job_type (str): The kind of job, which determines the handler that runs it.
+    - status (str): One of "queued", "running", "succeeded" or "failed".
+    - organization_id (int): The organization the job belongs to.
+    - user_id (int): The user who submitted the job.
+    - payload (JSONB): The input of the job.
+    - result (JSONB): The output of the job once it has succeeded.
+    - error (str): The error message if the job has failed.
+    - stage (str): The step the job is currently in, e.g. "converting" or "extracting".
+    - pages_done (int): The number of pages processed so far.
+    - pages_total (int): The total number of pages to process.
+    - attempts (int): The number of times a worker has started the job.
+    - created_at (datetime): When the job was submitted.
+    - started_at (datetime): When a worker last started the job.
+    - updated_at (datetime): When a worker last reported on the job. Used to detect crashed workers.
+    - finished_at (datetime): When the job succeeded or failed.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    job_type = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    organization_id = Column(Integer, ForeignKey("organizations.id"))
+    user_id = Column(Integer, ForeignKey("users.id"))
+    payload = Column(JSONB)  # Note: JSONB is specific to PostgreSQL
+    result = Column(JSONB, nullable=True)
+    error = Column(String, nullable=True)
+    stage = Column(String, nullable=True)
+    pages_done = Column(Integer, default=0)
+    pages_total = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_jobs_status_created_at", "status", "created_at"),)
+
+    def to_dict(self):
+        """
+        Converts the Job instance into a dictionary. The payload is internal and left out.
+        """
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "stage": self.stage,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: int
+    status: str
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from .base import Base
+
+
+class LLMSchemaCache(Base):
+    """
+    Represents a cached LLM generated table schema for an uploaded file.
+
+    Attributes:
+        cache_key (str): SHA-256 of the normalized header, sample rows and extra description.
+        create_statement (str): The CREATE TABLE statement generated by the LLM.
+        description (str): The table description generated by the LLM.
+        hit_count (int): The number of times the entry has been served from the cache.
+        created_at (datetime): The timestamp when the entry was created. Used for expiry.
+        last_accessed_at (datetime): The timestamp when the entry was last used. Used for LRU eviction.
+    """
+
+    __tablename__ = "llm_schema_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    create_statement = Column(String)
+    description = Column(String, nullable=True)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), default=func.now(), index=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from .base import Base
+
+
+class TableVersion(Base):
+    """
+    Represents the data version of a user table.
+
+    The version is incremented whenever rows are written to the table, so cached query results
+    can be keyed by the versions of the tables they read from and never be served stale.
+
+    Attributes:
+        table_name (str): The name of the table.
+        version (int): The number of writes to the table since versions were tracked.
+        updated_at (datetime): The timestamp of the last write.
+    """
+
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
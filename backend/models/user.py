@@ -55,6 +55,37 @@ class User(Base):
     refresh_token = Column(Text, nullable=True)
 
 
+class UserPrincipal(BaseModel):
+    """
+    UserPrincipal is an immutable snapshot of an authenticated user.
+
+    It is returned by `security.get_current_user` and cached per token subject, so it
+    only holds the fields that routes need to authorize and identify the caller.
+    It does not contain the hashed password or tokens.
+
+    Attributes:
+        id (int): The unique identifier for each user.
+        username (str): The username chosen by the user.
+        email (str): The email address of the user.
+        organization_id (Optional[int]): The id of the organization the user belongs to.
+        role (Optional[UserRole]): The role of the user within the organization.
+        requires_password_update (Optional[bool]): Whether the user needs to update their password.
+        email_verified (Optional[bool]): Whether the user's email has been verified.
+    """
+
+    id: int
+    username: str
+    email: str
+    organization_id: Optional[int] = None
+    role: Optional[UserRole] = None
+    requires_password_update: Optional[bool] = False
+    email_verified: Optional[bool] = False
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 class UserCreate(BaseModel):
     """
     Pydantic model representing the data required to create a new user.
@@ -10,13 +10,13 @@ from database.database_manager import DatabaseManager
 from database.user_manager import UserManager
 from fastapi import APIRouter, Depends, Form, HTTPException, Response, status
 from models.auth import CustomOAuth2PasswordRequestForm
-from models.user import User, UserCreate
+from models.user import User, UserCreate, UserPrincipal
 from pydantic import BaseModel, EmailStr
 from security import (
     authenticate_user,
     create_token,
     get_current_user,
-    get_password_hash,
+    password_hasher,
     set_tokens_in_cookies,
     update_user_refresh_token,
     verify_refresh_token,
@@ -66,7 +66,9 @@ async def login_for_access_token(
     form_data = CustomOAuth2PasswordRequestForm(
         username=username, email=email, password=password
     )
-    user = authenticate_user(form_data.username, form_data.email, form_data.password)
+    user = await authenticate_user(
+        form_data.username, form_data.email, form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -142,7 +144,7 @@ async def refresh_access_token(
 
 
 @auth_router.get("/verify-token/", response_model=dict)
-async def verify_token(current_user: User = Depends(get_current_user)):
+async def verify_token(current_user: UserPrincipal = Depends(get_current_user)):
     """
     Verify the JWT token and confirm the user is logged in.
 
@@ -188,7 +190,7 @@ async def register(response: Response, user_create_request: UserCreate):
             raise HTTPException(status_code=400, detail="Email already registered")
 
         # Hash the user's password
-        hashed_password = get_password_hash(user_create_request.password)
+        hashed_password = await password_hasher.hash(user_create_request.password)
 
         # Add user to the database
         db_user = User(
@@ -4,16 +4,29 @@ from typing import Optional
 
 from database.chart_manager import ChartManager
 from database.database_manager import DatabaseManager
+from database.query_result_cache import QueryResultCache
+from database.sql_executor import QueryGuardError
 from database.table_metadata_manager import TableMetadataManager
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from llms.gpt import GPTLLM
 from models.chart import Chart, ChartCreate
 from models.table_metadata import TableMetadata
-from models.user import User
+from models.user import UserPrincipal
 from pydantic import BaseModel
 from security import get_current_user
+from utils.chart_renderer import render_chart_data, strip_chart_data
+from utils.columnar import (
+    MEDIA_TYPES,
+    dicts_to_record_batch,
+    iter_arrow_ipc,
+    iter_parquet,
+    negotiate_format,
+)
 from utils.nivo_assistant import NivoAssistant
-from utils.utils import execute_select_query
+from utils.utils import format_sse
 
 chart_router = APIRouter()
 
@@ -25,7 +38,7 @@ class ChartConfigRequest(BaseModel):
 
 
 @chart_router.get("/charts/types/")
-async def get_chart_types(current_user: User = Depends(get_current_user)):
+async def get_chart_types(current_user: UserPrincipal = Depends(get_current_user)):
     config_path = os.path.join(
         os.path.dirname(__file__), "..", "config", "chart_types.json"
     )
@@ -36,23 +49,69 @@ async def get_chart_types(current_user: User = Depends(get_current_user)):
 
 @chart_router.post("/chart/")
 async def save_chart(
-    chart: ChartCreate, current_user: User = Depends(get_current_user)
+    chart: ChartCreate, current_user: UserPrincipal = Depends(get_current_user)
 ):
     with DatabaseManager() as session:
         manager = ChartManager(session)
         highest_order = manager.get_highest_order()
         order = highest_order + 1
 
+        # The data is rendered from the query whenever the chart is read
         db_chart = Chart(
-            dashboard_id=chart.dashboard_id, order=order, config=chart.config
+            dashboard_id=chart.dashboard_id,
+            order=order,
+            config=strip_chart_data(chart.config),
         )
 
         manager.save_chart(db_chart)
 
 
+@chart_router.get("/chart/{chart_id}/data/")
+async def get_chart_data(
+    chart_id: int,
+    format: Optional[str] = Query(None, pattern="^(json|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    Get the rows of the query of a chart, served from the query result cache.
+
+    The format is taken from the format parameter or negotiated from the Accept header: JSON
+    (the default), an Arrow IPC stream (application/vnd.apache.arrow.stream) or a Parquet file
+    (application/vnd.apache.parquet). The X-Result-Truncated header tells whether the rows were
+    cut off at the row cap.
+    """
+
+    def _get_rows():
+        with DatabaseManager() as session:
+            chart = ChartManager(session).get_chart(chart_id)
+            if chart is None:
+                raise HTTPException(status_code=404, detail="Chart not found")
+            query = (chart.config or {}).get("query")
+            if not query:
+                raise HTTPException(status_code=400, detail="Chart has no query")
+            try:
+                return QueryResultCache(session).execute_select_query(query)
+            except QueryGuardError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    rows = await run_in_threadpool(_get_rows)
+    headers = {"X-Result-Truncated": "true" if rows.truncated else "false"}
+    result_format = negotiate_format(accept, format)
+    if result_format == "arrow":
+        content = iter_arrow_ipc([dicts_to_record_batch(rows)])
+    elif result_format == "parquet":
+        content = iter_parquet([dicts_to_record_batch(rows)])
+    else:
+        return JSONResponse(jsonable_encoder(list(rows)), headers=headers)
+    return StreamingResponse(
+        content, media_type=MEDIA_TYPES[result_format], headers=headers
+    )
+
+
 @chart_router.post("/chart/config/")
 async def create_chart_config(
-    request: ChartConfigRequest, current_user: User = Depends(get_current_user)
+    request: ChartConfigRequest, current_user: UserPrincipal = Depends(get_current_user)
 ):
     """Creates or updates a chart configuration using an LLM."""
     chat_id = request.chat_id
@@ -67,26 +126,73 @@ async def create_chart_config(
     updated_chart_config = await gpt.generate_chart_config(
         msg, table_metadata, chart_type, nivo_config
     )
+    updated_chart_config = add_data_to_chart_config(updated_chart_config, chart_type)
+
+    return updated_chart_config, gpt.chat_id
+
+
+@chart_router.post("/chart/config/stream/")
+async def create_chart_config_stream(
+    request: ChartConfigRequest, current_user: UserPrincipal = Depends(get_current_user)
+):
+    """
+    Streams the creation of a chart configuration as server-sent events.
 
+    A "field" event is sent for every top-level key of the configuration as soon as the LLM has
+    generated it (e.g. the title and query), followed by a "config" event with the complete
+    configuration including its data and chat id.
+    """
+    chart_config = request.chart_config
+    table_name = chart_config.get("table", "")
+    chart_type = chart_config.get("type")
+    nivo_config = chart_config.get("nivoConfig")
+    table_metadata = get_table_metadata(table_name)
+
+    gpt = GPTLLM(request.chat_id, current_user)
+
+    async def event_stream():
+        try:
+            async for key, value in gpt.generate_chart_config_stream(
+                request.msg, table_metadata, chart_type, nivo_config
+            ):
+                if key == "config":
+                    updated_chart_config = add_data_to_chart_config(value, chart_type)
+                    yield format_sse(
+                        {"config": updated_chart_config, "chat_id": gpt.chat_id},
+                        event="config",
+                    )
+                else:
+                    yield format_sse({"key": key, "value": value}, event="field")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            yield format_sse({"detail": str(e)}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def add_data_to_chart_config(
+    updated_chart_config: dict, chart_type: Optional[str]
+) -> dict:
+    """Format the generated configuration for its chart type and add the data of its query."""
     # Make sure configuration holds data needed for specific chart type
     formatter = NivoAssistant(chart_type)
     updated_nivo_config = updated_chart_config.get("nivoConfig")
     formatted_nivo_config = formatter.format_config(updated_nivo_config)
     updated_chart_config["nivoConfig"] = formatted_nivo_config
 
-    # Execute query
-    results = execute_select_query(updated_chart_config["query"])
-
-    # Transform query data to specific chart and add to configuration
-    nivo_data = formatter.format_data(results)
-    updated_chart_config["nivoConfig"]["data"] = nivo_data
+    # Execute query and add its data, transformed for the specific chart, to the configuration
+    with DatabaseManager() as session:
+        try:
+            updated_chart_config = render_chart_data(updated_chart_config, session)
+        except QueryGuardError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     print(updated_chart_config)
 
-    return updated_chart_config, gpt.chat_id
+    return updated_chart_config
 
 
 def get_table_metadata(
-    table_name: str, current_user: User = Depends(get_current_user)
+    table_name: str, current_user: UserPrincipal = Depends(get_current_user)
 ) -> TableMetadata:
     """Get table metadata"""
     with DatabaseManager() as session:
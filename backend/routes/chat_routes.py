@@ -1,13 +1,19 @@
 from database.chat_history_manager import ChatHistoryManager
-from database.database_manager import DatabaseManager
+from database.database_manager import DatabaseManager, get_async_session
 from database.table_map_manager import TableMapManager
+from database.table_metadata_manager import TableMetadataManager
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from llms.base import BaseLLM
 from llms.gpt_lang import GPTLangSQL
+from llms.llm_client import llm_client
 from llms.utils import ChatRequest, ChatResponse, get_llm_chat_object
 from models.chat import AnalyticsRequest, AnalyticsResponse
-from models.user import User
-from security import get_current_user
+from models.user import UserPrincipal
+from security import get_current_admin_user, get_current_user
+from settings import TABLE_ROUTING_TOP_K
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.utils import format_sse
 
 chat_router = APIRouter()
 
@@ -16,32 +22,73 @@ chat_router = APIRouter()
 async def chat_endpoint(
     request: ChatRequest,
     llm: BaseLLM = Depends(get_llm_chat_object),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     user_input = request.user_input
-    llm_output = llm.generate_text(user_input)
+    llm_output = await llm.generate_text(user_input)
     return ChatResponse(llm_output=llm_output)
 
 
+@chat_router.post("/chat/stream/")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    llm: BaseLLM = Depends(get_llm_chat_object),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """Streams the reply as server-sent events: "token" events followed by a "done" event."""
+
+    async def event_stream():
+        try:
+            async for chunk in llm.generate_text_stream(request.user_input):
+                yield format_sse({"token": chunk}, event="token")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            yield format_sse({"detail": str(e)}, event="error")
+            return
+        yield format_sse({}, event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@chat_router.get("/chat/llm/stats/")
+async def get_llm_client_stats(
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
+):
+    return llm_client.get_stats()
+
+
 @chat_router.post("/chat/analytics/", response_model=AnalyticsResponse)
 async def chat_analytics_endpoint(
     request: AnalyticsRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     with DatabaseManager() as session:
         table_map_manager = TableMapManager(session)
         org_tables = table_map_manager.get_org_tables(current_user.organization_id)
 
+        # Only give the agent the tables that are most relevant to the prompt
+        if len(org_tables) > TABLE_ROUTING_TOP_K:
+            metadata_manager = TableMetadataManager(session)
+            relevant_metadata = metadata_manager.get_relevant_metadata(
+                current_user.organization_id, request.prompt, TABLE_ROUTING_TOP_K
+            )
+            org_tables = [row.table_name for row in relevant_metadata] or org_tables
+
     gpt = GPTLangSQL(tables=org_tables)
     response = gpt.generate(request.prompt)
     return AnalyticsResponse(chat_id=1, response=response)
 
 
 @chat_router.delete("/chat_history/")
-async def delete_chat_history(current_user: User = Depends(get_current_user)):
+async def delete_chat_history(
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
     user_id = current_user.id
-    with DatabaseManager() as session:
-        chat_service = ChatHistoryManager(session)
-        chat_service.delete_chat_history(user_id)
+    await session.run_sync(
+        lambda sync_session: ChatHistoryManager(sync_session).delete_chat_history(
+            user_id
+        )
+    )
 
     return {"message": "Chat history deleted"}
@@ -1,42 +1,84 @@
+import time
+from typing import Optional
+
 from database.dashboard_manager import DashboardManager
-from database.database_manager import DatabaseManager
+from database.database_manager import get_async_session
 from fastapi import APIRouter, Depends, HTTPException
 from models.dashboard import Dashboard, DashboardCreate
-from models.user import User
+from models.user import UserPrincipal
 from security import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.chart_renderer import render_dashboard_charts
 
 dashboard_router = APIRouter()
 
 
 @dashboard_router.get("/dashboard/")
-async def get_dashboard(id: int, current_user: User = Depends(get_current_user)):
-    with DatabaseManager() as session:
-        manager = DashboardManager(session)
-        dashboard = manager.get_dashboard(id)
-        if dashboard:
-            return dashboard.to_dict()
-        else:
-            raise HTTPException(status_code=404, detail="Dashboard not found")
+async def get_dashboard(
+    id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return await get_rendered_dashboard(id, session)
+
+
+@dashboard_router.get("/dashboard/{id}/render/")
+async def render_dashboard(
+    id: int,
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Render the data of every chart of the dashboard from its query.
+
+    The queries run concurrently with a statement timeout, within an overall deadline. Charts
+    that did not finish in time are returned with the status "timeout" and without data, the
+    others with their data and the milliseconds it took until they were done.
+    """
+    return await get_rendered_dashboard(id, session)
 
 
 @dashboard_router.get("/dashboards/")
-async def get_dashboards(current_user: User = Depends(get_current_user)):
-    with DatabaseManager() as session:
-        manager = DashboardManager(session)
-        dashboards = manager.get_dashboards()
+async def get_dashboards(
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    dashboards = await session.run_sync(
+        lambda sync_session: DashboardManager(sync_session).get_dashboards()
+    )
 
     return dashboards
 
 
 @dashboard_router.post("/dashboard/")
 async def save_dashboard(
-    dashboard: DashboardCreate, current_user: User = Depends(get_current_user)
+    dashboard: DashboardCreate,
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
     db_dashboard = Dashboard(
         name=dashboard.name,
         description=dashboard.description,
         organization=dashboard.organization,
     )
-    with DatabaseManager() as session:
-        manager = DashboardManager(session)
-        manager.save_dashboard(db_dashboard)
+    await session.run_sync(
+        lambda sync_session: DashboardManager(sync_session).save_dashboard(db_dashboard)
+    )
+
+
+async def get_rendered_dashboard(id: int, session: AsyncSession) -> dict:
+    """Get a dashboard with the data of its charts rendered concurrently from their queries."""
+
+    def _get_dashboard_dict(sync_session):
+        manager = DashboardManager(sync_session)
+        dashboard = manager.get_dashboard(id)
+        return dashboard.to_dict() if dashboard else None
+
+    dashboard_dict: Optional[dict] = await session.run_sync(_get_dashboard_dict)
+    if not dashboard_dict:
+        raise HTTPException(status_code=404, detail="Dashboard not found")
+
+    start = time.perf_counter()
+    dashboard_dict["charts"] = await render_dashboard_charts(dashboard_dict["charts"])
+    dashboard_dict["render_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return dashboard_dict
@@ -1,12 +1,16 @@
+import json
 import os
 import tempfile
+import uuid
 from typing import List
 
 from database.data_profile_manager import DataProfileManager
 from database.database_manager import DatabaseManager
+from database.job_manager import JobManager
 from database.organization_manager import OrganizationManager
 from database.table_manager import TableManager
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from llms.gpt import GPTLLM
 from models.data_profile import (
     DataProfile,
@@ -14,9 +18,11 @@ from models.data_profile import (
     DataProfileCreateResponse,
     SuggestedColumnTypesRequest,
 )
-from models.user import User
-from security import get_current_user
-from utils.image_conversion_manager import ImageConversionManager
+from models.job import JobSubmitResponse
+from models.user import UserPrincipal
+from security import get_current_admin_user, get_current_user
+from utils.data_extraction import extract_data_from_files, extraction_result_cache
+from utils.image_conversion_manager import page_cache
 from utils.object_storage.digitalocean_space_manager import DigitalOceanSpaceManager
 from utils.sql_string_manager import SQLStringManager
 
@@ -24,7 +30,7 @@ data_profile_router = APIRouter()
 
 
 @data_profile_router.get("/data-profiles/")
-async def get_data_profiles(current_user: User = Depends(get_current_user)):
+async def get_data_profiles(current_user: UserPrincipal = Depends(get_current_user)):
     with DatabaseManager() as session:
         data_profile_manager = DataProfileManager(session)
         data_profiles = data_profile_manager.get_all_data_profiles()
@@ -32,7 +38,9 @@ async def get_data_profiles(current_user: User = Depends(get_current_user)):
 
 
 @data_profile_router.get("/data-profiles/org/")
-async def get_data_profiles_by_org_id(current_user: User = Depends(get_current_user)):
+async def get_data_profiles_by_org_id(
+    current_user: UserPrincipal = Depends(get_current_user),
+):
     with DatabaseManager() as session:
         data_profile_manager = DataProfileManager(session)
         data_profile_names = data_profile_manager.get_all_data_profile_names_by_org_id(
@@ -43,7 +51,8 @@ async def get_data_profiles_by_org_id(current_user: User = Depends(get_current_u
 
 @data_profile_router.post("/data-profile/")
 async def save_data_profile(
-    request: DataProfileCreateRequest, current_user: User = Depends(get_current_user)
+    request: DataProfileCreateRequest,
+    current_user: UserPrincipal = Depends(get_current_user),
 ) -> DataProfileCreateResponse:
     """Save a new data profile to the database"""
     if len(request.name) > 50:
@@ -94,7 +103,7 @@ async def save_data_profile(
 
 @data_profile_router.get("/data-profiles/{data_profile_id}")
 async def get_data_profile(
-    data_profile_id: int, current_user: User = Depends(get_current_user)
+    data_profile_id: int, current_user: UserPrincipal = Depends(get_current_user)
 ):
     with DatabaseManager() as session:
         data_profile_manager = DataProfileManager(session)
@@ -105,15 +114,25 @@ async def get_data_profile(
 
 
 @data_profile_router.get("/data-profiles/column-types/")
-async def get_column_types(current_user: User = Depends(get_current_user)):
+async def get_column_types(current_user: UserPrincipal = Depends(get_current_user)):
     return ["text", "integer", "money", "date", "boolean"]
 
 
+@data_profile_router.get("/data-profiles/extraction-cache/stats/")
+async def get_extraction_cache_stats(
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
+):
+    return {
+        "pages": await run_in_threadpool(page_cache.get_stats),
+        "results": await run_in_threadpool(extraction_result_cache.get_stats),
+    }
+
+
 @data_profile_router.post("/data-profiles/preview/")
 async def preview_data_profile(
     files: List[UploadFile] = File(...),
     extract_instructions: str = Form(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     preview_data_profile = DataProfile(
         name="preview", extract_instructions=extract_instructions
@@ -137,20 +156,10 @@ async def preview_data_profile(
             current_user.organization_id
         ).name
 
-    # Use the ImageConversionManager context manager to convert the PDF to JPG
-    with ImageConversionManager(temp_file_paths) as manager:
-        jpg_file_paths = manager.convert_to_jpgs()
-
-        # Upload the JPG file to DigitalOcean Spaces, automatically deleting it when done
-        with DigitalOceanSpaceManager(
-            organization_name=organization_name, file_paths=jpg_file_paths
-        ) as space_manager:
-            space_manager.upload_files_by_paths()
-            jpg_presigned_urls = space_manager.create_presigned_urls()
-            gpt = GPTLLM(chat_id=1, user=current_user)
-            extracted_data = await gpt.extract_data_from_jpgs(
-                preview_data_profile, jpg_presigned_urls
-            )
+    # Convert the files to JPGs and extract their data
+    extracted_data = await extract_data_from_files(
+        preview_data_profile, temp_file_paths, organization_name, current_user
+    )
 
     # Delete the temporary files
     for path in temp_file_paths:
@@ -159,9 +168,26 @@ async def preview_data_profile(
     return extracted_data
 
 
+@data_profile_router.post(
+    "/data-profiles/preview/jobs/",
+    response_model=JobSubmitResponse,
+    status_code=202,
+)
+async def submit_preview_data_profile_job(
+    files: List[UploadFile] = File(...),
+    extract_instructions: str = Form(...),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """Like /data-profiles/preview/, but runs in the background. Poll /jobs/{job_id} for the result."""
+    return await submit_extraction_job(
+        files, current_user, {"extract_instructions": extract_instructions}
+    )
+
+
 @data_profile_router.post("/data-profiles/preview/column-types/")
 async def generate_suggested_column_types(
-    request: SuggestedColumnTypesRequest, current_user: User = Depends(get_current_user)
+    request: SuggestedColumnTypesRequest,
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     gpt = GPTLLM(chat_id=1, user=current_user)
     if request.data:
@@ -179,7 +205,7 @@ async def generate_suggested_column_types(
 async def preview_data_profile_upload(
     data_profile_name: str,
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     temp_file_paths = []
     for file in files:
@@ -204,20 +230,10 @@ async def preview_data_profile_upload(
             data_profile_name, current_user.organization_id
         )
 
-    # Use the ImageConversionManager context manager to convert the PDF to JPG
-    with ImageConversionManager(temp_file_paths) as manager:
-        jpg_file_paths = manager.convert_to_jpgs()
-
-        # Upload the JPG file to DigitalOcean Spaces, automatically deleting it when done
-        with DigitalOceanSpaceManager(
-            organization_name=organization_name, file_paths=jpg_file_paths
-        ) as space_manager:
-            space_manager.upload_files_by_paths()
-            jpg_presigned_urls = space_manager.create_presigned_urls()
-            gpt = GPTLLM(chat_id=1, user=current_user)
-            extracted_data = await gpt.extract_data_from_jpgs(
-                data_profile, jpg_presigned_urls
-            )
+    # Convert the files to JPGs and extract their data
+    extracted_data = await extract_data_from_files(
+        data_profile, temp_file_paths, organization_name, current_user
+    )
 
     # Delete the temporary files
     for path in temp_file_paths:
@@ -226,13 +242,54 @@ async def preview_data_profile_upload(
     return extracted_data
 
 
+@data_profile_router.post(
+    "/data-profiles/{data_profile_name}/preview/jobs/",
+    response_model=JobSubmitResponse,
+    status_code=202,
+)
+async def submit_preview_data_profile_upload_job(
+    data_profile_name: str,
+    files: List[UploadFile] = File(...),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """Like /data-profiles/{data_profile_name}/preview/, but runs in the background. Poll /jobs/{job_id} for the result."""
+    with DatabaseManager() as session:
+        data_profile_manager = DataProfileManager(session)
+        data_profile = data_profile_manager.get_dataprofile_by_name_and_org(
+            data_profile_name, current_user.organization_id
+        )
+    if data_profile is None:
+        raise HTTPException(status_code=404, detail="Data Profile not found")
+
+    return await submit_extraction_job(
+        files, current_user, {"data_profile_name": data_profile_name}
+    )
+
+
 @data_profile_router.post("/data-profiles/{data_profile_name}/extracted-data/")
 async def save_extracted_data(
     data_profile_name: str,
-    extracted_data: dict,
+    extracted_data: str = Form(...),
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
+    """
+    Save the reviewed rows of a preview into the table of the data profile.
+
+    extracted_data is a JSON list of rows. Rows with values that do not match the column types
+    are skipped and reported with the row index, column and value.
+    """
+    try:
+        records = json.loads(extracted_data)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="extracted_data is not valid JSON")
+    if not isinstance(records, list) or not all(
+        isinstance(record, dict) for record in records
+    ):
+        raise HTTPException(
+            status_code=400, detail="extracted_data must be a list of rows"
+        )
+
     # Get the organization name
     with DatabaseManager() as session:
         org_manager = OrganizationManager(session)
@@ -246,14 +303,51 @@ async def save_extracted_data(
                 data_profile_name, current_user.organization_id
             )
         )
+        if data_profile is None:
+            raise HTTPException(status_code=404, detail="Data Profile not found")
 
         table_manager = TableManager(session)
-        print(data_profile, table_manager)  # TODO: To be further implemented
+        result = await run_in_threadpool(
+            table_manager.insert_extracted_records, records, data_profile.table_name
+        )
 
     # Upload the JPG file to DigitalOcean Spaces, automatically deleting it when done
     with DigitalOceanSpaceManager(
         organization_name=organization_name, files=files
     ) as space_manager:
-        space_manager.upload_files()
+        await run_in_threadpool(space_manager.upload_files)
+
+    return {"message": "Extracted data saved successfully", **result}
+
 
-    return {"message": "Extracted data saved successfully"}
+async def submit_extraction_job(
+    files: List[UploadFile], current_user: UserPrincipal, payload: dict
+) -> JobSubmitResponse:
+    """Store the uploaded files in DigitalOcean Spaces, where any worker can read them, and queue the job."""
+    with DatabaseManager() as session:
+        org_manager = OrganizationManager(session)
+        organization_name = org_manager.get_organization(
+            current_user.organization_id
+        ).name
+
+    # Every job gets its own folder so that equally named uploads never collide
+    space_manager = DigitalOceanSpaceManager(
+        organization_name=f"{organization_name}/jobs/{uuid.uuid4().hex}", files=files
+    )
+    if not await run_in_threadpool(space_manager.upload_files):
+        space_manager.delete_files()
+        raise HTTPException(status_code=502, detail="Could not store the files")
+
+    with DatabaseManager() as session:
+        job_manager = JobManager(session)
+        job = job_manager.create_job(
+            job_type="data_profile_extraction",
+            organization_id=current_user.organization_id,
+            user_id=current_user.id,
+            payload={
+                **payload,
+                "organization_name": organization_name,
+                "object_names": space_manager.object_names,
+            },
+        )
+        return JobSubmitResponse(job_id=job.id, status=job.status)
@@ -5,23 +5,25 @@ from fastapi.exceptions import HTTPException
 from fastapi.responses import JSONResponse
 from llms.base import BaseLLM
 from llms.utils import get_llm_sql_object
-from models.user import User
+from models.user import UserPrincipal
 from security import get_current_user
-from utils.utils import process_file, save_to_data_lake
+from utils.utils import get_app_logger, process_file, save_to_data_lake
+
+logger = get_app_logger(__name__)
 
 file_router = APIRouter()
 
 
 @file_router.get("/encodings/")
 async def get_encodings(
-    file_type: str = "", current_user: User = Depends(get_current_user)
+    file_type: str = "", current_user: UserPrincipal = Depends(get_current_user)
 ):
     encodings = {"csv": ["utf_8", "ascii", "latin_1", "utf_16", "ANSI"], "pdf": []}
     return encodings.get("csv", None)
 
 
 @file_router.get("/file_types/")
-async def get_file_types(current_user: User = Depends(get_current_user)):
+async def get_file_types(current_user: UserPrincipal = Depends(get_current_user)):
     return ["csv", "pdf"]
 
 
@@ -32,7 +34,7 @@ async def upload_file(
     is_new_table: bool = Form(default=False),
     encoding: str = Form(default=""),
     llm: BaseLLM = Depends(get_llm_sql_object),
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     """
     Upload a file and optionally include a message to clarify user data for the LLM.
@@ -48,8 +50,17 @@ async def upload_file(
         JSONResponse: A JSON response containing either a success message and result or an error message.
     """
     try:
+        if current_user.organization_id is None:
+            raise HTTPException(
+                status_code=400, detail="The user does not belong to an organization"
+            )
+
         # Process the file to get the sample content
-        processed_df, sample_content, header = process_file(file, encoding)
+        processed_chunks, sample_content, header = process_file(file, encoding)
+        if processed_chunks is None:
+            raise HTTPException(
+                status_code=400, detail="Only CSV files can be appended to tables"
+            )
 
         # Instantiate TableManager
         with DatabaseManager() as session:
@@ -57,16 +68,31 @@ async def upload_file(
 
             # Create new table if necessary
             if is_new_table:
-                create_table_query = table_manager.create_table_with_llm(
+                create_table_query = await table_manager.create_table_with_llm(
                     sample_content, header, extra_desc
                 )
-                table_manager.create_table_desc_with_llm(
-                    create_table_query, sample_content, extra_desc
+                if not create_table_query:
+                    raise HTTPException(
+                        status_code=400, detail="Could not create the table"
+                    )
+                await table_manager.create_table_desc_with_llm(
+                    create_table_query,
+                    sample_content,
+                    extra_desc,
+                    current_user.organization_id,
                 )
 
             # Append file to table
-            table_name = table_manager.determine_table(sample_content, extra_desc)
-            table_manager.append_to_table(processed_df, table_name)
+            table_name = await table_manager.determine_table(
+                sample_content, extra_desc, header, current_user.organization_id
+            )
+            table_manager.append_chunks_to_table(
+                processed_chunks,
+                table_name,
+                on_progress=lambda chunk_count, row_count: logger.info(
+                    f"Appended chunk {chunk_count} to {table_name} ({row_count} rows so far)"
+                ),
+            )
 
             # Optionally, save the file to a data lake
             save_to_data_lake(file)
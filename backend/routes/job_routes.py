@@ -0,0 +1,18 @@
+from database.database_manager import DatabaseManager
+from database.job_manager import JobManager
+from fastapi import APIRouter, Depends, HTTPException
+from models.user import UserPrincipal
+from security import get_current_user
+
+job_router = APIRouter()
+
+
+@job_router.get("/jobs/{job_id}")
+async def get_job(job_id: int, current_user: UserPrincipal = Depends(get_current_user)):
+    """Get the status, progress and, once it has succeeded, the result of a background job."""
+    with DatabaseManager() as session:
+        job_manager = JobManager(session)
+        job = job_manager.get_job(job_id, current_user.organization_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job.to_dict()
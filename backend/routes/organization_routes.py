@@ -6,14 +6,16 @@ from models.organization import (
     OrganizationCreateRequest,
     OrganizationCreateResponse,
 )
-from models.user import User
+from models.user import User, UserPrincipal
 from security import get_current_admin_user, get_current_user
 
 organization_router = APIRouter()
 
 
 @organization_router.get("/organization/")
-async def get_organization(org_id: int, current_user: User = Depends(get_current_user)):
+async def get_organization(
+    org_id: int, current_user: UserPrincipal = Depends(get_current_user)
+):
     with DatabaseManager() as session:
         org_manager = OrganizationManager(session)
         org = org_manager.get_organization(org_id)
@@ -30,7 +32,8 @@ async def get_organizations(current_admin: User = Depends(get_current_admin_user
 
 @organization_router.post("/organization/", response_model=OrganizationCreateResponse)
 async def save_organization(
-    org: OrganizationCreateRequest, current_user: User = Depends(get_current_user)
+    org: OrganizationCreateRequest,
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
     with DatabaseManager() as session:
         org_manager = OrganizationManager(session)
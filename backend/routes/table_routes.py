@@ -1,15 +1,24 @@
-from database.database_manager import DatabaseManager
+from typing import Optional
+
+from database.database_manager import DatabaseManager, get_async_session
 from database.table_manager import TableManager
 from database.table_metadata_manager import TableMetadataManager
-from fastapi import APIRouter, Depends
-from models.user import User
-from security import get_current_user
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from models.user import UserPrincipal
+from security import get_current_admin_user, get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.columnar import MEDIA_TYPES, iter_arrow_ipc, iter_parquet, negotiate_format
+from utils.utils import iter_json_array, iter_ndjson
 
 table_router = APIRouter()
 
 
 @table_router.get("/organization/{org_id}/tables/")
-async def get_org_tables(org_id: int, current_user: User = Depends(get_current_user)):
+async def get_org_tables(
+    org_id: int, current_user: UserPrincipal = Depends(get_current_user)
+):
     with DatabaseManager() as session:
         manager = TableManager(session)
         tables = manager.get_org_tables(org_id)
@@ -18,7 +27,7 @@ async def get_org_tables(org_id: int, current_user: User = Depends(get_current_u
 
 @table_router.get("/table/columns/")
 async def get_table_columns(
-    table_name: str, current_user: User = Depends(get_current_user)
+    table_name: str, current_user: UserPrincipal = Depends(get_current_user)
 ):
     with DatabaseManager() as session:
         manager = TableManager(session)
@@ -26,18 +35,68 @@ async def get_table_columns(
     return columns
 
 
+@table_router.get("/table/rows/")
+async def get_table_rows(
+    table_name: str,
+    limit: Optional[int] = Query(None, ge=0),
+    format: Optional[str] = Query(None, pattern="^(ndjson|json|arrow|parquet)$"),
+    accept: Optional[str] = Header(None),
+    current_user: UserPrincipal = Depends(get_current_user),
+):
+    """
+    Stream the rows of a table, e.g. for exports and previews of large tables.
+
+    Rows are read through a server-side cursor and sent batch by batch, in constant memory. The
+    format is taken from the format parameter or negotiated from the Accept header:
+    newline-delimited JSON (the default), a single JSON array, an Arrow IPC stream
+    (application/vnd.apache.arrow.stream) or a Parquet file (application/vnd.apache.parquet).
+    """
+
+    def table_exists():
+        with DatabaseManager() as session:
+            return table_name in TableManager(session).list_all_tables()
+
+    if not await run_in_threadpool(table_exists):
+        raise HTTPException(status_code=404, detail="Table not found")
+
+    result_format = negotiate_format(accept, format, default="ndjson")
+
+    # The sessions stay open while the response is being sent
+    def batches():
+        with DatabaseManager() as session:
+            yield from TableManager(session).stream_table_rows(table_name, limit)
+
+    def record_batches():
+        with DatabaseManager() as session:
+            yield from TableManager(session).stream_table_record_batches(
+                table_name, limit
+            )
+
+    if result_format == "arrow":
+        content = iter_arrow_ipc(record_batches())
+    elif result_format == "parquet":
+        content = iter_parquet(record_batches())
+    elif result_format == "json":
+        content = iter_json_array(batches())
+    else:
+        content = iter_ndjson(batches())
+    return StreamingResponse(content, media_type=MEDIA_TYPES[result_format])
+
+
 @table_router.get("/table/metadata/")
 async def get_table_metadata(
-    table_name: str, current_user: User = Depends(get_current_user)
+    table_name: str,
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    with DatabaseManager() as session:
-        manager = TableMetadataManager(session)
-        metadata = manager.get_metadata(table_name)
+    metadata = await session.run_sync(
+        lambda sync_session: TableMetadataManager(sync_session).get_metadata(table_name)
+    )
     return metadata
 
 
 @table_router.get("/tables/")
-async def get_tables(current_user: User = Depends(get_current_user)):
+async def get_tables(current_user: UserPrincipal = Depends(get_current_user)):
     with DatabaseManager() as session:
         table_manager = TableManager(session)
         tables = table_manager.list_all_tables()
@@ -45,15 +104,30 @@ async def get_tables(current_user: User = Depends(get_current_user)):
 
 
 @table_router.get("/tables/metadata/")
-async def get_all_table_metadata(current_user: User = Depends(get_current_user)):
-    with DatabaseManager() as session:
-        manager = TableMetadataManager(session)
-        metadata = manager.get_all_metadata()
+async def get_all_table_metadata(
+    current_user: UserPrincipal = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    metadata = await session.run_sync(
+        lambda sync_session: TableMetadataManager(sync_session).get_all_metadata()
+    )
     return metadata
 
 
+@table_router.get("/tables/schema-cache/stats/")
+async def get_schema_cache_stats(
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
+):
+    with DatabaseManager() as session:
+        manager = TableManager(session)
+        stats = manager.get_schema_cache_stats()
+    return stats
+
+
 @table_router.delete("/table/")
-async def drop_table(table_name: str, current_user: User = Depends(get_current_user)):
+async def drop_table(
+    table_name: str, current_user: UserPrincipal = Depends(get_current_user)
+):
     with DatabaseManager() as session:
         manager = TableManager(session)
         manager.drop_table(table_name)
@@ -1,6 +1,6 @@
 import asyncio
 
-from database.database_manager import DatabaseManager
+from database.database_manager import DatabaseManager, get_async_session
 from database.user_manager import UserManager
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from models.user import (
@@ -9,8 +9,8 @@ from models.user import (
     ForgotPasswordRequest,
     ResetPasswordRequest,
     SendVerificationEmailRequest,
-    User,
     UserOut,
+    UserPrincipal,
     UserRole,
     UserUpdate,
     VerifyEmailRequest,
@@ -22,9 +22,9 @@ from security import (
     generate_password_reset_token,
     get_current_admin_user,
     get_current_user,
-    get_password_hash,
-    verify_password,
+    password_hasher,
 )
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils.email import (
     send_password_reset_email_with_sendgrid,
     send_verification_email_with_sendgrid,
@@ -40,17 +40,20 @@ def run_in_new_loop(coro):
 
 
 @user_router.get("/users/")
-async def get_users(current_admin_user: User = Depends(get_current_admin_user)):
-    # Open a database session and fetch all users
-    with DatabaseManager() as session:
-        user_manager = UserManager(session)
-        users = user_manager.get_users_without_password()
+async def get_users(
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    # Fetch all users without blocking the event loop
+    users = await session.run_sync(
+        lambda sync_session: UserManager(sync_session).get_users_without_password()
+    )
 
     return users
 
 
 @user_router.get("/users/me/", response_model=UserOut)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserPrincipal = Depends(get_current_user)):
     user_out = UserOut(
         id=current_user.id,
         username=current_user.username,
@@ -64,13 +67,14 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 
 
 @user_router.get("/users/roles/")
-async def get_user_roles(current_user: User = Depends(get_current_user)):
+async def get_user_roles(current_user: UserPrincipal = Depends(get_current_user)):
     return list(UserRole)
 
 
 @user_router.put("/users/update/")
 async def update_user(
-    user_data: UserUpdate, current_admin_user: User = Depends(get_current_admin_user)
+    user_data: UserUpdate,
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
 ):
     with DatabaseManager() as session:
         user_manager = UserManager(session)
@@ -91,17 +95,25 @@ async def update_user(
 @user_router.put("/users/change-password/")
 async def change_user_password(
     change_password: ChangePasswordRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
 ):
-    # Verify old password
-    if not verify_password(change_password.old_password, current_user.hashed_password):
+    # Verify old password against the stored hash, the cached user does not hold it
+    with DatabaseManager() as session:
+        user_manager = UserManager(session)
+        db_user = user_manager.get_user_by_username(current_user.username)
+        hashed_password = db_user.hashed_password if db_user else None
+
+    if not hashed_password or not await password_hasher.verify(
+        change_password.old_password, hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Invalid old password")
 
+    new_hashed_password = await password_hasher.hash(change_password.new_password)
+
     with DatabaseManager() as session:
         user_manager = UserManager(session)
 
         # Update user password
-        new_hashed_password = get_password_hash(change_password.new_password)
         updated_user = user_manager.update_user_password(
             username=current_user.username,
             new_hashed_password=new_hashed_password,
@@ -149,11 +161,12 @@ async def reset_password(request: ResetPasswordRequest):
     if request.new_password != request.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
+    new_hashed_password = await password_hasher.hash(request.new_password)
+
     with DatabaseManager() as session:
         user_manager = UserManager(session)
 
         # Update user password
-        new_hashed_password = get_password_hash(request.new_password)
         updated_user = user_manager.update_user_password(
             username=token_data.username,
             new_hashed_password=new_hashed_password,
@@ -211,14 +224,14 @@ async def verify_email(request: VerifyEmailRequest):
 
 
 @user_router.get("/users/is-email-verified/")
-async def is_user_verified(current_user: User = Depends(get_current_user)):
+async def is_user_verified(current_user: UserPrincipal = Depends(get_current_user)):
     return {"email_verified": current_user.email_verified}
 
 
 @user_router.delete("/users/delete/")
 async def delete_user(
     request: DeleteUserRequest,
-    current_admin_user: User = Depends(get_current_admin_user),
+    current_admin_user: UserPrincipal = Depends(get_current_admin_user),
 ):
     with DatabaseManager() as session:
         user_manager = UserManager(session)
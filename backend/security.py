@@ -1,18 +1,22 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Optional
 
-from database.database_manager import DatabaseManager
-from database.user_manager import UserManager
+from database.database_manager import AsyncDatabaseManager, DatabaseManager
+from database.user_manager import UserManager, user_principal_cache
 from fastapi import Cookie, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from models.token import EmailVerificationTokenData, ResetTokenData
-from models.user import User
+from models.user import User, UserPrincipal
 from passlib.context import CryptContext
 from pydantic import EmailStr
 from settings import (
     EMAIL_VERIFICATION_EXPIRE_MINUTES,
     JWT_SECRET_KEY,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_MAX_WORKERS,
     PASSWORD_RESET_EXPIRE_MINUTES,
 )
 
@@ -26,21 +30,91 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token/")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def authenticate_user(username: str, email: EmailStr, password: str) -> User:
-    with DatabaseManager() as session:
-        manager = UserManager(session)
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a dedicated, size-limited thread pool.
+
+    bcrypt is deliberately slow, so calling it directly in an `async def` handler blocks
+    the event loop for every other request on the worker. The admission limit caps the
+    number of operations that may be running or queued at once; requests above it are
+    rejected with a 503 so a login storm cannot build an unbounded backlog.
+
+    Attributes:
+        max_workers (int): The number of threads that run bcrypt.
+        max_pending (int): The maximum number of running and queued operations.
+        pending (int): The number of operations currently running or queued.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hasher"
+        )
+
+    async def _run(self, func: Callable, *args) -> Any:
+        # Only touched from the event loop thread, so a plain counter is safe
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash without blocking the event loop."""
+        is_valid: bool = await self._run(
+            verify_password, plain_password, hashed_password
+        )
+        return is_valid
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        hashed_password: str = await self._run(get_password_hash, password)
+        return hashed_password
 
+    def get_stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher(
+    max_workers=PASSWORD_HASH_MAX_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING
+)
+
+
+async def authenticate_user(
+    username: str, email: EmailStr, password: str
+) -> Optional[User]:
+    def _get_user(sync_session) -> Optional[User]:
+        manager = UserManager(sync_session)
         if email:
-            user = manager.get_user_by_email(email=email)
+            return manager.get_user_by_email(email=email)
         elif username:
-            user = manager.get_user_by_username(username=username)
-        else:
-            return None
+            return manager.get_user_by_username(username=username)
+        return None
 
-        if user and verify_password(password, user.hashed_password):
-            return user
+    async with AsyncDatabaseManager() as session:
+        user = await session.run_sync(_get_user)
 
-        return None
+    if user and await password_hasher.verify(password, user.hashed_password):
+        return user
+
+    return None
 
 
 def verify_password(plain_password, hashed_password):
@@ -146,15 +220,19 @@ def decode_token(token: str):
         return None
 
 
-def get_current_user(request: Request) -> User:
+def get_current_user(request: Request) -> UserPrincipal:
     """
     Retrieve the current user based on the JWT token stored in the cookie.
 
+    The user is looked up in the database on the first request and cached as an
+    immutable UserPrincipal snapshot keyed by the token subject. UserManager
+    invalidates the cached snapshot whenever the user is updated or deleted.
+
     Args:
         request (Request): The request object.
 
     Returns:
-        User: The user object associated with the token.
+        UserPrincipal: A snapshot of the user associated with the token.
 
     Raises:
         HTTPException: If token is invalid or user is not found.
@@ -175,6 +253,10 @@ def get_current_user(request: Request) -> User:
     except JWTError as e:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
 
+    cached_user: Optional[UserPrincipal] = user_principal_cache.get(username)
+    if cached_user is not None:
+        return cached_user
+
     with DatabaseManager() as session:
         user_manager = UserManager(session)
         user = user_manager.get_user_by_username(username=username)
@@ -184,12 +266,15 @@ def get_current_user(request: Request) -> User:
                 status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
             )
 
-    return user
+        principal = UserPrincipal.model_validate(user)
+
+    user_principal_cache.set(username, principal)
+    return principal
 
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user),
+) -> UserPrincipal:
     if current_user.role != "system_admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
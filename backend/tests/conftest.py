@@ -0,0 +1,34 @@
+import os
+import sys
+
+# The backend modules import each other from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# settings reads these without defaults, the tests do not use real credentials
+for name in (
+    "APP_HOST",
+    "AZURE_APP_SECRET",
+    "AZURE_APP_VALUE",
+    "AZURE_CLIENT_ID",
+    "AZURE_TENANT_ID",
+    "JWT_SECRET_KEY",
+    "OPENAI_API_KEY",
+    "SENDGRID_API_KEY",
+    "SPACES_ACCESS_KEY",
+    "SPACES_BUCKET_NAME",
+    "SPACES_REGION_NAME",
+    "SPACES_SECRET_ACCESS_KEY",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("APP_ENV", "test")
+os.environ.setdefault("SPACES_ENDPOINT_URL", "http://localhost:9000")
+
+# Register every model, as the application does through its routes, so that relationships
+# between models resolve whichever of them a test imports
+import importlib  # noqa: E402
+import pkgutil  # noqa: E402
+
+import models  # noqa: E402
+
+for module_info in pkgutil.iter_modules(models.__path__):
+    importlib.import_module(f"models.{module_info.name}")
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from models.table_version import TableVersion
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from utils import chart_renderer
+from utils.chart_renderer import render_dashboard_charts
+
+ROWS = [{"region": "north", "total": 10}, {"region": "south", "total": 20}]
+
+
+class FakeAsyncSession:
+    """Runs functions like AsyncSession.run_sync, with the sync session first."""
+
+    def __init__(self, sync_session: Session, delay: float = 0):
+        self.sync_session = sync_session
+        self.delay = delay
+
+    async def run_sync(self, fn, *args, **kwargs):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return fn(self.sync_session, *args, **kwargs)
+
+
+@pytest.fixture
+def use_database(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    TableVersion.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE sales (region TEXT, total INTEGER)"))
+        connection.execute(text("INSERT INTO sales VALUES (:region, :total)"), ROWS)
+
+    def use(delay: float = 0):
+        class FakeAsyncDatabaseManager:
+            async def __aenter__(self):
+                self.session = Session(engine)
+                return FakeAsyncSession(self.session, delay)
+
+            async def __aexit__(self, exc_type, exc_value, traceback):
+                self.session.close()
+
+        monkeypatch.setattr(
+            chart_renderer, "AsyncDatabaseManager", FakeAsyncDatabaseManager
+        )
+
+    return use
+
+
+def _chart(chart_id: int, query=None) -> dict:
+    config = {"type": "bar", "nivoConfig": {"keys": ["total"]}}
+    if query:
+        config["query"] = query
+    return {"id": chart_id, "config": config}
+
+
+@pytest.mark.asyncio
+async def test_dashboard_charts_are_rendered_from_their_queries(use_database):
+    use_database()
+    charts = [
+        _chart(1, "SELECT region, total FROM sales ORDER BY region"),
+        _chart(2),
+        _chart(3, "SELECT * FROM missing_table"),
+    ]
+
+    rendered = await render_dashboard_charts(charts)
+
+    assert [chart["status"] for chart in rendered] == ["ok", "ok", "error"]
+    assert rendered[0]["config"]["nivoConfig"]["data"] == ROWS
+    assert rendered[0]["config"]["dataTruncated"] is False
+    assert rendered[1]["config"] == charts[1]["config"]
+    assert "data" not in rendered[2]["config"]["nivoConfig"]
+
+
+@pytest.mark.asyncio
+async def test_charts_not_rendered_by_the_deadline_time_out(use_database):
+    use_database(delay=0.5)
+
+    [rendered] = await render_dashboard_charts(
+        [_chart(1, "SELECT * FROM sales")],
+        deadline_seconds=0.1,
+        statement_timeout_seconds=0.05,
+    )
+
+    assert rendered["status"] == "timeout"
+    assert rendered["elapsed_ms"] is None
+    assert "data" not in rendered["config"]["nivoConfig"]
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_must_be_below_the_deadline():
+    with pytest.raises(ValueError):
+        await render_dashboard_charts(
+            [], deadline_seconds=1, statement_timeout_seconds=1
+        )
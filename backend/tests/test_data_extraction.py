@@ -0,0 +1,80 @@
+import pytest
+from llms.gpt import GPTLLM
+from PIL import Image
+from utils import data_extraction
+from utils.disk_cache import DiskLRUCache
+from utils.image_conversion_manager import ImageConversionManager
+
+
+class FakeDataProfile:
+    def __init__(self, extract_instructions: str):
+        self.extract_instructions = extract_instructions
+
+
+@pytest.fixture
+def extraction_calls(monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_extract_data_from_images(
+        data_profile, prepared_images, organization_name, current_user
+    ):
+        calls.append(data_profile.extract_instructions)
+        return [{"page": index} for index, _ in enumerate(prepared_images)]
+
+    monkeypatch.setattr(
+        data_extraction,
+        "extraction_result_cache",
+        DiskLRUCache(str(tmp_path / "results"), max_bytes=1024 * 1024),
+    )
+    monkeypatch.setattr(
+        data_extraction, "extract_data_from_images", fake_extract_data_from_images
+    )
+    monkeypatch.setattr(
+        ImageConversionManager,
+        "prepare_for_vision",
+        lambda self, jpg_file_paths: jpg_file_paths,
+    )
+    return calls
+
+
+@pytest.fixture
+def jpg_file(tmp_path):
+    path = str(tmp_path / "page.jpg")
+    Image.new("RGB", (8, 8), "white").save(path, "JPEG")
+    return path
+
+
+async def extract(jpg_file, extract_instructions):
+    return await data_extraction.extract_data_from_files(
+        FakeDataProfile(extract_instructions), [jpg_file], "org", None
+    )
+
+
+@pytest.mark.asyncio
+async def test_result_cache_hit_skips_extraction(extraction_calls, jpg_file):
+    first = await extract(jpg_file, "Extract the totals")
+    second = await extract(jpg_file, "Extract the totals")
+
+    assert first == second == [{"page": 0}]
+    assert extraction_calls == ["Extract the totals"]
+
+
+@pytest.mark.asyncio
+async def test_changed_instructions_miss_the_result_cache(extraction_calls, jpg_file):
+    await extract(jpg_file, "Extract the totals")
+    await extract(jpg_file, "Extract the dates")
+
+    assert extraction_calls == ["Extract the totals", "Extract the dates"]
+
+
+def test_cache_key_changes_with_instructions_and_model(monkeypatch):
+    key = data_extraction.get_extraction_cache_key(["abc"], "Extract the totals")
+
+    assert key == data_extraction.get_extraction_cache_key(
+        ["abc"], "Extract the totals"
+    )
+    assert key != data_extraction.get_extraction_cache_key(["abc"], "Extract the dates")
+    monkeypatch.setattr(GPTLLM, "vision_model", "another-vision-model")
+    assert key != data_extraction.get_extraction_cache_key(
+        ["abc"], "Extract the totals"
+    )
@@ -0,0 +1,74 @@
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+from moto import mock_s3
+from utils.object_storage import digitalocean_space_manager
+from utils.object_storage.digitalocean_space_manager import DigitalOceanSpaceManager
+
+BUCKET_NAME = "test-bucket"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(digitalocean_space_manager, "SPACES_BUCKET_NAME", BUCKET_NAME)
+    with mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
+
+
+def test_injected_client_is_used(s3_client, monkeypatch):
+    monkeypatch.setattr(digitalocean_space_manager, "_client", None)
+
+    manager = DigitalOceanSpaceManager(object_names=["org/a.pdf"], client=s3_client)
+
+    assert manager.client is s3_client
+    assert digitalocean_space_manager._client is None
+
+
+def test_large_files_are_uploaded_in_parts(s3_client, monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        digitalocean_space_manager,
+        "transfer_config",
+        TransferConfig(multipart_threshold=5 * MB, multipart_chunksize=5 * MB),
+    )
+    content = b"x" * (11 * MB)
+    file_path = tmp_path / "report.pdf"
+    file_path.write_bytes(content)
+
+    manager = DigitalOceanSpaceManager(
+        organization_name="Test Org", file_paths=[str(file_path)], client=s3_client
+    )
+
+    assert manager.upload_files_by_paths()
+    assert manager.object_names == ["Test_Org/report.pdf"]
+    uploaded = s3_client.head_object(Bucket=BUCKET_NAME, Key="Test_Org/report.pdf")
+    # Multipart uploads get an ETag suffixed with their number of parts
+    assert uploaded["ETag"].strip('"').endswith("-3")
+    assert uploaded["ContentLength"] == len(content)
+
+    download_folder = tmp_path / "downloads"
+    download_folder.mkdir()
+    [downloaded_path] = manager.download_files(str(download_folder))
+    with open(downloaded_path, "rb") as downloaded_file:
+        assert downloaded_file.read() == content
+
+
+def test_more_than_1000_files_are_deleted_in_batches(s3_client):
+    object_names = [f"org/file_{index}.txt" for index in range(2500)]
+    for object_name in object_names:
+        s3_client.put_object(Bucket=BUCKET_NAME, Key=object_name, Body=b"")
+    batch_sizes = []
+    s3_client.meta.events.register(
+        "before-call.s3.DeleteObjects",
+        lambda params, **kwargs: batch_sizes.append(params["body"].count(b"<Key>")),
+    )
+
+    manager = DigitalOceanSpaceManager(object_names=object_names, client=s3_client)
+
+    assert manager.delete_files()
+    assert batch_sizes == [1000, 1000, 500]
+    assert s3_client.list_objects_v2(Bucket=BUCKET_NAME)["KeyCount"] == 0
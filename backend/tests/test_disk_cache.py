@@ -0,0 +1,132 @@
+import os
+
+import pytest
+from utils import image_conversion_manager
+from utils.disk_cache import DiskLRUCache
+from utils.image_conversion_manager import (
+    ImageConversionManager,
+    shutdown_render_executor,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskLRUCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+
+
+def set_last_used(cache, key, timestamp):
+    os.utime(os.path.join(cache.directory, key), (timestamp, timestamp))
+
+
+def test_json_round_trip_counts_hits_and_misses(cache):
+    assert cache.get_json("rows") is None
+
+    cache.set_json("rows", [{"region": "north"}])
+
+    assert cache.get_json("rows") == [{"region": "north"}]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted_over_max_bytes(cache):
+    cache.set_json("a", "x" * 400)
+    cache.set_json("b", "x" * 400)
+    set_last_used(cache, "a", 1000)
+    set_last_used(cache, "b", 2000)
+    assert cache.get_json("a") is not None  # Now the most recently used entry
+    cache.max_bytes = 1000
+
+    cache.set_json("c", "x" * 400)
+
+    assert cache.get_json("b") is None
+    assert cache.get_json("a") is not None
+    assert cache.get_json("c") is not None
+    assert cache.get_stats()["size_bytes"] <= 1000
+
+
+def test_files_are_copied_out_of_the_cache(cache, tmp_path):
+    page = tmp_path / "page.jpg"
+    page.write_bytes(b"page")
+    cache.set_files("doc", [str(page)])
+
+    paths = cache.get_files("doc", str(tmp_path / "request"))
+    cache.clear()  # E.g. evicted by another process
+
+    assert [os.path.dirname(path) for path in paths] == [str(tmp_path / "request")]
+    assert open(paths[0], "rb").read() == b"page"
+
+
+def test_entry_with_missing_files_is_a_miss(cache, tmp_path):
+    page = tmp_path / "page.jpg"
+    page.write_bytes(b"page")
+    cache.set_files("doc", [str(page)])
+    entry_path = os.path.join(cache.directory, "doc")
+    for file_name in os.listdir(entry_path):
+        if file_name.endswith(".jpg"):
+            os.unlink(os.path.join(entry_path, file_name))
+
+    assert cache.get_files("doc", str(tmp_path / "request")) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+@pytest.fixture
+def render_calls(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_render_pdf_pages(file_path, first_page, last_page, output_folder):
+        calls.append((first_page, last_page))
+        paths = []
+        for page in range(first_page, last_page + 1):
+            path = os.path.join(output_folder, f"doc_page-{page:02d}.jpg")
+            with open(path, "wb") as file:
+                file.write(f"page {page}".encode())
+            paths.append(path)
+        return paths
+
+    monkeypatch.setattr(
+        image_conversion_manager,
+        "page_cache",
+        DiskLRUCache(str(tmp_path / "pages"), max_bytes=1024 * 1024),
+    )
+    monkeypatch.setattr(
+        image_conversion_manager, "_render_pdf_pages", fake_render_pdf_pages
+    )
+    monkeypatch.setattr(
+        image_conversion_manager, "pdfinfo_from_path", lambda path: {"Pages": 2}
+    )
+    yield calls
+    shutdown_render_executor()
+
+
+def convert(file_path):
+    with ImageConversionManager([file_path]) as manager:
+        return [open(path, "rb").read() for path in manager.convert_to_jpgs()]
+
+
+def test_page_cache_hit_skips_rendering(render_calls, tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 document")
+
+    first = convert(str(pdf))
+    render_count = len(render_calls)
+    second = convert(str(pdf))
+
+    assert first == second == [b"page 1", b"page 2"]
+    assert len(render_calls) == render_count
+    assert image_conversion_manager.page_cache.hits == 1
+
+
+def test_evicted_pages_are_rendered_again(render_calls, tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF-1.4 document")
+    convert(str(pdf))
+    render_count = len(render_calls)
+    for entry in os.scandir(image_conversion_manager.page_cache.directory):
+        for file in os.scandir(entry.path):
+            if file.name.endswith(".jpg"):
+                os.unlink(file.path)
+                break
+
+    pages = convert(str(pdf))
+
+    assert pages == [b"page 1", b"page 2"]
+    assert len(render_calls) == 2 * render_count
@@ -0,0 +1,39 @@
+from utils.extraction_planner import merge_rows, plan_page_groups
+
+
+def test_plan_page_groups_respects_page_and_token_limits():
+    assert plan_page_groups([100, 100, 100, 500, 100], 300, 2) == [
+        [0, 1],
+        [2],
+        [3],
+        [4],
+    ]
+
+
+def test_merge_rows_keeps_repeated_rows_within_a_group():
+    row = {"item": "Bolt", "amount": 1}
+
+    assert merge_rows([[row, row], [{"item": "Nut", "amount": 2}]]) == [
+        row,
+        row,
+        {"item": "Nut", "amount": 2},
+    ]
+
+
+def test_merge_rows_drops_rows_repeated_across_a_boundary():
+    first = {"item": "Bolt", "amount": 1}
+    spanning = {"item": "Nut", "amount": 2}
+    last = {"item": "Washer", "amount": 3}
+
+    merged = merge_rows(
+        [[first, spanning], [{" Item ": "Nut ", "AMOUNT": 2}, last], [last]]
+    )
+
+    assert merged == [first, spanning, last]
+
+
+def test_merge_rows_keeps_identical_rows_of_non_adjacent_groups():
+    row = {"item": "Bolt", "amount": 1}
+    other = {"item": "Nut", "amount": 2}
+
+    assert merge_rows([[row], [other], [row]]) == [row, other, row]
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from typing import Union
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from llms.llm_client import LLMClient
+
+COMPLETION = {"choices": [{"message": {"content": "SELECT 1"}}]}
+
+
+class StubServer:
+    """Answers chat completion requests with the queued responses, in order."""
+
+    def __init__(self, *responses: Union[httpx.Response, Exception], delay: float = 0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        response = (
+            self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        )
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _client(server: StubServer, **kwargs) -> LLMClient:
+    return LLMClient(
+        base_url="http://llm.test",
+        api_key="test",
+        transport=httpx.MockTransport(server),
+        **kwargs,
+    )
+
+
+def _stream_body(*deltas: str) -> bytes:
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": delta}}]})
+        for delta in deltas
+    ]
+    return ("\n\n".join(events + ["data: [DONE]"]) + "\n\n").encode()
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried():
+    server = StubServer(
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.ConnectError("connection refused"),
+        httpx.Response(200, json=COMPLETION),
+    )
+    client = _client(server)
+
+    assert (
+        await client.chat_completion({"model": "gpt"}, organization_id=1) == COMPLETION
+    )
+    assert server.requests == 3
+    assert client.get_stats()["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_immediately():
+    server = StubServer(httpx.Response(400, text="bad request"))
+    client = _client(server)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await client.chat_completion({"model": "gpt"})
+
+    assert exc_info.value.status_code == 502
+    assert server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_the_deadline():
+    server = StubServer(httpx.Response(503, headers={"Retry-After": "0.05"}))
+    client = _client(server, retry_deadline=0.2)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await client.chat_completion({"model": "gpt"})
+
+    assert exc_info.value.status_code == 503
+    assert 1 < server.requests < 10
+
+
+@pytest.mark.asyncio
+async def test_stream_is_retried_before_the_first_token():
+    server = StubServer(
+        httpx.Response(503, headers={"Retry-After": "0"}),
+        httpx.Response(200, content=_stream_body("SELECT", " 1")),
+    )
+    client = _client(server)
+
+    deltas = [delta async for delta in client.stream_chat_completion({"model": "gpt"})]
+
+    assert deltas == ["SELECT", " 1"]
+    assert server.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_slot_is_bounded_by_the_deadline():
+    server = StubServer(httpx.Response(200, json=COMPLETION), delay=0.5)
+    client = _client(server, max_concurrent_requests=1, retry_deadline=0.1)
+
+    results = await asyncio.gather(
+        client.chat_completion({"model": "gpt"}, organization_id=1),
+        client.chat_completion({"model": "gpt"}, organization_id=2),
+        return_exceptions=True,
+    )
+
+    assert results[0] == COMPLETION
+    assert isinstance(results[1], HTTPException)
+    assert results[1].status_code == 503
+    assert server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_organizations_release_their_semaphores():
+    server = StubServer(httpx.Response(200, json=COMPLETION))
+    client = _client(server)
+
+    await asyncio.gather(
+        *(
+            client.chat_completion({"model": "gpt"}, organization_id=org_id)
+            for org_id in range(20)
+        )
+    )
+
+    assert client._org_semaphores == {}
+    assert client.get_stats()["in_flight"] == 0
+    await client.aclose()
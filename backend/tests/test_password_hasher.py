@@ -0,0 +1,72 @@
+import asyncio
+import statistics
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from security import PasswordHasher
+
+# Low cost factor, so the load test measures queueing and event loop blocking rather than
+# the deliberately slow hash itself
+HASHED_PASSWORD = bcrypt.using(rounds=4).hash("correct horse")
+
+
+def _p99(samples):
+    return statistics.quantiles(samples, n=100)[98]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_logins_do_not_block_the_event_loop():
+    hasher = PasswordHasher(max_workers=2, max_pending=64)
+    lags = []
+    stopped = False
+
+    async def measure_loop_lag():
+        while not stopped:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def login():
+        start = time.perf_counter()
+        assert await hasher.verify("correct horse", HASHED_PASSWORD)
+        return time.perf_counter() - start
+
+    monitor = asyncio.ensure_future(measure_loop_lag())
+    try:
+        latencies = await asyncio.gather(*(login() for _ in range(64)))
+    finally:
+        stopped = True
+        await monitor
+        hasher.shutdown()
+
+    print(
+        f"login p99 {_p99(latencies) * 1000:.1f} ms, "
+        f"event loop lag p99 {_p99(lags) * 1000:.1f} ms"
+    )
+    assert _p99(latencies) < 2
+    assert _p99(lags) < 0.05
+    assert hasher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_requests_above_the_admission_limit_are_rejected():
+    hasher = PasswordHasher(max_workers=1, max_pending=1)
+    release = threading.Event()
+    running = asyncio.ensure_future(hasher._run(release.wait, 5))
+    await asyncio.sleep(0.01)
+
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher.verify("correct horse", HASHED_PASSWORD)
+    finally:
+        release.set()
+        await running
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert hasher.pending == 0
+    assert await hasher.verify("correct horse", HASHED_PASSWORD)
+    hasher.shutdown()
@@ -0,0 +1,190 @@
+import io
+import json
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from database.sql_executor import GuardedRows
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import chart_routes, table_routes
+from security import get_current_user
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from utils.columnar import negotiate_format
+
+# Three batches of two rows. The note column is NULL throughout the first batch and the
+# empty column is NULL in every row.
+ROWS = [
+    {"id": 1, "name": "Bolt", "amount": 1.5, "note": None, "empty": None},
+    {"id": 2, "name": "Nut", "amount": 2.0, "note": None, "empty": None},
+    {"id": 3, "name": "Washer", "amount": 0.25, "note": "bulk", "empty": None},
+    {"id": 4, "name": "Screw", "amount": 3.75, "note": None, "empty": None},
+    {"id": 5, "name": "Rivet", "amount": 10.0, "note": "sample", "empty": None},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE parts "
+                "(id INTEGER, name TEXT, amount REAL, note TEXT, empty TEXT)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO parts VALUES " "(:id, :name, :amount, :note, :empty)"),
+            ROWS,
+        )
+
+    @contextmanager
+    def database_manager():
+        session = Session(engine)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(table_routes, "DatabaseManager", database_manager)
+    monkeypatch.setattr("database.sql_executor.QUERY_STREAM_BATCH_SIZE", 2)
+
+    app = FastAPI()
+    app.include_router(table_routes.table_router)
+    app.include_router(chart_routes.chart_router)
+    app.dependency_overrides[get_current_user] = lambda: None
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "accept, requested_format, expected",
+    [
+        (None, None, "json"),
+        ("application/vnd.apache.arrow.stream", None, "arrow"),
+        ("text/html, application/vnd.apache.parquet;q=0.9", None, "parquet"),
+        ("application/x-parquet", None, "parquet"),
+        ("application/x-ndjson", None, "ndjson"),
+        ("application/vnd.apache.arrow.stream", "json", "json"),
+        ("text/csv", None, "json"),
+    ],
+)
+def test_negotiate_format(accept, requested_format, expected):
+    assert negotiate_format(accept, requested_format) == expected
+
+
+def test_table_rows_default_to_ndjson_across_batches(client):
+    response = client.get("/table/rows/", params={"table_name": "parts"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == ROWS
+
+
+def test_table_rows_as_json_array_across_batches(client):
+    response = client.get(
+        "/table/rows/",
+        params={"table_name": "parts"},
+        headers={"Accept": "application/json"},
+    )
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == ROWS
+
+
+def test_table_rows_as_arrow_stream(client):
+    response = client.get(
+        "/table/rows/",
+        params={"table_name": "parts"},
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    # Columns that are NULL throughout the first batch are typed as strings
+    assert table.schema.field("note").type == pa.string()
+    assert table.schema.field("empty").type == pa.string()
+    assert table.schema.field("id").type == pa.int64()
+    assert table.to_pylist() == ROWS
+
+
+def test_table_rows_as_parquet(client):
+    response = client.get(
+        "/table/rows/", params={"table_name": "parts", "format": "parquet"}
+    )
+
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    parquet_file = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet_file.num_row_groups == 3
+    assert parquet_file.read(use_threads=False).to_pylist() == ROWS
+
+
+def test_table_rows_limit_and_empty_results(client):
+    response = client.get(
+        "/table/rows/", params={"table_name": "parts", "limit": 0, "format": "arrow"}
+    )
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 0
+    assert table.schema.names == list(ROWS[0])
+
+
+def test_unknown_table_is_not_found(client):
+    response = client.get("/table/rows/", params={"table_name": "missing"})
+
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def chart_client(client, monkeypatch):
+    class FakeChartManager:
+        def __init__(self, session):
+            pass
+
+        def get_chart(self, chart_id):
+            config = {"query": "SELECT * FROM parts"}
+            return type("Chart", (), {"config": config})()
+
+    class FakeQueryResultCache:
+        def __init__(self, session):
+            pass
+
+        def execute_select_query(self, query):
+            return GuardedRows(ROWS[:3], truncated=True)
+
+    @contextmanager
+    def database_manager():
+        yield None
+
+    monkeypatch.setattr(chart_routes, "DatabaseManager", database_manager)
+    monkeypatch.setattr(chart_routes, "ChartManager", FakeChartManager)
+    monkeypatch.setattr(chart_routes, "QueryResultCache", FakeQueryResultCache)
+    return client
+
+
+def test_chart_data_defaults_to_json(chart_client):
+    response = chart_client.get("/chart/1/data/")
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["x-result-truncated"] == "true"
+    assert response.json() == ROWS[:3]
+
+
+@pytest.mark.parametrize(
+    "accept", ["application/vnd.apache.arrow.stream", "application/vnd.apache.parquet"]
+)
+def test_chart_data_in_columnar_formats(chart_client, accept):
+    response = chart_client.get("/chart/1/data/", headers={"Accept": accept})
+
+    assert response.headers["content-type"] == accept
+    assert response.headers["x-result-truncated"] == "true"
+    if accept == "application/vnd.apache.parquet":
+        table = pq.ParquetFile(io.BytesIO(response.content)).read(use_threads=False)
+    else:
+        table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.field("note").type == pa.string()
+    assert table.to_pylist() == ROWS[:3]
@@ -0,0 +1,61 @@
+import pytest
+from database.sql_executor import QueryGuardError, SQLExecutor
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    session = Session(engine)
+    session.execute(text("CREATE TABLE sales (region TEXT, note TEXT)"))
+    session.execute(
+        text("INSERT INTO sales VALUES (:region, :note)"),
+        [
+            {"region": "north", "note": "a\n  b"},
+            {"region": "south", "note": "a b"},
+            {"region": "east", "note": "x;y"},
+        ],
+    )
+    yield session
+    session.close()
+
+
+def test_line_comments_do_not_swallow_the_query(session):
+    rows = SQLExecutor(session).execute_guarded_select_query(
+        "SELECT region -- the region\nFROM sales ORDER BY region -- sorted\n;"
+    )
+
+    assert [row["region"] for row in rows] == ["east", "north", "south"]
+
+
+def test_whitespace_in_literals_is_kept(session):
+    rows = SQLExecutor(session).execute_guarded_select_query(
+        "SELECT region FROM sales WHERE note = 'a\n  b'"
+    )
+
+    assert rows == [{"region": "north"}]
+
+
+def test_semicolons_in_literals_are_allowed(session):
+    rows = SQLExecutor(session).execute_guarded_select_query(
+        "SELECT region FROM sales WHERE note = 'x;y';"
+    )
+
+    assert rows == [{"region": "east"}]
+
+
+def test_results_are_truncated_at_the_row_cap(session):
+    rows = SQLExecutor(session).execute_guarded_select_query(
+        "SELECT * FROM sales", max_rows=2
+    )
+
+    assert len(rows) == 2
+    assert rows.truncated
+
+
+def test_further_statements_are_rejected(session):
+    with pytest.raises(QueryGuardError):
+        SQLExecutor(session).execute_guarded_select_query(
+            "SELECT * FROM sales; DELETE FROM sales"
+        )
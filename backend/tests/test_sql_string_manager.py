@@ -0,0 +1,96 @@
+import pytest
+from utils.sql_string_manager import SQLStringManager
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("SELECT * FROM sales", ["sales"]),
+        (
+            "SELECT * FROM sales a, customers b WHERE a.id = b.id",
+            ["customers", "sales"],
+        ),
+        (
+            "SELECT EXTRACT(YEAR FROM order_date) AS year, SUM(total) FROM sales GROUP BY 1",
+            ["sales"],
+        ),
+        (
+            'SELECT * FROM public."Sales" s LEFT JOIN (SELECT * FROM refunds) r ON true',
+            ["refunds", "sales"],
+        ),
+        (
+            "WITH recent AS (SELECT * FROM orders) SELECT * FROM recent JOIN items USING (id)",
+            ["items", "orders"],
+        ),
+        (
+            "SELECT (SELECT MAX(total) FROM orders) FROM items WHERE id IN (SELECT id FROM sales)",
+            ["items", "orders", "sales"],
+        ),
+    ],
+)
+def test_get_tables_from_select_query(query, expected):
+    assert SQLStringManager(query).get_tables_from_select_query() == expected
+
+
+def test_unresolved_table_reference_returns_none():
+    query = "SELECT * FROM generate_series(1, 10)"
+
+    assert SQLStringManager(query).get_tables_from_select_query() is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT * FROM t WHERE note = 'a;b'",
+        "SELECT * FROM t -- a; b\nWHERE id = 1",
+        'SELECT "a;b" FROM t;',
+        "WITH x AS (SELECT 1) SELECT * FROM x",
+    ],
+)
+def test_single_select_queries_are_accepted(query):
+    assert SQLStringManager(query).is_single_select_query()
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT 1; DROP TABLE t",
+        "SELECT 1; SELECT 2;",
+        "DELETE FROM t",
+        "SELECT 1 /* ; */ ; DELETE FROM t",
+    ],
+)
+def test_other_queries_are_rejected(query):
+    assert not SQLStringManager(query).is_single_select_query()
+
+
+def test_normalize_query_collapses_whitespace_between_tokens():
+    query = "  SELECT region,\n\tSUM(total)\nFROM   sales\nGROUP BY region ;\n"
+
+    assert (
+        SQLStringManager(query).normalize_query()
+        == "SELECT region, SUM(total) FROM sales GROUP BY region"
+    )
+
+
+@pytest.mark.parametrize(
+    "query, other_query",
+    [
+        ("SELECT * FROM t WHERE name = 'a  b'", "SELECT * FROM t WHERE name = 'a b'"),
+        ("SELECT * FROM t WHERE name = 'a\n b'", "SELECT * FROM t WHERE name = 'a b'"),
+        ('SELECT "a  b" FROM t', 'SELECT "a b" FROM t'),
+        ("SELECT 1 -- x\nFROM t", "SELECT 1 FROM t"),
+        ("SELECT /* a  b */ 1", "SELECT /* a b */ 1"),
+    ],
+)
+def test_normalize_query_keeps_literals_and_comments(query, other_query):
+    assert (
+        SQLStringManager(query).normalize_query()
+        != SQLStringManager(other_query).normalize_query()
+    )
+
+
+def test_normalize_query_keeps_line_comments_terminated():
+    normalized = SQLStringManager("SELECT 1 -- x\nFROM t").normalize_query()
+
+    assert normalized == "SELECT 1 -- x\nFROM t"
@@ -0,0 +1,71 @@
+import pytest
+from database import llm_schema_cache_manager
+from database.table_manager import TableManager
+from models.llm_schema_cache import LLMSchemaCache
+from models.table_version import TableVersion
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+SAMPLE = "region,amount\nnorth,10\nsouth,20"
+
+
+class FakeLLM:
+    def __init__(self):
+        self.create_calls = 0
+
+    async def generate_create_statement(
+        self, sample_content, header, table_names, extra_desc
+    ):
+        self.create_calls += 1
+        return "CREATE TABLE sales (region TEXT, amount INTEGER);"
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(
+        llm_schema_cache_manager, "_cache_stats", {"hits": 0, "misses": 0}
+    )
+    engine = create_engine("sqlite://")
+    LLMSchemaCache.__table__.create(engine)
+    TableVersion.__table__.create(engine)
+    session = Session(engine)
+    yield session
+    session.close()
+
+
+@pytest.mark.asyncio
+async def test_reupload_reuses_cached_schema_under_unused_name(session):
+    llm = FakeLLM()
+
+    first = await TableManager(session, llm).create_table_with_llm(
+        SAMPLE, "region,amount", ""
+    )
+    second = await TableManager(session, llm).create_table_with_llm(
+        SAMPLE, "region,amount", ""
+    )
+    third = await TableManager(session, llm).create_table_with_llm(
+        SAMPLE, "region,amount", ""
+    )
+
+    assert first == "CREATE TABLE sales (region TEXT, amount INTEGER);"
+    assert second == "CREATE TABLE sales_2 (region TEXT, amount INTEGER);"
+    assert third == "CREATE TABLE sales_3 (region TEXT, amount INTEGER);"
+    assert llm.create_calls == 1
+    assert {"sales", "sales_2", "sales_3"} <= set(session.bind.table_names())
+    stats = TableManager(session).get_schema_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert session.get(LLMSchemaCache, _key()).hit_count == 2
+
+
+def _key():
+    return llm_schema_cache_manager.LLMSchemaCacheManager.build_cache_key(
+        "region,amount", SAMPLE, ""
+    )
+
+
+def test_unused_table_name_gets_lowest_free_suffix():
+    assert TableManager._get_unused_table_name("sales", []) == "sales"
+    assert (
+        TableManager._get_unused_table_name("sales", ["Sales", "sales_2", "sales_4"])
+        == "sales_3"
+    )
@@ -0,0 +1,61 @@
+import pytest
+from utils.type_coercion import coerce_records
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("1234.50", 1234.5),
+        ("$1,234.50", 1234.5),
+        ("€ 1 234.50", 1234.5),
+        ("(12.00)", -12.0),
+        ("-7", -7.0),
+        ("1e3", 1000.0),
+        (".5", 0.5),
+    ],
+)
+def test_decimal_values_are_parsed(value, expected):
+    df, errors = coerce_records([{"amount": value}], {"amount": "DECIMAL"})
+
+    assert errors == []
+    assert df["amount"].tolist() == [expected]
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["Invoice 42", "1.234,50", "12,34", "1,2345", "1-2", "NaN", "Infinity", "1_000"],
+)
+def test_invalid_decimal_values_are_reported(value):
+    df, errors = coerce_records(
+        [{"amount": value}, {"amount": "5"}], {"amount": "DECIMAL"}
+    )
+
+    assert df["amount"].tolist() == [5.0]
+    assert errors == [
+        {
+            "row": 0,
+            "column": "amount",
+            "value": value,
+            "error": "Could not convert to DECIMAL",
+        }
+    ]
+
+
+def test_integer_values_must_be_whole_numbers():
+    df, errors = coerce_records(
+        [{"quantity": "1,000"}, {"quantity": "2.5"}, {"quantity": "1e3"}],
+        {"quantity": "INTEGER"},
+    )
+
+    assert df["quantity"].tolist() == [1000, 1000]
+    assert [error["row"] for error in errors] == [1]
+
+
+def test_empty_values_become_null():
+    df, errors = coerce_records(
+        [{"Amount": " "}, {"Note": "x"}], {"amount": "DECIMAL", "note": "TEXT"}
+    )
+
+    assert errors == []
+    assert df["amount"].tolist() == [None, None]
+    assert df["note"].tolist() == [None, "x"]
@@ -0,0 +1,24 @@
+"""
+This module configures the loggers of the application.
+
+It has no dependencies on the rest of the application, so low-level modules such as the SQL
+executor can log without importing the managers that utils.utils depends on.
+"""
+import logging
+import os
+import sys
+
+
+def get_app_logger(name):
+    logger = logging.getLogger(name)
+
+    # Set log level based on the environment
+    log_level = logging.DEBUG if os.getenv("APP_ENV") == "dev" else logging.INFO
+
+    logger.setLevel(log_level)
+
+    # You can add handlers, formatters here if needed
+    handler = logging.StreamHandler(sys.stdout)
+    logger.addHandler(handler)
+
+    return logger
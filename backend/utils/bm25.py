@@ -0,0 +1,64 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+
+class BM25Index:
+    """
+    A small in-memory Okapi BM25 index over a list of text documents.
+
+    Attributes:
+        k1 (float): Term frequency saturation parameter.
+        b (float): Document length normalization parameter.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_term_counts = [Counter(self.tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(counts.values()) for counts in self.doc_term_counts]
+        self.avg_doc_length = (
+            sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        )
+
+        document_frequencies: Counter = Counter()
+        for counts in self.doc_term_counts:
+            document_frequencies.update(counts.keys())
+
+        num_docs = len(documents)
+        self.idf = {
+            term: math.log(1 + (num_docs - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequencies.items()
+        }
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercase the text and split it into alphanumeric tokens."""
+        return re.findall(r"[a-z0-9]+", text.lower())
+
+    def get_scores(self, query: str) -> List[float]:
+        """Return the BM25 score of every document for the query."""
+        query_terms = set(self.tokenize(query))
+        scores = []
+        for counts, length in zip(self.doc_term_counts, self.doc_lengths):
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term, 0)
+                if not frequency:
+                    continue
+                norm = 1 - self.b + self.b * length / (self.avg_doc_length or 1)
+                score += (
+                    self.idf[term]
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * norm)
+                )
+            scores.append(score)
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return the indices and scores of the k best matching documents, best first."""
+        scores = self.get_scores(query)
+        ranked = sorted(enumerate(scores), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
@@ -0,0 +1,171 @@
+"""
+This module renders the data of charts from their queries.
+
+Charts store their SQL query rather than a snapshot of its rows. Their data is filled in when
+they are read, through the query result cache, so dashboards always show the current data of
+their tables without asking the LLM to regenerate the charts.
+"""
+import asyncio
+import copy
+import time
+from typing import Dict, List, Optional
+
+from database.database_manager import AsyncDatabaseManager
+from database.query_result_cache import QueryResultCache
+from settings import (
+    DASHBOARD_MAX_CONCURRENT_QUERIES,
+    DASHBOARD_QUERY_TIMEOUT_SECONDS,
+    DASHBOARD_RENDER_DEADLINE_SECONDS,
+)
+from sqlalchemy.orm import Session
+from utils.app_logger import get_app_logger
+from utils.nivo_assistant import NivoAssistant
+
+logger = get_app_logger(__name__)
+
+if DASHBOARD_QUERY_TIMEOUT_SECONDS >= DASHBOARD_RENDER_DEADLINE_SECONDS:
+    # Cancelling a chart at the deadline does not stop its query, the statement timeout does
+    raise ValueError(
+        "DASHBOARD_QUERY_TIMEOUT_SECONDS must be lower than DASHBOARD_RENDER_DEADLINE_SECONDS"
+    )
+
+
+def render_chart_data(
+    chart_config: dict, session: Session, statement_timeout_ms: Optional[int] = None
+) -> dict:
+    """
+    Return a copy of the chart configuration with nivoConfig.data set to the rows of its query.
+    dataTruncated is set when the rows were cut off at the row cap of the execution guard.
+
+    Args:
+        chart_config (dict): The chart configuration, holding its "type", "query" and "nivoConfig".
+        session (Session): An active database session used to run the query.
+        statement_timeout_ms (int, optional): Cancel the query if it runs longer than this.
+
+    Returns:
+        dict: The configuration with its data. Configurations without a query are returned as is.
+    """
+    query = chart_config.get("query")
+    if not query:
+        return chart_config
+
+    rendered_config = copy.deepcopy(chart_config)
+    results = QueryResultCache(session).execute_select_query(
+        query, statement_timeout_ms
+    )
+    formatter = NivoAssistant(chart_config.get("type"))
+    nivo_config = rendered_config.get("nivoConfig") or {}
+    nivo_config["data"] = formatter.format_data(results)
+    rendered_config["nivoConfig"] = nivo_config
+    rendered_config["dataTruncated"] = results.truncated
+    return rendered_config
+
+
+def strip_chart_data(chart_config: dict) -> dict:
+    """Return a copy of the chart configuration without the data rendered from its query."""
+    if not chart_config.get("query"):
+        return chart_config
+
+    stripped_config = copy.deepcopy(chart_config)
+    stripped_config.pop("dataTruncated", None)
+    if isinstance(stripped_config.get("nivoConfig"), dict):
+        stripped_config["nivoConfig"].pop("data", None)
+    return stripped_config
+
+
+async def render_dashboard_charts(
+    charts: List[dict],
+    deadline_seconds: float = DASHBOARD_RENDER_DEADLINE_SECONDS,
+    statement_timeout_seconds: float = DASHBOARD_QUERY_TIMEOUT_SECONDS,
+) -> List[dict]:
+    """
+    Render the data of all charts of a dashboard concurrently.
+
+    Every query runs on its own pooled asyncio connection with a statement timeout, and at most
+    DASHBOARD_MAX_CONCURRENT_QUERIES run at once. Charts that are not done by the deadline are
+    cancelled, while the others are returned, so a dashboard takes as long as its slowest chart
+    rather than the sum of all of its charts.
+
+    Giving up on a chart does not interrupt its query, which keeps its connection until the
+    statement timeout cancels it. The statement timeout must therefore be lower than the deadline,
+    so that a slow query is cancelled by the database rather than left running after its chart
+    was given up on.
+
+    Args:
+        charts (List[dict]): The charts, as returned by Chart.to_dict.
+        deadline_seconds (float): The time after which unfinished charts are given up on.
+        statement_timeout_seconds (float): The maximum run time of a single query.
+
+    Returns:
+        List[dict]: The charts in the same order, each with its rendered config, its "status"
+            ("ok", "error" or "timeout"), the "elapsed_ms" until it was done and an "error" if any.
+    """
+    if statement_timeout_seconds >= deadline_seconds:
+        raise ValueError("The statement timeout must be lower than the render deadline")
+
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(DASHBOARD_MAX_CONCURRENT_QUERIES)
+    statement_timeout_ms = int(statement_timeout_seconds * 1000)
+
+    async def render(chart: dict) -> dict:
+        config: dict = chart["config"]
+        if not config.get("query"):
+            return config
+
+        async with semaphore:
+            async with AsyncDatabaseManager() as session:
+                # run_sync passes the synchronous session as the first argument
+                config = await session.run_sync(
+                    lambda sync_session: render_chart_data(
+                        config, sync_session, statement_timeout_ms
+                    )
+                )
+                return config
+
+    tasks = [asyncio.ensure_future(render(chart)) for chart in charts]
+    finished_at: Dict[asyncio.Future, float] = {}
+    for task in tasks:
+        task.add_done_callback(
+            lambda task: finished_at.setdefault(task, time.perf_counter())
+        )
+    if tasks:
+        await asyncio.wait(tasks, timeout=deadline_seconds)
+
+    rendered_charts = []
+    for chart, task in zip(charts, tasks):
+        rendered_chart = dict(chart)
+        if not task.done():
+            task.cancel()
+            rendered_chart.update(
+                {
+                    "config": strip_chart_data(chart["config"]),
+                    "status": "timeout",
+                    "elapsed_ms": None,
+                    "error": f"Not rendered within {deadline_seconds:g} seconds",
+                }
+            )
+        else:
+            elapsed_ms = round((finished_at[task] - start) * 1000, 1)
+            if task.exception() is not None:
+                logger.error(
+                    f"An error occurred while rendering chart {chart['id']}: "
+                    f"{task.exception()}"
+                )
+                rendered_chart.update(
+                    {
+                        "config": strip_chart_data(chart["config"]),
+                        "status": "error",
+                        "elapsed_ms": elapsed_ms,
+                        "error": str(task.exception()),
+                    }
+                )
+            else:
+                rendered_chart.update(
+                    {
+                        "config": task.result(),
+                        "status": "ok",
+                        "elapsed_ms": elapsed_ms,
+                    }
+                )
+        rendered_charts.append(rendered_chart)
+    return rendered_charts
@@ -0,0 +1,163 @@
+"""
+This module encodes query results in the columnar Apache Arrow formats.
+
+Rows are converted to Arrow record batches, which can be sent as an Arrow IPC stream or as a
+Parquet file instead of JSON. Both are binary and typed column by column, so numeric series are
+neither formatted as text nor repeated with their column names on every row, which makes the
+payload smaller and much cheaper to produce and to parse for wide and long results.
+"""
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+
+MEDIA_TYPES = {
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "json": JSON_MEDIA_TYPE,
+}
+
+
+def negotiate_format(
+    accept: Optional[str], requested_format: Optional[str] = None, default: str = "json"
+) -> str:
+    """
+    Choose the result format of a response.
+
+    An explicitly requested format wins, otherwise the first supported media type of the Accept
+    header, otherwise the default. Quality values of the Accept header are not weighed.
+
+    Returns:
+        str: One of "arrow", "parquet", "ndjson" or "json".
+    """
+    if requested_format:
+        return requested_format
+
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        for result_format, supported_media_type in MEDIA_TYPES.items():
+            if media_type == supported_media_type:
+                return result_format
+        if media_type == "application/x-parquet":
+            return "parquet"
+    return default
+
+
+def _to_arrow_value(value):
+    # Decimals (e.g. NUMERIC columns) would get a precision per batch, analytics want floats
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def rows_to_record_batch(
+    column_names: Sequence[str],
+    rows: Sequence[Sequence],
+    schema: Optional[pa.Schema] = None,
+) -> pa.RecordBatch:
+    """
+    Convert rows of values to a record batch.
+
+    Args:
+        column_names (Sequence[str]): The names of the columns.
+        rows (Sequence[Sequence]): The rows, each with one value per column.
+        schema (pa.Schema, optional): The schema of the previous batches of the same result.
+            Without a schema the column types are inferred, with columns that only hold NULLs
+            typed as strings.
+
+    Returns:
+        pa.RecordBatch: The batch.
+    """
+    columns = list(zip(*rows)) if rows else [() for _ in column_names]
+    arrays: List[pa.Array] = []
+    for index, column in enumerate(columns):
+        values = [_to_arrow_value(value) for value in column]
+        if schema is None:
+            array = pa.array(values)
+            if pa.types.is_null(array.type):
+                array = pa.array(values, type=pa.string())
+        elif pa.types.is_string(schema.field(index).type):
+            array = pa.array(
+                [None if value is None else str(value) for value in values],
+                type=pa.string(),
+            )
+        else:
+            array = pa.array(values, type=schema.field(index).type)
+        arrays.append(array)
+
+    if schema is not None:
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+    return pa.RecordBatch.from_arrays(arrays, names=list(column_names))
+
+
+def dicts_to_record_batch(rows: List[dict]) -> pa.RecordBatch:
+    """Convert rows of dictionaries, e.g. cached query results, to a record batch."""
+    column_names = list(rows[0]) if rows else []
+    return rows_to_record_batch(
+        column_names, [[row.get(name) for name in column_names] for row in rows]
+    )
+
+
+class _ChunkedSink:
+    """A write-only file that hands out the bytes written to it since they were last drained."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        # Writers record offsets, so the position counts drained bytes as well
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_arrow_ipc(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """Encode record batches of the same schema as an Arrow IPC stream, one chunk per batch."""
+    sink = _ChunkedSink()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def iter_parquet(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """Encode record batches of the same schema as a Parquet file, one row group per batch."""
+    sink = _ChunkedSink()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = pq.ParquetWriter(
+                pa.PythonFile(sink, mode="w"), batch.schema, compression="zstd"
+            )
+        writer.write_table(pa.Table.from_batches([batch]))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
@@ -0,0 +1,145 @@
+"""
+This module runs the extraction of data from documents with the vision LLM.
+
+It is shared by the data profile preview endpoints, which run it within the request, and by
+the job worker, which runs it in the background and reports its progress.
+"""
+import hashlib
+import json
+import os
+from typing import Callable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from llms.gpt import GPTLLM
+from models.data_profile import DataProfile
+from models.user import UserPrincipal
+from settings import (
+    EXTRACTION_CACHE_DIR,
+    EXTRACTION_GROUP_MAX_PAGES,
+    EXTRACTION_RESULT_CACHE_MAX_MB,
+    INLINE_IMAGES_MAX_BYTES,
+    PDF_RENDER_DPI,
+    VISION_TOKEN_BUDGET,
+)
+from utils.disk_cache import DiskLRUCache, hash_file
+from utils.file_manager import FileManager
+from utils.image_conversion_manager import ImageConversionManager
+from utils.image_preprocessor import PreparedImage
+from utils.object_storage.digitalocean_space_manager import DigitalOceanSpaceManager
+
+# Extracted rows keyed by the rendered pages, the instructions and the extraction settings
+extraction_result_cache = DiskLRUCache(
+    os.path.join(EXTRACTION_CACHE_DIR, "results"),
+    EXTRACTION_RESULT_CACHE_MAX_MB * 1024 * 1024,
+)
+
+
+def get_extraction_cache_key(page_hashes: List[str], extract_instructions: str) -> str:
+    """
+    Build the result cache key of an extraction. It changes whenever anything that affects the
+    extracted rows changes: a page, the instructions, the model or the preprocessing settings.
+    """
+    key = {
+        "pages": page_hashes,
+        "instructions": extract_instructions,
+        "model": GPTLLM.vision_model,
+        "dpi": PDF_RENDER_DPI,
+        "token_budget": VISION_TOKEN_BUDGET,
+        "group_max_pages": EXTRACTION_GROUP_MAX_PAGES,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+async def extract_data_from_files(
+    data_profile: DataProfile,
+    file_paths: List[str],
+    organization_name: str,
+    current_user: UserPrincipal,
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+):
+    """
+    Convert the files to page images and extract data from them with GPT.
+
+    Args:
+        data_profile (DataProfile): The data profile holding the extraction instructions.
+        file_paths (List[str]): The uploaded files, either all PDFs, all PNGs or all JPGs.
+        organization_name (str): The name of the organization, used for object storage.
+        current_user (UserPrincipal): The user the extraction runs for.
+        on_progress (Callable, optional): Called with the stage, the pages done and the total pages.
+
+    Returns:
+        list: The extracted rows.
+    """
+    with ImageConversionManager(file_paths) as manager:
+        pages_total = await run_in_threadpool(manager.count_pages)
+
+        # Convert page by page so progress can be reported as pages are rendered
+        jpg_file_paths: List[str] = []
+        pages = manager.iter_jpgs()
+        while True:
+            jpg_file_path = await run_in_threadpool(next, pages, None)
+            if jpg_file_path is None:
+                break
+            jpg_file_paths.append(jpg_file_path)
+            if on_progress:
+                on_progress("converting", len(jpg_file_paths), pages_total)
+
+        page_hashes = await run_in_threadpool(
+            lambda: [hash_file(jpg_file_path) for jpg_file_path in jpg_file_paths]
+        )
+        cache_key = get_extraction_cache_key(
+            page_hashes, data_profile.extract_instructions
+        )
+        cached_rows = extraction_result_cache.get_json(cache_key)
+        if cached_rows is not None:
+            return cached_rows
+
+        prepared_images = await run_in_threadpool(
+            manager.prepare_for_vision, jpg_file_paths
+        )
+        if on_progress:
+            on_progress("extracting", len(jpg_file_paths), pages_total)
+
+        rows = await extract_data_from_images(
+            data_profile, prepared_images, organization_name, current_user
+        )
+        await run_in_threadpool(extraction_result_cache.set_json, cache_key, rows)
+        return rows
+
+
+async def extract_data_from_images(
+    data_profile: DataProfile,
+    prepared_images: List[PreparedImage],
+    organization_name: str,
+    current_user: UserPrincipal,
+):
+    """
+    Extract data from the prepared images with GPT.
+
+    Small batches are sent inline as base64 data URLs, which avoids uploading, presigning and
+    deleting every page. Batches larger than INLINE_IMAGES_MAX_BYTES are uploaded to
+    DigitalOcean Spaces and sent as presigned URLs instead.
+    """
+    gpt = GPTLLM(chat_id=1, user=current_user)
+    total_bytes = sum(os.path.getsize(image.path) for image in prepared_images)
+
+    if total_bytes <= INLINE_IMAGES_MAX_BYTES:
+        file_manager = FileManager()
+        data_urls = [
+            file_manager.encode_image_as_data_url(image.path)
+            for image in prepared_images
+        ]
+        return await gpt.extract_data_from_jpgs(
+            data_profile, data_urls, prepared_images
+        )
+
+    # Upload the JPG file to DigitalOcean Spaces, automatically deleting it when done
+    with DigitalOceanSpaceManager(
+        organization_name=organization_name,
+        file_paths=[image.path for image in prepared_images],
+    ) as space_manager:
+        await run_in_threadpool(space_manager.upload_files_by_paths)
+        jpg_presigned_urls = space_manager.create_presigned_urls()
+        return await gpt.extract_data_from_jpgs(
+            data_profile, jpg_presigned_urls, prepared_images
+        )
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, List, Optional
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, reading it in blocks."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class DiskLRUCache:
+    """
+    A size-bounded cache of files and JSON values on local disk.
+
+    Every entry is a directory named after its key. Entries are written to a temporary
+    directory and renamed into place, so readers never see a partial entry and several
+    processes can share the cache. The modification time of an entry is updated on every
+    hit, and the least recently used entries are deleted once the cache grows past its size.
+
+    Attributes:
+        directory (str): The directory holding the entries.
+        max_bytes (int): The maximum total size of the entries.
+        hits (int): The number of lookups in this process that found an entry.
+        misses (int): The number of lookups in this process that did not find an entry.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _get_entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry_path = self._get_entry_path(key)
+        try:
+            os.utime(entry_path)  # Mark as recently used
+        except OSError:
+            return None
+        return entry_path
+
+    def _record_lookup(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _store(self, key: str, write_entry):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            write_entry(temp_path)
+            os.rename(temp_path, self._get_entry_path(key))
+        except OSError:
+            # Another process stored the same key first
+            shutil.rmtree(temp_path, ignore_errors=True)
+        self.evict()
+
+    def get_files(self, key: str, output_folder: str) -> Optional[List[str]]:
+        """
+        Copy the cached files into output_folder and return their paths in the order they were
+        stored, or None. The copies stay readable after another process evicts the entry.
+        """
+        file_paths: Optional[List[str]] = None
+        entry_path = self._lookup(key)
+        if entry_path is not None:
+            try:
+                with open(os.path.join(entry_path, "files.json")) as manifest:
+                    file_names = json.load(manifest)
+                os.makedirs(output_folder, exist_ok=True)
+                file_paths = [
+                    shutil.copyfile(
+                        os.path.join(entry_path, file_name),
+                        os.path.join(output_folder, file_name),
+                    )
+                    for file_name in file_names
+                ]
+            except OSError:  # Evicted by another process in the meantime
+                file_paths = None
+        self._record_lookup(file_paths is not None)
+        return file_paths
+
+    def set_files(self, key: str, file_paths: List[str]):
+        """Store copies of the files under the key."""
+
+        def write_entry(entry_path: str):
+            file_names = []
+            for index, file_path in enumerate(file_paths):
+                file_name = f"{index}_{os.path.basename(file_path)}"
+                shutil.copyfile(file_path, os.path.join(entry_path, file_name))
+                file_names.append(file_name)
+            with open(os.path.join(entry_path, "files.json"), "w") as manifest:
+                json.dump(file_names, manifest)
+
+        self._store(key, write_entry)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        """Return the cached JSON value, or None."""
+        value = None
+        entry_path = self._lookup(key)
+        if entry_path is not None:
+            try:
+                with open(os.path.join(entry_path, "value.json")) as file:
+                    value = json.load(file)
+            except OSError:  # Evicted by another process in the meantime
+                value = None
+        self._record_lookup(value is not None)
+        return value
+
+    def set_json(self, key: str, value: Any):
+        """Store a JSON serializable value under the key."""
+
+        def write_entry(entry_path: str):
+            with open(os.path.join(entry_path, "value.json"), "w") as file:
+                json.dump(value, file, default=str)
+
+        self._store(key, write_entry)
+
+    def _get_entries(self) -> List[tuple]:
+        """Return (last used, size, path) of every entry."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.startswith(".tmp-"):
+                continue
+            try:
+                size = sum(file.stat().st_size for file in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+            except OSError:
+                continue  # Evicted by another process
+        return entries
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits into max_bytes."""
+        entries = sorted(self._get_entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_bytes -= size
+
+    def get_stats(self) -> dict:
+        """Return the hit/miss counters of this process and the size of the cache."""
+        entries = self._get_entries() if os.path.isdir(self.directory) else []
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        """Delete all entries."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.hits = 0
+        self.misses = 0
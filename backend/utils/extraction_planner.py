@@ -0,0 +1,74 @@
+"""
+This module plans multi-page extractions and merges their results.
+
+A document is split into groups of pages that each fit into a single vision request, so large
+documents stay within the context and output limits of the model and the groups can be
+extracted concurrently. The rows extracted from the groups are merged back in page order.
+"""
+import json
+from typing import List, Sequence
+
+
+def plan_page_groups(
+    page_tokens: Sequence[int], token_budget: int, max_pages: int
+) -> List[List[int]]:
+    """
+    Split pages into consecutive groups of at most max_pages pages and token_budget tokens.
+
+    A page that is over the budget on its own gets a group of its own.
+
+    Args:
+        page_tokens (Sequence[int]): The number of tokens of every page, in page order.
+        token_budget (int): The maximum number of image tokens of a group.
+        max_pages (int): The maximum number of pages of a group.
+
+    Returns:
+        List[List[int]]: The page indices of every group, in page order.
+    """
+    groups: List[List[int]] = []
+    group: List[int] = []
+    group_tokens = 0
+    for index, tokens in enumerate(page_tokens):
+        if group and (len(group) >= max_pages or group_tokens + tokens > token_budget):
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(index)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+def _normalize_row(row: dict) -> str:
+    normalized = {
+        str(column).strip().lower(): value.strip() if isinstance(value, str) else value
+        for column, value in row.items()
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+def merge_rows(row_groups: List[List[dict]]) -> List[dict]:
+    """
+    Concatenate the rows of all groups in order, dropping rows repeated across group boundaries.
+
+    A row on the boundary of two groups, e.g. a line item that spans the last page of one group
+    and the first page of the next, can be extracted by both. The longest run of rows that ends
+    one group and starts the next is therefore kept only once. Identical rows elsewhere, e.g.
+    repeated line items within a group, are legitimate and kept. Rows are compared ignoring key
+    order, the case of keys and surrounding whitespace.
+    """
+    merged: List[dict] = []
+    previous_keys: List[str] = []
+    for rows in row_groups:
+        keys = [_normalize_row(row) for row in rows]
+        overlap = next(
+            (
+                length
+                for length in range(min(len(previous_keys), len(keys)), 0, -1)
+                if previous_keys[-length:] == keys[:length]
+            ),
+            0,
+        )
+        merged.extend(rows[overlap:])
+        previous_keys = keys
+    return merged
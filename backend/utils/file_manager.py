@@ -8,3 +8,7 @@ class FileManager:
     def encode_image(self, image_path: str):
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode("utf-8")
+
+    def encode_image_as_data_url(self, image_path: str) -> str:
+        """Encode a JPG as a data URL that can be sent to the vision model inline."""
+        return f"data:image/jpeg;base64,{self.encode_image(image_path)}"
@@ -1,72 +1,220 @@
-import os
-from typing import List
-
-from pdf2image import convert_from_path
-from PIL import Image
-
-
-class ImageConversionManager:
-    def __init__(self, file_paths: List[str]):
-        self.file_paths = file_paths
-        self.converted_file_paths: List[str] = []
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        if self.converted_file_paths:
-            for converted_file_path in self.converted_file_paths:
-                if os.path.isfile(converted_file_path):
-                    os.unlink(converted_file_path)  # Delete the file
-
-    def convert_to_jpgs(self):
-        if all(file_path.lower().endswith(".pdf") for file_path in self.file_paths):
-            return self._convert_pdfs_to_jpgs(self.file_paths)
-        elif all(file_path.lower().endswith(".png") for file_path in self.file_paths):
-            return self._convert_pngs_to_jpgs(self.file_paths)
-        elif all(
-            file_path.lower().endswith((".jpg", ".jpeg"))
-            for file_path in self.file_paths
-        ):
-            return self.file_paths
-        else:
-            print(
-                "All files must be of the same type (either all .pdf, all .png, or all .jpg/.jpeg)"
-            )
-            return []
-
-    def _convert_pdfs_to_jpgs(self, file_paths: List[str]):
-        jpg_file_paths = []
-        for file_path in file_paths:
-            if file_path.endswith(".pdf"):
-                images = convert_from_path(file_path)
-                base_filename = os.path.basename(file_path).replace(".pdf", "")
-                output_folder = os.path.dirname(file_path)
-                for i, image in enumerate(images):
-                    jpg_filename = f"{base_filename}_page_{i + 1}.jpg"
-                    jpg_file_path = os.path.join(output_folder, jpg_filename)
-
-                    # Resize the image
-                    # image.thumbnail((1024, 1024))
-
-                    image.save(jpg_file_path, "JPEG")
-                    jpg_file_paths.append(jpg_file_path)
-        return jpg_file_paths
-
-    def _convert_pngs_to_jpgs(self, file_paths: List[str]):
-        jpg_file_paths = []
-        for file_path in file_paths:
-            if file_path.endswith(".png"):
-                image = Image.open(file_path)
-                rgb_im = image.convert("RGB")
-
-                # Resize the image
-                rgb_im.thumbnail((1024, 1024))
-
-                base_filename = os.path.basename(file_path).replace(".png", ".jpg")
-                output_folder = os.path.dirname(file_path)
-                jpg_file_path = os.path.join(output_folder, base_filename)
-                rgb_im.save(jpg_file_path, "JPEG")
-                rgb_im.close()
-                jpg_file_paths.append(jpg_file_path)
-        return jpg_file_paths
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+from settings import (
+    EXTRACTION_CACHE_DIR,
+    EXTRACTION_PAGE_CACHE_MAX_MB,
+    PDF_RENDER_DPI,
+    PDF_RENDER_MAX_WORKERS,
+    PDF_RENDER_PAGES_PER_TASK,
+)
+from utils.disk_cache import DiskLRUCache, hash_file
+from utils.image_preprocessor import ImagePreprocessor, PreparedImage
+
+# Shared by all requests. Each task runs one pdftoppm process, so the number of workers is
+# the number of pages rendered in parallel across all cores.
+_render_executor: Optional[ThreadPoolExecutor] = None
+
+
+# Rendered pages keyed by the SHA-256 of the PDF and the render settings
+page_cache = DiskLRUCache(
+    os.path.join(EXTRACTION_CACHE_DIR, "pages"),
+    EXTRACTION_PAGE_CACHE_MAX_MB * 1024 * 1024,
+)
+
+
+def _get_page_cache_key(file_path: str) -> str:
+    return f"{hash_file(file_path)}-dpi{PDF_RENDER_DPI}-jpeg"
+
+
+def _get_render_executor() -> ThreadPoolExecutor:
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ThreadPoolExecutor(
+            max_workers=PDF_RENDER_MAX_WORKERS, thread_name_prefix="pdf-render"
+        )
+    return _render_executor
+
+
+def shutdown_render_executor():
+    """Wait for running conversions and stop the render workers. Called on shutdown."""
+    global _render_executor
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=True)
+        _render_executor = None
+
+
+def _render_pdf_pages(
+    file_path: str, first_page: int, last_page: int, output_folder: str
+) -> List[str]:
+    """Render a range of PDF pages straight to JPG files and return their paths in page order."""
+    base_filename = os.path.basename(file_path).replace(".pdf", "")
+    paths = convert_from_path(
+        file_path,
+        dpi=PDF_RENDER_DPI,
+        output_folder=output_folder,
+        first_page=first_page,
+        last_page=last_page,
+        fmt="jpeg",
+        output_file=f"{base_filename}_page",
+        paths_only=True,
+    )
+    return sorted(paths)
+
+
+class ImageConversionManager:
+    def __init__(self, file_paths: List[str]):
+        self.file_paths = file_paths
+        self.converted_file_paths: List[str] = []
+        self.output_folder: Optional[str] = None
+        self._page_counts: Dict[str, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.converted_file_paths:
+            for converted_file_path in self.converted_file_paths:
+                if os.path.isfile(converted_file_path):
+                    os.unlink(converted_file_path)  # Delete the file
+        if self.output_folder:
+            shutil.rmtree(self.output_folder, ignore_errors=True)
+
+    def count_pages(self) -> int:
+        """Count the number of JPGs convert_to_jpgs produces."""
+        return sum(self._get_page_count(file_path) for file_path in self.file_paths)
+
+    def _get_page_count(self, file_path: str) -> int:
+        if not file_path.lower().endswith(".pdf"):
+            return 1
+        if file_path not in self._page_counts:
+            self._page_counts[file_path] = pdfinfo_from_path(file_path)["Pages"]
+        return self._page_counts[file_path]
+
+    def convert_to_jpgs(self) -> List[str]:
+        return list(self.iter_jpgs())
+
+    def iter_jpgs(self) -> Iterator[str]:
+        """
+        Convert the files to JPGs, yielding the path of each page as soon as it is written.
+
+        Pages are yielded in document and page order. Only the pages being rendered are in
+        memory at any time, since PDF pages are written to disk by pdftoppm directly.
+        """
+        if all(file_path.lower().endswith(".pdf") for file_path in self.file_paths):
+            yield from self._convert_pdfs_to_jpgs(self.file_paths)
+        elif all(file_path.lower().endswith(".png") for file_path in self.file_paths):
+            yield from self._convert_pngs_to_jpgs(self.file_paths)
+        elif all(
+            file_path.lower().endswith((".jpg", ".jpeg"))
+            for file_path in self.file_paths
+        ):
+            yield from self.file_paths
+        else:
+            print(
+                "All files must be of the same type (either all .pdf, all .png, or all .jpg/.jpeg)"
+            )
+
+    def prepare_for_vision(
+        self, jpg_file_paths: List[str], token_budget: Optional[int] = None
+    ) -> List[PreparedImage]:
+        """
+        Crop, scale and compress the converted JPGs for the vision model, see ImagePreprocessor.
+        The prepared files are deleted together with the converted ones.
+        """
+        output_folder = os.path.join(self._get_output_folder(), "prepared")
+        os.makedirs(output_folder, exist_ok=True)
+
+        preprocessor = (
+            ImagePreprocessor(token_budget) if token_budget else ImagePreprocessor()
+        )
+        prepared_images: List[PreparedImage] = preprocessor.prepare_images(
+            jpg_file_paths, output_folder
+        )
+        self.converted_file_paths.extend(image.path for image in prepared_images)
+        return prepared_images
+
+    def _get_output_folder(self) -> str:
+        if self.output_folder is None:
+            self.output_folder = tempfile.mkdtemp(prefix="docshow_pages_")
+        return self.output_folder
+
+    def _convert_pdfs_to_jpgs(self, file_paths: List[str]) -> Iterator[str]:
+        """
+        Split every PDF into ranges of pages and render all ranges of all files in parallel.
+        PDFs that were rendered before are copied from the page cache instead.
+        """
+        executor = _get_render_executor()
+        # Per file: its cached pages, or its cache key and the futures rendering it
+        files: List[tuple] = []
+        try:
+            for index, file_path in enumerate(file_paths):
+                if not file_path.lower().endswith(".pdf"):
+                    continue
+
+                # Each file gets its own folder so page files of equally named files never collide
+                output_folder = os.path.join(self._get_output_folder(), str(index))
+
+                cache_key = _get_page_cache_key(file_path)
+                cached_pages = page_cache.get_files(cache_key, output_folder)
+                if cached_pages is not None:
+                    files.append((cached_pages, cache_key, []))
+                    continue
+
+                os.makedirs(output_folder, exist_ok=True)
+
+                page_count = self._get_page_count(file_path)
+                futures: List[Future] = []
+                for first_page in range(1, page_count + 1, PDF_RENDER_PAGES_PER_TASK):
+                    last_page = min(
+                        first_page + PDF_RENDER_PAGES_PER_TASK - 1, page_count
+                    )
+                    futures.append(
+                        executor.submit(
+                            _render_pdf_pages,
+                            file_path,
+                            first_page,
+                            last_page,
+                            output_folder,
+                        )
+                    )
+                files.append((None, cache_key, futures))
+
+            for cached_pages, cache_key, futures in files:
+                if cached_pages is not None:
+                    yield from cached_pages
+                    continue
+
+                rendered_pages = []
+                for future in futures:
+                    for jpg_file_path in future.result():
+                        self.converted_file_paths.append(jpg_file_path)
+                        rendered_pages.append(jpg_file_path)
+                        yield jpg_file_path
+                page_cache.set_files(cache_key, rendered_pages)
+        finally:
+            for _, _, futures in files:
+                for future in futures:
+                    future.cancel()
+
+    def _convert_pngs_to_jpgs(self, file_paths: List[str]) -> Iterator[str]:
+        for file_path in file_paths:
+            if file_path.endswith(".png"):
+                image = Image.open(file_path)
+                rgb_im = image.convert("RGB")
+
+                # Resize the image
+                rgb_im.thumbnail((1024, 1024))
+
+                base_filename = os.path.basename(file_path).replace(".png", ".jpg")
+                output_folder = os.path.dirname(file_path)
+                jpg_file_path = os.path.join(output_folder, base_filename)
+                rgb_im.save(jpg_file_path, "JPEG")
+                rgb_im.close()
+                self.converted_file_paths.append(jpg_file_path)
+                yield jpg_file_path
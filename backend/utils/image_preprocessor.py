@@ -0,0 +1,178 @@
+"""
+This module prepares page images for the vision model.
+
+The model bills an image by the number of 512px tiles it covers after the API has scaled it to
+fit 2048x2048 and to a shortest side of 768px, or a flat 85 tokens in low detail. Sending more
+pixels than that only costs upload bytes and latency, so pages are cropped to their content,
+scaled to the resolution the model actually uses and further down until they fit the token
+budget of a vision request.
+"""
+import math
+import os
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from PIL import Image
+from settings import EXTRACTION_GROUP_MAX_PAGES, VISION_TOKEN_BUDGET
+
+LOW_DETAIL_TOKENS = 85
+TILE_TOKENS = 170
+TILE_SIZE = 512
+
+# Pixels lighter than this are treated as blank margin
+BLANK_THRESHOLD = 245
+CROP_PADDING = 16
+
+# Smaller images get a higher JPEG quality so that text stays legible
+JPEG_QUALITY_BY_PIXELS = [(512 * 512, 90), (1024 * 1024, 85)]
+DEFAULT_JPEG_QUALITY = 80
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """
+    An image ready to be sent to the vision model.
+
+    Attributes:
+        path (str): The path of the prepared JPG.
+        width (int): The width of the prepared JPG in pixels.
+        height (int): The height of the prepared JPG in pixels.
+        detail (str): The detail level to request, "high" or "low".
+        tokens (int): The number of tokens the image costs.
+    """
+
+    path: str
+    width: int
+    height: int
+    detail: str
+    tokens: int
+
+
+def get_model_image_size(width: int, height: int) -> Tuple[int, int]:
+    """Return the size the API scales a high detail image to before tiling it."""
+    if max(width, height) > 2048:
+        scale = 2048 / max(width, height)
+        width, height = int(width * scale), int(height * scale)
+
+    if min(width, height) > 768:
+        scale = 768 / min(width, height)
+        width, height = int(width * scale), int(height * scale)
+
+    return width, height
+
+
+def count_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Count the tokens an image of the given size costs."""
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+
+    width, height = get_model_image_size(width, height)
+    num_tiles = math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+    return TILE_TOKENS * num_tiles + LOW_DETAIL_TOKENS
+
+
+def crop_blank_margins(image: Image.Image) -> Image.Image:
+    """Crop the white margins around the content of a page, keeping a small padding."""
+    mask = image.convert("L").point(lambda pixel: 255 if pixel < BLANK_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:  # Blank page
+        return image
+
+    left, top, right, bottom = bbox
+    return image.crop(
+        (
+            max(0, left - CROP_PADDING),
+            max(0, top - CROP_PADDING),
+            min(image.width, right + CROP_PADDING),
+            min(image.height, bottom + CROP_PADDING),
+        )
+    )
+
+
+class ImagePreprocessor:
+    """
+    Crops, scales and compresses images so that a vision request stays within its token budget.
+
+    Attributes:
+        token_budget (int): The number of image tokens a single vision request may use.
+    """
+
+    def __init__(self, token_budget: int = VISION_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def prepare_images(
+        self, image_paths: List[str], output_folder: str
+    ) -> List[PreparedImage]:
+        """
+        Prepare every image for the vision model. Images are extracted in groups of up to
+        EXTRACTION_GROUP_MAX_PAGES pages, so the token budget is shared by that many images.
+
+        Args:
+            image_paths (List[str]): The images to prepare.
+            output_folder (str): The folder to write the prepared JPGs to.
+
+        Returns:
+            List[PreparedImage]: The prepared images, in the same order.
+        """
+        if not image_paths:
+            return []
+
+        image_budget = self.token_budget // min(
+            len(image_paths), EXTRACTION_GROUP_MAX_PAGES
+        )
+        return [
+            self.prepare_image(image_path, output_folder, image_budget, index)
+            for index, image_path in enumerate(image_paths)
+        ]
+
+    def prepare_image(
+        self, image_path: str, output_folder: str, token_budget: int, index: int = 0
+    ) -> PreparedImage:
+        """Prepare a single image so that it costs at most token_budget tokens where possible."""
+        with Image.open(image_path) as original:
+            image = crop_blank_margins(original.convert("RGB"))
+
+        width, height = self._get_target_size(image.width, image.height, token_budget)
+        detail = "high"
+        if count_image_tokens(width, height) > token_budget:
+            # Even a single tile is over budget, so fall back to low detail
+            detail = "low"
+            scale = min(1.0, TILE_SIZE / max(width, height))
+            width, height = int(width * scale), int(height * scale)
+
+        if (width, height) != image.size:
+            image = image.resize((max(1, width), max(1, height)), Image.LANCZOS)
+
+        base_filename = os.path.splitext(os.path.basename(image_path))[0]
+        prepared_path = os.path.join(output_folder, f"{index}_{base_filename}.jpg")
+        image.save(
+            prepared_path,
+            "JPEG",
+            quality=self._get_jpeg_quality(image.width, image.height),
+            optimize=True,
+        )
+
+        return PreparedImage(
+            path=prepared_path,
+            width=image.width,
+            height=image.height,
+            detail=detail,
+            tokens=count_image_tokens(image.width, image.height, detail),
+        )
+
+    @staticmethod
+    def _get_target_size(width: int, height: int, token_budget: int) -> Tuple[int, int]:
+        """Scale down to the size the model uses, then further until the image fits the budget."""
+        width, height = get_model_image_size(width, height)
+        while count_image_tokens(width, height) > token_budget and (
+            width > TILE_SIZE or height > TILE_SIZE
+        ):
+            width, height = int(width * 0.9), int(height * 0.9)
+        return width, height
+
+    @staticmethod
+    def _get_jpeg_quality(width: int, height: int) -> int:
+        for max_pixels, quality in JPEG_QUALITY_BY_PIXELS:
+            if width * height <= max_pixels:
+                return quality
+        return DEFAULT_JPEG_QUALITY
@@ -0,0 +1,78 @@
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object that arrives in chunks, e.g. a streamed LLM response.
+
+    Each top-level member is returned as soon as its value is complete, so a client can show
+    the first keys of an object before the rest of it has been generated.
+
+    Attributes:
+        buffer (str): All text fed so far.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of text and return the top-level members it completed.
+
+        Args:
+            chunk (str): The next piece of the JSON text.
+
+        Returns:
+            List[Tuple[str, Any]]: The keys and decoded values of the newly completed members, in order.
+        """
+        self.buffer += chunk
+        members = []
+
+        while self._position < len(self.buffer):
+            char = self.buffer[self._position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = self._position + 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._parse_member(self._position))
+            elif char == "," and self._depth == 1:
+                members.extend(self._parse_member(self._position))
+                self._member_start = self._position + 1
+
+            self._position += 1
+
+        return members
+
+    def _parse_member(self, end: int) -> List[Tuple[str, Any]]:
+        start = self._member_start
+        member = self.buffer[start:end].strip()
+        if not member:
+            return []
+        try:
+            parsed: dict = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return []
+        return list(parsed.items())
+
+    def get_result(self) -> Any:
+        """Decode the complete text once the stream has finished."""
+        return json.loads(self.buffer)
@@ -8,18 +8,78 @@ It's compatible with the S3 API, which allows it to integrate
 with existing tools and workflows.
 """
 import os
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from fastapi import UploadFile
 from settings import (
     SPACES_ACCESS_KEY,
     SPACES_BUCKET_NAME,
     SPACES_ENDPOINT_URL,
+    SPACES_MAX_CONCURRENCY,
+    SPACES_MULTIPART_THRESHOLD_MB,
     SPACES_REGION_NAME,
     SPACES_SECRET_ACCESS_KEY,
 )
 
+# delete_objects accepts at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+
+# boto3 clients are thread-safe (sessions are not), so one client and its connection pool
+# are shared by all managers. Transfers of different files run on a shared bounded executor.
+_client: Any = None
+_client_lock = threading.Lock()
+_transfer_executor: Optional[ThreadPoolExecutor] = None
+
+transfer_config = TransferConfig(
+    multipart_threshold=SPACES_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    max_concurrency=4,
+)
+
+
+def get_s3_client():
+    """Get the shared S3 client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            session = boto3.session.Session()
+            _client = session.client(
+                "s3",
+                region_name=SPACES_REGION_NAME,
+                endpoint_url=SPACES_ENDPOINT_URL,
+                aws_access_key_id=SPACES_ACCESS_KEY,
+                aws_secret_access_key=SPACES_SECRET_ACCESS_KEY,
+                config=Config(
+                    # Room for every transfer thread and its multipart parts
+                    max_pool_connections=SPACES_MAX_CONCURRENCY
+                    * transfer_config.max_request_concurrency,
+                    retries={"max_attempts": 5, "mode": "adaptive"},
+                ),
+            )
+        return _client
+
+
+def _get_transfer_executor() -> ThreadPoolExecutor:
+    global _transfer_executor
+    with _client_lock:
+        if _transfer_executor is None:
+            _transfer_executor = ThreadPoolExecutor(
+                max_workers=SPACES_MAX_CONCURRENCY, thread_name_prefix="spaces"
+            )
+        return _transfer_executor
+
+
+def shutdown_transfer_executor():
+    """Wait for running transfers and stop the transfer workers. Called on shutdown."""
+    global _transfer_executor
+    if _transfer_executor is not None:
+        _transfer_executor.shutdown(wait=True)
+        _transfer_executor = None
+
 
 class DigitalOceanSpaceManager:
     def __init__(
@@ -27,15 +87,11 @@ class DigitalOceanSpaceManager:
         organization_name: str = "",
         files: List[UploadFile] = [],
         file_paths: List[str] = [],
+        object_names: List[str] = [],
+        client=None,
     ):
-        session = boto3.session.Session()
-        self.client = session.client(
-            "s3",
-            region_name=SPACES_REGION_NAME,
-            endpoint_url=SPACES_ENDPOINT_URL,
-            aws_access_key_id=SPACES_ACCESS_KEY,
-            aws_secret_access_key=SPACES_SECRET_ACCESS_KEY,
-        )
+        # A client can be passed in, e.g. one pointing to a local S3-compatible stand-in
+        self.client = client or get_s3_client()
         self.bucket_name = SPACES_BUCKET_NAME
 
         self.organization_name = organization_name.replace(" ", "_")
@@ -43,7 +99,7 @@ class DigitalOceanSpaceManager:
         self.files = files
         self.file_paths = file_paths
         self.file_names = [os.path.basename(file_path) for file_path in file_paths]
-        self.object_names: List[str] = []
+        self.object_names: List[str] = list(object_names)
 
     def __enter__(self):
         return self
@@ -53,46 +109,73 @@ class DigitalOceanSpaceManager:
             self.delete_files()
 
     def upload_files(self):
-        """Upload multiple files to an S3 bucket
+        """Upload multiple files to an S3 bucket concurrently
 
         :return: True if files were uploaded, else False
         """
-        all_uploaded = True
 
-        # Upload the files
-        for file in self.files:
+        def upload(file: UploadFile) -> str:
             # Prepend the organization_name to the object_name
             object_name = f"{self.organization_name}/{file.filename}"
-            try:
-                file.file.seek(0)  # Ensure we're at the start of the file
-                self.client.upload_fileobj(file.file, self.bucket_name, object_name)
-                self.object_names.append(object_name)
-            except Exception as e:
-                print(e)
-                all_uploaded = False
+            file.file.seek(0)  # Ensure we're at the start of the file
+            self.client.upload_fileobj(
+                file.file, self.bucket_name, object_name, Config=transfer_config
+            )
+            return object_name
 
-        return all_uploaded
+        return self._run_uploads(upload, self.files)
 
     def upload_files_by_paths(self):
-        """Upload multiple files using their file paths to an S3 bucket
+        """Upload multiple files using their file paths to an S3 bucket concurrently
 
         :return: True if files were uploaded, else False
         """
-        all_uploaded = True
 
-        # Upload the files
-        for file_path, file_name in zip(self.file_paths, self.file_names):
+        def upload(item) -> str:
+            file_path, file_name = item
             # Prepend the organization_name to the object_name
             object_name = f"{self.organization_name}/{file_name}"
+            self.client.upload_file(
+                file_path, self.bucket_name, object_name, Config=transfer_config
+            )
+            return object_name
+
+        return self._run_uploads(upload, list(zip(self.file_paths, self.file_names)))
+
+    def _run_uploads(self, upload, items: list) -> bool:
+        """Run the uploads on the shared executor, keeping the object names in input order."""
+        executor = _get_transfer_executor()
+        futures = [executor.submit(upload, item) for item in items]
+
+        all_uploaded = True
+        for future in futures:
             try:
-                self.client.upload_file(file_path, self.bucket_name, object_name)
-                self.object_names.append(object_name)
+                self.object_names.append(future.result())
             except Exception as e:
                 print(e)
                 all_uploaded = False
 
         return all_uploaded
 
+    def download_files(self, folder: str) -> List[str]:
+        """Download the objects into a folder concurrently
+
+        :param folder: The folder to download to
+        :return: The local file paths, in the same order as the object names
+        """
+
+        def download(item) -> str:
+            index, object_name = item
+            # Prefix with the index so that equally named objects never collide
+            file_path = os.path.join(folder, f"{index}_{os.path.basename(object_name)}")
+            self.client.download_file(
+                self.bucket_name, object_name, file_path, Config=transfer_config
+            )
+            return file_path
+
+        executor = _get_transfer_executor()
+        return list(executor.map(download, enumerate(self.object_names)))
+
     def create_presigned_urls(self, expiration=900) -> List[str]:
         """Generate presigned URLs to share S3 objects
 
@@ -120,16 +203,29 @@ class DigitalOceanSpaceManager:
         return presigned_urls
 
     def delete_files(self):
-        """Delete multiple files from an S3 bucket
+        """Delete multiple files from an S3 bucket, up to 1000 per request
 
         :return: True if all files were deleted successfully, else False
         """
         all_deleted = True
 
         # Delete the files
-        for object_name in self.object_names:
+        for start in range(0, len(self.object_names), DELETE_BATCH_SIZE):
+            end = start + DELETE_BATCH_SIZE
+            batch = self.object_names[start:end]
             try:
-                self.client.delete_object(Bucket=self.bucket_name, Key=object_name)
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={
+                        "Objects": [{"Key": object_name} for object_name in batch],
+                        "Quiet": True,
+                    },
+                )
+                for error in response.get("Errors", []):
+                    print(
+                        f"Could not delete {error.get('Key')}: {error.get('Message')}"
+                    )
+                    all_deleted = False
             except Exception as e:
                 print(e)
                 all_deleted = False
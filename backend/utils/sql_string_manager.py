@@ -1,5 +1,70 @@
 import re
-from typing import Optional
+from typing import List, Optional, Set
+
+import sqlparse
+from sqlparse.sql import Function, Identifier, IdentifierList, Parenthesis, TokenList
+from sqlparse.tokens import CTE, DML, Comment, Keyword, Punctuation
+
+
+def _is_table_keyword(token) -> bool:
+    return token.ttype in Keyword and (
+        token.normalized == "FROM" or token.normalized.endswith("JOIN")
+    )
+
+
+def _collect_table_names(
+    token_list: TokenList, table_names: Set[str], cte_names: Set[str]
+) -> bool:
+    """
+    Add the tables referenced by a parsed query, and the names of its common table expressions.
+
+    FROM only introduces tables in a list that contains a SELECT, so the FROM of e.g.
+    EXTRACT(YEAR FROM order_date) is ignored. Returns False if a reference is not a table name
+    or a subquery.
+    """
+    tokens = [
+        token
+        for token in token_list.tokens
+        if not token.is_whitespace and token.ttype not in Comment
+    ]
+    is_query = any(token.ttype in DML for token in tokens)
+    for index, token in enumerate(tokens):
+        previous = tokens[index - 1] if index else None
+        if previous is not None and previous.ttype in CTE:
+            definitions = (
+                token.get_identifiers()
+                if isinstance(token, IdentifierList)
+                else [token]
+            )
+            cte_names.update(
+                definition.token_first().value.lower() for definition in definitions
+            )
+        elif previous is not None and is_query and _is_table_keyword(previous):
+            references = (
+                token.get_identifiers()
+                if isinstance(token, IdentifierList)
+                else [token]
+            )
+            for reference in references:
+                first = (
+                    reference.token_first()
+                    if isinstance(reference, Identifier)
+                    else reference
+                )
+                if isinstance(first, Parenthesis):
+                    if not _collect_table_names(first, table_names, cte_names):
+                        return False
+                elif isinstance(reference, Identifier) and not isinstance(
+                    first, Function
+                ):
+                    table_names.add(reference.get_real_name().lower())
+                else:
+                    return False
+            continue
+
+        if token.is_group and not _collect_table_names(token, table_names, cte_names):
+            return False
+    return True
 
 
 class SQLStringManager:
@@ -17,6 +82,10 @@ class SQLStringManager:
         extract_table_name(): Extracts the table name from the SQL query string.
         is_valid_query(): Validates the SQL query string.
         extract_sql_query_from_text(): Extracts an SQL query from a given text.
+        normalize_query(): Normalizes the SQL query string for use as a cache key.
+        strip_query(): Strips the SQL query string for execution.
+        is_single_select_query(): Checks that the SQL string is exactly one SELECT query.
+        get_tables_from_select_query(): Extracts the names of the tables a query reads from.
     """
 
     def __init__(self, sql_string: str = ""):
@@ -87,6 +156,24 @@ class SQLStringManager:
         else:
             return "Invalid CREATE TABLE query"
 
+    def replace_table_in_create_query(self, table_name: str) -> str:
+        """
+        Replace the table name of a SQL CREATE TABLE query.
+
+        Args:
+            table_name (str): The new table name.
+
+        Returns:
+            str: The CREATE TABLE query creating the given table.
+        """
+        return re.sub(
+            r"(CREATE TABLE )\w+",
+            lambda match: match.group(1) + table_name,
+            self.sql_string,
+            count=1,
+            flags=re.IGNORECASE,
+        )
+
     def is_valid_create_table_query(self) -> bool:
         """
         Validate if the SQL string is a valid CREATE TABLE query.
@@ -126,3 +213,68 @@ class SQLStringManager:
             last_statement: str = match[-1]
             return "CREATE TABLE " + last_statement.split("CREATE TABLE")[-1].strip()
         return None
+
+    def normalize_query(self) -> str:
+        """
+        Normalizes the SQL query string, so that queries differing only in formatting map to
+        the same string. Whitespace between tokens is collapsed and a trailing semicolon removed,
+        while string literals, quoted identifiers and comments are kept as written; the case is
+        kept, since it matters within string literals.
+
+        Returns:
+            str: The normalized query.
+        """
+        parts: List[str] = []
+        for statement in sqlparse.parse(self.sql_string):
+            for token in statement.flatten():
+                if not token.is_whitespace:
+                    parts.append(token.value)
+                elif parts and parts[-1] != " ":
+                    parts.append(" ")
+        return "".join(parts).strip().rstrip(";").strip()
+
+    def strip_query(self) -> str:
+        """
+        Strips the surrounding whitespace and trailing semicolons of the SQL query string,
+        leaving the query itself as written, e.g. to run it as a subquery.
+
+        Returns:
+            str: The stripped query.
+        """
+        return self.sql_string.strip().rstrip(";").rstrip()
+
+    def is_single_select_query(self) -> bool:
+        """
+        Check that the SQL string is a single SELECT query, optionally with common table
+        expressions. Any semicolon outside of string literals and comments, i.e. a further
+        statement, makes it invalid.
+
+        Returns:
+            bool: True if valid, otherwise False.
+        """
+        query = self.strip_query()
+        statements = [
+            statement for statement in sqlparse.parse(query) if str(statement).strip()
+        ]
+        if len(statements) != 1 or any(
+            token.match(Punctuation, ";") for token in statements[0].flatten()
+        ):
+            return False
+        return bool(re.match(r"^\(?\s*(SELECT|WITH)\b", query, re.IGNORECASE))
+
+    def get_tables_from_select_query(self) -> Optional[List[str]]:
+        """
+        Extracts the names of the tables a SELECT query reads from, i.e. every table referenced
+        after FROM or JOIN, including comma-separated lists and subqueries. Names of common
+        table expressions are excluded.
+
+        Returns:
+            Optional[List[str]]: The lowercase table names, sorted and without duplicates, or
+                None if a reference, e.g. a set-returning function, cannot be resolved to tables.
+        """
+        table_names: Set[str] = set()
+        cte_names: Set[str] = set()
+        for statement in sqlparse.parse(self.sql_string):
+            if not _collect_table_names(statement, table_names, cte_names):
+                return None
+        return sorted(table_names - cte_names)
@@ -0,0 +1,160 @@
+"""
+This module validates extracted records against the column types of a data profile table.
+
+Records extracted from documents carry their values as the model read them, e.g. "$1,234.50",
+"(12.00)", "03/01/2024" or "Yes". Every column is coerced to its PostgreSQL type in a single
+vectorized pass, and values that cannot be coerced are reported per row instead of failing the
+whole batch. Numbers are parsed strictly, so a value such as "Invoice 42" or "1.234,50"
+is reported rather than read as a different number.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+TRUE_VALUES = {"true", "t", "yes", "y", "1", "x", "✓"}
+FALSE_VALUES = {"false", "f", "no", "n", "0"}
+
+# Currency symbols and whitespace, the only characters stripped from numbers besides the
+# thousands separators
+CURRENCY_AND_WHITESPACE_PATTERN = re.compile(r"[\s$€£¥₹]")
+THOUSANDS_PATTERN = re.compile(r"[+-]?\d{1,3}(,\d{3})+(\.\d*)?")
+NUMBER_PATTERN = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+
+def normalize_column_name(column_name: str) -> str:
+    """Normalize a record key the way data profile column names are written."""
+    return str(column_name).strip().lower().replace(" ", "_")
+
+
+def _parse_decimal(value: str) -> Optional[Decimal]:
+    """
+    Parse an amount strictly, treating values in parentheses as negative.
+
+    Returns None for anything that is not a number once currency symbols, whitespace and
+    correctly placed thousands separators are removed, e.g. "Invoice 42" or "1.234,50".
+    """
+    value = CURRENCY_AND_WHITESPACE_PATTERN.sub("", value)
+    is_negative = value.startswith("(") and value.endswith(")")
+    if is_negative:
+        value = value[1:-1]
+
+    if "," in value:
+        if not THOUSANDS_PATTERN.fullmatch(value):
+            return None
+        value = value.replace(",", "")
+    if not NUMBER_PATTERN.fullmatch(value):
+        return None
+
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return -number if is_negative else number
+
+
+def _to_decimals(values: pd.Series) -> pd.Series:
+    return values.astype(object).map(
+        lambda value: None if pd.isna(value) else _parse_decimal(value)
+    )
+
+
+def _to_numeric(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(_to_decimals(values), errors="coerce")
+
+
+def _to_integer(values: pd.Series) -> pd.Series:
+    # Fractional numbers are invalid rather than silently truncated
+    integers = _to_decimals(values).map(
+        lambda number: (
+            int(number)
+            if number is not None and number == number.to_integral_value()
+            else None
+        )
+    )
+    return integers.astype("Int64")
+
+
+def _to_date(values: pd.Series) -> pd.Series:
+    dates = pd.to_datetime(values, errors="coerce", format="mixed")
+    return dates.dt.date.where(dates.notna(), None)
+
+
+def _to_boolean(values: pd.Series) -> pd.Series:
+    lowered = values.str.strip().str.lower()
+    booleans = pd.Series(pd.NA, index=values.index, dtype="boolean")
+    booleans[lowered.isin(TRUE_VALUES)] = True
+    booleans[lowered.isin(FALSE_VALUES)] = False
+    return booleans
+
+
+COERCERS = {
+    "INTEGER": _to_integer,
+    "DECIMAL": _to_numeric,
+    "DATE": _to_date,
+    "BOOLEAN": _to_boolean,
+}
+
+
+def coerce_records(
+    records: List[dict], column_types: Dict[str, str]
+) -> Tuple[pd.DataFrame, List[dict]]:
+    """
+    Coerce records to the column types of a table.
+
+    Keys are matched to columns after normalization, keys without a column are ignored and
+    missing or empty values become NULL. Rows with a value that cannot be coerced are left out
+    of the returned DataFrame and reported in the errors instead.
+
+    Args:
+        records (List[dict]): The extracted records.
+        column_types (Dict[str, str]): The PostgreSQL type of every column, as returned by
+            SQLStringManager.map_to_postgres_type.
+
+    Returns:
+        Tuple[pd.DataFrame, List[dict]]: The valid rows, and the row index, column, value and
+            error message of every invalid value.
+    """
+    raw_df = pd.DataFrame.from_records(
+        [
+            {normalize_column_name(key): value for key, value in record.items()}
+            for record in records
+        ],
+        columns=list(column_types),
+    )
+
+    df = pd.DataFrame(index=raw_df.index)
+    is_invalid = pd.Series(False, index=raw_df.index)
+    errors: List[dict] = []
+    for column_name, postgres_type in column_types.items():
+        raw_values = raw_df[column_name]
+        is_empty = raw_values.isna() | (
+            raw_values.astype("string").str.strip() == ""
+        ).fillna(False)
+        values = raw_values.astype("string").where(~is_empty)
+
+        coerce = COERCERS.get(postgres_type)
+        if coerce is None:  # TEXT
+            df[column_name] = values.astype(object).where(~is_empty, None)
+            continue
+
+        coerced = coerce(values)
+        failed = ~is_empty & pd.Series(coerced, index=raw_df.index).isna()
+        for row_index in failed[failed].index:
+            errors.append(
+                {
+                    "row": int(row_index),
+                    "column": column_name,
+                    "value": raw_values[row_index],
+                    "error": f"Could not convert to {postgres_type}",
+                }
+            )
+        is_invalid |= failed
+        df[column_name] = coerced
+
+    errors.sort(key=lambda error: error["row"])
+    # Plain Python values with None for NULL, whatever the dtype of the column
+    valid_df: pd.DataFrame = df[~is_invalid].reset_index(drop=True).astype(object)
+    valid_df = valid_df.where(valid_df.notna(), None)
+    return valid_df, errors
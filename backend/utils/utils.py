@@ -1,33 +1,42 @@
-import logging
-import os
-import sys
+import json
 from csv import Sniffer
 from io import StringIO
-from typing import Any, Dict, Optional
+from typing import Iterable, Iterator, Optional, Tuple
 
 import pandas as pd
 from database.database_manager import DatabaseManager
 from database.table_manager import TableManager
 from fastapi import File, UploadFile
+from settings import CSV_CHUNK_SIZE
+from utils.app_logger import get_app_logger  # noqa: F401
 
 
 def execute_select_query(query: str):
+    """Execute an untrusted SELECT query, e.g. one generated by an LLM, through the execution guard."""
     with DatabaseManager() as session:
         table_manager = TableManager(session)
-        results = table_manager.execute_select_query(query)
+        results = table_manager.execute_guarded_select_query(query)
     return results
 
 
-def process_file(file: UploadFile, encoding: str) -> Any:
+def process_file(
+    file: UploadFile, encoding: str, chunk_size: Optional[int] = None
+) -> Tuple[Optional[Iterator[pd.DataFrame]], Optional[str], Optional[str]]:
     """
     Process the uploaded file based on its type.
 
+    CSV files are not read into memory at once. The header is sniffed from the first block
+    of the file and the LLM sample is built from the first rows only, while the data itself
+    is returned as an iterator of DataFrame chunks that is read from the file lazily.
+    Peak memory is therefore bounded by the chunk size, not by the size of the file.
+
     Parameters:
         file (UploadFile): The uploaded file.
         encoding (str): The encoding of the file.
+        chunk_size (int, optional): Number of rows per chunk. Defaults to CSV_CHUNK_SIZE.
 
     Returns:
-        Any: Processed content of the file.
+        Tuple: An iterator over the DataFrame chunks, the sample content and the header.
     """
     if file.filename is None:
         raise ValueError("File must have a filename")
@@ -35,40 +44,40 @@ def process_file(file: UploadFile, encoding: str) -> Any:
     # Find file type by file extension
     file_type = file.filename.split(".")[-1].lower()
 
-    # Define the dictionary with types for values
-    files: Dict[str, Optional[str]] = {
-        "processed_df": None,
-        "sample_file_content_str": None,
-        "header_str": None,
-    }
+    processed_chunks: Optional[Iterator[pd.DataFrame]] = None
+    sample_file_content_str: Optional[str] = None
+    header_str: Optional[str] = None
 
     if file_type == "csv":
-        # Sniff the first 1024 bytes to check for a header
-        sample = file.file.read(4096).decode(encoding)
+        encoding = encoding or "utf-8"
+
+        # Sniff the first 4096 bytes to check for a header
+        sample = file.file.read(4096).decode(encoding, errors="ignore")
         has_header = Sniffer().has_header(sample)
 
         # Reset the file pointer
         file.file.seek(0)
 
-        # Read the entire file into a DataFrame
-        df = pd.read_csv(file.file, encoding=encoding, header=0 if has_header else None)
-        df.columns = map(str.lower, df.columns)  # make all columns lowercase
+        # Read the file lazily in fixed-size chunks
+        reader = pd.read_csv(
+            file.file,
+            encoding=encoding,
+            header=0 if has_header else None,
+            chunksize=chunk_size or CSV_CHUNK_SIZE,
+        )
+        first_chunk = _lowercase_columns(next(reader))
 
         # Store the header as a string, if it exists
-        header_str = ",".join(df.columns) if has_header else None
+        header_str = ",".join(first_chunk.columns) if has_header else None
 
         # Get the first 10 lines
-        sampled_df = df.head(10)
+        sampled_df = first_chunk.head(10)
 
         buffer = StringIO()
         sampled_df.to_csv(buffer, index=False)
 
-        # Reset the file pointer to the beginning of the file for further use
-        file.file.seek(0)
-
-        files["processed_df"] = df
-        files["sample_file_content_str"] = buffer.getvalue()
-        files["header_str"] = header_str
+        processed_chunks = _iter_csv_chunks(first_chunk, reader)
+        sample_file_content_str = buffer.getvalue()
 
     elif file_type == "pdf":
         # PDF processing logic here
@@ -79,23 +88,50 @@ def process_file(file: UploadFile, encoding: str) -> Any:
     else:
         raise ValueError("Unsupported file type")
 
-    return files["processed_df"], files["sample_file_content"], files["header_str"]
+    return processed_chunks, sample_file_content_str, header_str
 
 
-def save_to_data_lake(file: UploadFile = File(...)):
-    pass
+def _lowercase_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(column).lower() for column in df.columns]
+    return df
 
 
-def get_app_logger(name):
-    logger = logging.getLogger(name)
+def _iter_csv_chunks(
+    first_chunk: pd.DataFrame, reader: Iterable[pd.DataFrame]
+) -> Iterator[pd.DataFrame]:
+    """Yield the already read first chunk followed by the remaining chunks of the reader."""
+    yield first_chunk
+    for chunk in reader:
+        yield _lowercase_columns(chunk)
 
-    # Set log level based on the environment
-    log_level = logging.DEBUG if os.getenv("APP_ENV") == "dev" else logging.INFO
 
-    logger.setLevel(log_level)
+def format_sse(data, event: Optional[str] = None) -> str:
+    """Format a server-sent event. Data that is not a string is encoded as JSON."""
+    payload = data if isinstance(data, str) else json.dumps(data, default=str)
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
 
-    # You can add handlers, formatters here if needed
-    handler = logging.StreamHandler(sys.stdout)
-    logger.addHandler(handler)
 
-    return logger
+def iter_ndjson(batches: Iterable[list]) -> Iterator[str]:
+    """Encode batches of rows as newline-delimited JSON, one chunk per batch."""
+    for batch in batches:
+        if batch:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in batch)
+
+
+def iter_json_array(batches: Iterable[list]) -> Iterator[str]:
+    """Encode batches of rows as a single JSON array, one chunk per batch."""
+    yield "["
+    is_first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = ",".join(json.dumps(row, default=str) for row in batch)
+        yield chunk if is_first else "," + chunk
+        is_first = False
+    yield "]"
+
+
+def save_to_data_lake(file: UploadFile = File(...)):
+    pass
@@ -0,0 +1,204 @@
+"""
+Worker Module
+
+This module runs the background jobs queued in the jobs table, e.g. document extraction jobs
+submitted through the data profile endpoints. It starts a pool of worker processes that each
+claim one job at a time with SELECT ... FOR UPDATE SKIP LOCKED.
+
+Usage:
+    $ python worker.py
+"""
+import asyncio
+import multiprocessing
+import signal
+import tempfile
+import traceback
+
+from database.data_profile_manager import DataProfileManager
+from database.database_manager import DatabaseManager
+from database.job_manager import JobManager
+from models.data_profile import DataProfile
+from models.user import User, UserPrincipal
+from settings import (
+    JOB_HEARTBEAT_INTERVAL_SECONDS,
+    JOB_POLL_INTERVAL_SECONDS,
+    JOB_STALE_AFTER_SECONDS,
+    JOB_WORKER_PROCESSES,
+)
+from utils.data_extraction import extract_data_from_files
+from utils.object_storage.digitalocean_space_manager import DigitalOceanSpaceManager
+from utils.utils import get_app_logger
+
+logger = get_app_logger(__name__)
+
+
+async def run_data_profile_extraction(
+    job_id: int, payload: dict, organization_id: int, user_id: int
+):
+    """Extract data from the uploaded files of a job, reporting per-page progress."""
+    with DatabaseManager() as session:
+        current_user = UserPrincipal.model_validate(session.get(User, user_id))
+        if payload.get("data_profile_name"):
+            data_profile_manager = DataProfileManager(session)
+            data_profile = data_profile_manager.get_dataprofile_by_name_and_org(
+                payload["data_profile_name"], organization_id
+            )
+            if data_profile is None:
+                raise ValueError("Data Profile not found")
+            session.expunge(data_profile)
+        else:
+            data_profile = DataProfile(
+                name="preview", extract_instructions=payload["extract_instructions"]
+            )
+
+    def on_progress(stage: str, pages_done: int, pages_total: int):
+        with DatabaseManager() as session:
+            JobManager(session).update_progress(job_id, stage, pages_done, pages_total)
+
+    space_manager = DigitalOceanSpaceManager(
+        organization_name=payload["organization_name"],
+        object_names=payload["object_names"],
+    )
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            on_progress("downloading", 0, 0)
+            file_paths = await asyncio.get_running_loop().run_in_executor(
+                None, space_manager.download_files, folder
+            )
+            return await extract_data_from_files(
+                data_profile,
+                file_paths,
+                payload["organization_name"],
+                current_user,
+                on_progress,
+            )
+    finally:
+        space_manager.delete_files()
+
+
+JOB_HANDLERS = {"data_profile_extraction": run_data_profile_extraction}
+
+
+def _send_heartbeat(job_id: int):
+    with DatabaseManager() as session:
+        JobManager(session).heartbeat(job_id)
+
+
+async def _keep_alive(job_id: int, interval: float):
+    """
+    Send heartbeats for a job until cancelled. Stages such as the LLM extraction of a page can
+    take longer than JOB_STALE_AFTER_SECONDS without reporting progress.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await loop.run_in_executor(None, _send_heartbeat, job_id)
+        except Exception as e:
+            logger.warning(f"Could not send the heartbeat of job {job_id}: {e}")
+
+
+class JobWorker:
+    """
+    Claims and runs queued jobs one at a time until it is stopped.
+
+    Attributes:
+        poll_interval (float): The number of seconds to wait when the queue is empty.
+    """
+
+    def __init__(self, poll_interval: float = JOB_POLL_INTERVAL_SECONDS):
+        self.poll_interval = poll_interval
+        self.stopped = False
+
+    def stop(self):
+        """Stop after the current job has finished."""
+        self.stopped = True
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        while not self.stopped:
+            with DatabaseManager() as session:
+                job = JobManager(session).claim_next_job()
+                claimed = (
+                    (
+                        job.id,
+                        job.job_type,
+                        job.payload,
+                        job.organization_id,
+                        job.user_id,
+                    )
+                    if job
+                    else None
+                )
+
+            if claimed is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            await self.run_job(*claimed)
+
+    async def run_job(
+        self,
+        job_id: int,
+        job_type: str,
+        payload: dict,
+        organization_id: int,
+        user_id: int,
+    ):
+        """Run a claimed job and store its result or error."""
+        logger.info(f"Running job {job_id} ({job_type})")
+        heartbeat = asyncio.create_task(
+            _keep_alive(job_id, JOB_HEARTBEAT_INTERVAL_SECONDS)
+        )
+        try:
+            handler = JOB_HANDLERS.get(job_type)
+            if handler is None:
+                raise ValueError(f"Unknown job type: {job_type}")
+            result = await handler(job_id, payload, organization_id, user_id)
+        except Exception as e:
+            traceback.print_exc()
+            with DatabaseManager() as session:
+                JobManager(session).fail_job(job_id, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        with DatabaseManager() as session:
+            JobManager(session).complete_job(job_id, result)
+        logger.info(f"Finished job {job_id}")
+
+
+def _run_worker():
+    worker = JobWorker()
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+def run_worker_pool(processes: int = JOB_WORKER_PROCESSES):
+    """Start the worker processes and wait for them. SIGTERM stops them after their current job."""
+    if JOB_HEARTBEAT_INTERVAL_SECONDS >= JOB_STALE_AFTER_SECONDS:
+        # Jobs would be reclaimed from live workers between two heartbeats
+        raise ValueError(
+            "JOB_HEARTBEAT_INTERVAL_SECONDS must be lower than JOB_STALE_AFTER_SECONDS"
+        )
+
+    workers = [
+        multiprocessing.Process(target=_run_worker, name=f"job-worker-{index}")
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def stop(signum, frame):
+        for worker in workers:
+            worker.terminate()  # Sends SIGTERM
+
+    signal.signal(signal.SIGTERM, stop)
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    run_worker_pool()